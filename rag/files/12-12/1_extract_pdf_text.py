@@ -2,79 +2,129 @@
 """
 Extract text from the Twelve Steps and Twelve Traditions PDF
 This script extracts text from the PDF and saves it to a text file
-It also creates a JSON file with page-level information
+It also creates a JSON (or JSONL) file with page-level information
+Page ranges are extracted in parallel worker processes; see --help
 """
 
 import os
+import sys
 import json
-from pypdf import PdfReader
-import re
+import argparse
+import textwrap
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from raglib.pdf_text import PAGES_PER_TASK, count_pages, iter_pages
+from raglib.sources import get_source
+from raglib.stream import jsonl_path
 
 # Input and output paths
-PDF_PATH = "../../../public/pdf/AA-12-Steps-12-Traditions.pdf"
+PDF_PATH = get_source("12-12").pdf_path
 OUTPUT_TEXT_PATH = "12_12_text.txt"
 OUTPUT_PAGES_JSON_PATH = "12_12_pages.json"
+SOURCE = get_source("12-12").label
 
-def extract_pdf_text():
+class PagesWriter:
+    """
+    Write page records one at a time as a JSON array or as JSONL
+    The JSON array matches the layout json.dump(..., indent=2) produces
+    """
+
+    def __init__(self, path, jsonl=False):
+        self.f = open(path, 'w', encoding='utf-8')
+        self.jsonl = jsonl
+        self.count = 0
+        if not jsonl:
+            self.f.write("[")
+
+    def write(self, record):
+        if self.jsonl:
+            self.f.write(json.dumps(record) + "\n")
+        else:
+            self.f.write(("," if self.count else "") + "\n")
+            self.f.write(textwrap.indent(json.dumps(record, indent=2), "  "))
+        self.count += 1
+
+    def close(self):
+        if not self.jsonl:
+            self.f.write("\n]" if self.count else "]")
+        self.f.close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extract text from the 12&12 PDF.")
+    parser.add_argument("--pdf", default=PDF_PATH, help="PDF to extract")
+    parser.add_argument("--output-text", default=OUTPUT_TEXT_PATH, help="Full text output file")
+    parser.add_argument("--output-pages", default=None, help="Page records output file")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes for extraction (1 = sequential)",
+    )
+    parser.add_argument(
+        "--pages-per-task",
+        type=int,
+        default=PAGES_PER_TASK,
+        help="Pages extracted per worker task",
+    )
+    parser.add_argument("--jsonl", action="store_true", help="Write page records as JSONL")
+    return parser.parse_args()
+
+def extract_pdf_text(
+    pdf_path=PDF_PATH,
+    output_text_path=OUTPUT_TEXT_PATH,
+    output_pages_path=None,
+    workers=1,
+    pages_per_task=PAGES_PER_TASK,
+    jsonl=False,
+):
     """
     Extract text from the PDF and save it to files
     """
     print("🔍 Extracting text from Twelve Steps and Twelve Traditions PDF...")
 
+    if output_pages_path is None:
+        output_pages_path = (
+            jsonl_path(OUTPUT_PAGES_JSON_PATH) if jsonl else OUTPUT_PAGES_JSON_PATH
+        )
+
     # Ensure PDF file exists
-    if not os.path.exists(PDF_PATH):
-        print(f"❌ Error: PDF file not found at {PDF_PATH}")
+    if not os.path.exists(pdf_path):
+        print(f"❌ Error: PDF file not found at {pdf_path}")
         return False
 
     try:
         # Open the PDF file
-        reader = PdfReader(PDF_PATH)
-        num_pages = len(reader.pages)
-        print(f"📚 PDF has {num_pages} pages")
-
-        # Prepare containers for the results
-        all_text = ""
-        pages_data = []
-
-        # Extract text from each page
-        for i, page in enumerate(reader.pages):
-            # Get text from the page
-            page_text = page.extract_text()
-
-            # Clean up the text
-            page_text = page_text.strip()
-            # Replace multiple spaces and newlines with single ones
-            page_text = re.sub(r'\s+', ' ', page_text)
-            # Fix common OCR issues
-            page_text = re.sub(r'- ', '', page_text)
-
-            # Add to full text
-            all_text += page_text + "\n\n"
-
-            # Add to pages data
-            pages_data.append({
-                "page_number": i + 1,
-                "text": page_text,
-                "source": "AA Twelve Steps and Twelve Traditions"
-            })
-
-            # Display progress
-            if (i + 1) % 10 == 0 or i == 0 or i == num_pages - 1:
-                print(f"✅ Processed page {i + 1}/{num_pages}")
-
-        # Write the full text to a file
-        with open(OUTPUT_TEXT_PATH, 'w', encoding='utf-8') as f:
-            f.write(all_text)
-
-        # Write the pages data to a JSON file
-        with open(OUTPUT_PAGES_JSON_PATH, 'w', encoding='utf-8') as f:
-            json.dump(pages_data, f, indent=2)
-
-        print(f"✅ Extracted text saved to {OUTPUT_TEXT_PATH}")
-        print(f"✅ Page data saved to {OUTPUT_PAGES_JSON_PATH}")
+        num_pages = count_pages(pdf_path)
+        print(f"📚 PDF has {num_pages} pages, extracting with {max(workers, 1)} worker(s)")
+
+        total_length = 0
+        pages_writer = PagesWriter(output_pages_path, jsonl=jsonl)
+
+        # Page text is streamed straight to both outputs instead of being accumulated
+        with open(output_text_path, 'w', encoding='utf-8') as text_file:
+            try:
+                for page_number, page_text in iter_pages(pdf_path, num_pages, workers, pages_per_task):
+                    text_file.write(page_text)
+                    text_file.write("\n\n")
+                    total_length += len(page_text) + 2
+
+                    pages_writer.write({
+                        "page_number": page_number,
+                        "text": page_text,
+                        "source": SOURCE
+                    })
+
+                    # Display progress
+                    if page_number % 10 == 0 or page_number == 1 or page_number == num_pages:
+                        print(f"✅ Processed page {page_number}/{num_pages}")
+            finally:
+                pages_writer.close()
+
+        print(f"✅ Extracted text saved to {output_text_path}")
+        print(f"✅ Page data saved to {output_pages_path}")
 
         # Print some statistics
-        print(f"📊 Total text length: {len(all_text)} characters")
+        print(f"📊 Total text length: {total_length} characters")
 
         return True
 
@@ -83,4 +133,13 @@ def extract_pdf_text():
         return False
 
 if __name__ == "__main__":
-    extract_pdf_text()
+    args = parse_args()
+    ok = extract_pdf_text(
+        pdf_path=args.pdf,
+        output_text_path=args.output_text,
+        output_pages_path=args.output_pages,
+        workers=args.workers,
+        pages_per_task=args.pages_per_task,
+        jsonl=args.jsonl,
+    )
+    sys.exit(0 if ok else 1)
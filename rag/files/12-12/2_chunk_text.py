@@ -4,58 +4,102 @@ Chunk the extracted text from Twelve Steps and Twelve Traditions PDF
 This script creates chunks in different formats:
 1. Token-based chunks (like in the Big Book example)
 2. Paragraph-based chunks
+Token counts are in the embedding model's own BPE tokens (tiktoken)
 """
 
 import json
 import re
 import os
-import nltk
-from nltk.tokenize import sent_tokenize
+import sys
+import argparse
 
-# Download NLTK data if not already available
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from raglib.chunking import DEFAULT_EMBEDDING_MODEL, TokenChunker, count_tokens
+from raglib.sources import get_source
+from raglib.stream import chunk_pages, jsonl_path, read_jsonl, write_jsonl
 
 # Input and output paths
 INPUT_PAGES_JSON_PATH = "12_12_pages.json"
 OUTPUT_TOKEN_CHUNKS_PATH = "12_12_chunks_token_based.json"
 OUTPUT_PARAGRAPH_CHUNKS_PATH = "12_12_chunks_paragraph.json"
+TWELVE_AND_TWELVE = get_source("12-12")
+SOURCE = TWELVE_AND_TWELVE.label
+CHUNK_ID_PREFIX = TWELVE_AND_TWELVE.chunk_id_prefix
 
 # Chunking parameters
-TOKEN_CHUNK_SIZE = 512  # Target size for token-based chunks
-TOKEN_CHUNK_OVERLAP = 50  # Overlap between token-based chunks
+TOKEN_CHUNK_SIZE = TWELVE_AND_TWELVE.chunk_size  # Maximum size for token-based chunks, in embedding model tokens
+TOKEN_CHUNK_OVERLAP = TWELVE_AND_TWELVE.overlap  # Overlap between token-based chunks, in embedding model tokens
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Chunk the extracted 12&12 text.")
+    parser.add_argument("--chunk-size", type=int, default=TOKEN_CHUNK_SIZE, help="Max tokens per chunk")
+    parser.add_argument("--overlap", type=int, default=TOKEN_CHUNK_OVERLAP, help="Tokens shared by consecutive chunks")
+    parser.add_argument("--model", default=DEFAULT_EMBEDDING_MODEL, help="Embedding model whose tokenizer is used")
+    parser.add_argument(
+        "--jsonl",
+        action="store_true",
+        help="Stream 12_12_pages.jsonl to 12_12_chunks_token_based.jsonl (token chunks only)",
+    )
+    return parser.parse_args()
+
+def chunk_text_jsonl(chunk_size=TOKEN_CHUNK_SIZE, overlap=TOKEN_CHUNK_OVERLAP, model=DEFAULT_EMBEDDING_MODEL):
+    """
+    Stream page records to token chunk records, one JSONL line at a time
+    """
+    input_path = jsonl_path(INPUT_PAGES_JSON_PATH)
+    output_path = jsonl_path(OUTPUT_TOKEN_CHUNKS_PATH)
+    print(f"🔍 Streaming chunks from {input_path}...")
+
+    if not os.path.exists(input_path):
+        print(f"❌ Error: Input file not found at {input_path}")
+        return False
+
+    try:
+        chunker = TokenChunker(chunk_size=chunk_size, overlap=overlap, model=model)
+        count = write_jsonl(output_path, chunk_pages(read_jsonl(input_path), chunker, SOURCE, CHUNK_ID_PREFIX))
+        print(f"✅ Created {count} token-based chunks, saved to {output_path}")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error creating chunks: {str(e)}")
+        return False
 
-def chunk_text():
+def chunk_text(
+    chunk_size=TOKEN_CHUNK_SIZE,
+    overlap=TOKEN_CHUNK_OVERLAP,
+    model=DEFAULT_EMBEDDING_MODEL,
+    input_path=INPUT_PAGES_JSON_PATH,
+    output_token_path=OUTPUT_TOKEN_CHUNKS_PATH,
+    output_paragraph_path=OUTPUT_PARAGRAPH_CHUNKS_PATH,
+):
     """
     Create token and paragraph-based chunks from the text
     """
     print("🔍 Creating chunks from Twelve Steps and Twelve Traditions text...")
 
     # Ensure input file exists
-    if not os.path.exists(INPUT_PAGES_JSON_PATH):
-        print(f"❌ Error: Input file not found at {INPUT_PAGES_JSON_PATH}")
+    if not os.path.exists(input_path):
+        print(f"❌ Error: Input file not found at {input_path}")
         return False
 
     try:
         # Load page data
-        with open(INPUT_PAGES_JSON_PATH, 'r', encoding='utf-8') as f:
+        with open(input_path, 'r', encoding='utf-8') as f:
             pages = json.load(f)
 
         print(f"📚 Loaded {len(pages)} pages")
 
         # Create token-based chunks
-        token_chunks = create_token_chunks(pages)
-        with open(OUTPUT_TOKEN_CHUNKS_PATH, 'w', encoding='utf-8') as f:
+        token_chunks = create_token_chunks(pages, chunk_size=chunk_size, overlap=overlap, model=model)
+        with open(output_token_path, 'w', encoding='utf-8') as f:
             json.dump(token_chunks, f, indent=2)
-        print(f"✅ Created {len(token_chunks)} token-based chunks, saved to {OUTPUT_TOKEN_CHUNKS_PATH}")
+        print(f"✅ Created {len(token_chunks)} token-based chunks, saved to {output_token_path}")
 
         # Create paragraph-based chunks
-        paragraph_chunks = create_paragraph_chunks(pages)
-        with open(OUTPUT_PARAGRAPH_CHUNKS_PATH, 'w', encoding='utf-8') as f:
+        paragraph_chunks = create_paragraph_chunks(pages, model=model)
+        with open(output_paragraph_path, 'w', encoding='utf-8') as f:
             json.dump(paragraph_chunks, f, indent=2)
-        print(f"✅ Created {len(paragraph_chunks)} paragraph-based chunks, saved to {OUTPUT_PARAGRAPH_CHUNKS_PATH}")
+        print(f"✅ Created {len(paragraph_chunks)} paragraph-based chunks, saved to {output_paragraph_path}")
 
         return True
 
@@ -63,64 +107,14 @@ def chunk_text():
         print(f"❌ Error creating chunks: {str(e)}")
         return False
 
-def create_token_chunks(pages):
+def create_token_chunks(pages, chunk_size=TOKEN_CHUNK_SIZE, overlap=TOKEN_CHUNK_OVERLAP, model=DEFAULT_EMBEDDING_MODEL):
     """
     Create chunks based on a target token size with overlap
     """
-    chunks = []
-    chunk_id = 0
-    current_chunk = ""
-    current_chunk_tokens = 0
-    current_pages = set()
-
-    for page in pages:
-        page_number = page["page_number"]
-        text = page["text"]
-
-        # Split into sentences to avoid cutting in the middle of a sentence
-        sentences = sent_tokenize(text)
-
-        for sentence in sentences:
-            # Rough token count (words + punctuation)
-            sentence_tokens = len(re.findall(r'\b\w+\b|[^\w\s]', sentence))
-
-            if current_chunk_tokens + sentence_tokens > TOKEN_CHUNK_SIZE and current_chunk:
-                # Save the current chunk if it's getting too big
-                chunks.append({
-                    "chunk_id": f"12-12-{chunk_id:03d}",
-                    "text": current_chunk.strip(),
-                    "token_count": current_chunk_tokens,
-                    "page_number": min(current_pages),  # Use the first page number
-                    "page_range": f"{min(current_pages)}-{max(current_pages)}",
-                    "source": "AA Twelve Steps and Twelve Traditions"
-                })
-                chunk_id += 1
-
-                # Start a new chunk with overlap
-                overlap_tokens = current_chunk.split()[-TOKEN_CHUNK_OVERLAP:]
-                current_chunk = " ".join(overlap_tokens) + " " + sentence
-                current_chunk_tokens = len(overlap_tokens) + sentence_tokens
-                current_pages = {page_number}
-            else:
-                # Add to the current chunk
-                current_chunk += " " + sentence
-                current_chunk_tokens += sentence_tokens
-                current_pages.add(page_number)
-
-    # Don't forget the last chunk
-    if current_chunk:
-        chunks.append({
-            "chunk_id": f"12-12-{chunk_id:03d}",
-            "text": current_chunk.strip(),
-            "token_count": current_chunk_tokens,
-            "page_number": min(current_pages),  # Use the first page number
-            "page_range": f"{min(current_pages)}-{max(current_pages)}",
-            "source": "AA Twelve Steps and Twelve Traditions"
-        })
-
-    return chunks
+    chunker = TokenChunker(chunk_size=chunk_size, overlap=overlap, model=model)
+    return list(chunk_pages(pages, chunker, SOURCE, CHUNK_ID_PREFIX))
 
-def create_paragraph_chunks(pages):
+def create_paragraph_chunks(pages, model=DEFAULT_EMBEDDING_MODEL):
     """
     Create chunks based on paragraphs
     """
@@ -148,17 +142,20 @@ def create_paragraph_chunks(pages):
                     paragraph = f"{paragraph}\n\n{next_paragraph}"
 
             # Add the paragraph as a chunk
-            token_count = len(re.findall(r'\b\w+\b|[^\w\s]', paragraph))
+            token_count = count_tokens(paragraph, model=model)
             chunks.append({
                 "chunk_id": f"12-12-p-{chunk_id:03d}",
                 "text": paragraph,
                 "token_count": token_count,
                 "page_number": page_number,
-                "source": "AA Twelve Steps and Twelve Traditions"
+                "source": SOURCE
             })
             chunk_id += 1
 
     return chunks
 
 if __name__ == "__main__":
-    chunk_text()
\ No newline at end of file
+    args = parse_args()
+    run = chunk_text_jsonl if args.jsonl else chunk_text
+    ok = run(chunk_size=args.chunk_size, overlap=args.overlap, model=args.model)
+    sys.exit(0 if ok else 1)
\ No newline at end of file
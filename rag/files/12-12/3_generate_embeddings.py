@@ -2,22 +2,76 @@
 """
 Generate embeddings for Twelve Steps and Twelve Traditions chunks
 Uses OpenAI's text-embedding-3-small model (same as the Big Book)
+Chunks are sent in batches with several requests in flight; see --help
 """
 
 import os
+import sys
 import json
 import time
-from openai import OpenAI
+import argparse
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from raglib.embedding_engine import EmbeddingEngine, add_engine_arguments
+from raglib.embedding_cache import add_cache_arguments, embed_with_cache, open_cache
+from raglib.artifacts import add_format_arguments, save_embedded_chunks
+from raglib.stream import embed_chunks, jsonl_path, read_jsonl, write_jsonl
+
 # Load environment variables from .env file
 load_dotenv()
 
 # Input and output paths
 INPUT_CHUNKS_PATH = "12_12_chunks_token_based.json"
-OUTPUT_EMBEDDINGS_PATH = "12_12_chunks_with_embeddings.json"
+OUTPUT_EMBEDDINGS_PATH = "12_12_chunks_with_embeddings"  # .meta.json + .f32.npy
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate embeddings for 12&12 chunks.")
+    parser.add_argument("--input", default=INPUT_CHUNKS_PATH, help="Chunks JSON file")
+    parser.add_argument("--output", default=OUTPUT_EMBEDDINGS_PATH, help="Output artifact path")
+    add_engine_arguments(parser)
+    add_cache_arguments(parser)
+    add_format_arguments(parser)
+    parser.add_argument(
+        "--jsonl",
+        action="store_true",
+        help="Stream chunks from a .jsonl input to a .jsonl output batch by batch",
+    )
+    return parser.parse_args()
+
+def generate_embeddings_jsonl(input_path, output_path, engine, cache=None):
+    """
+    Stream chunk records through the embedding engine, one batch in memory at a time
+    """
+    if not os.path.exists(input_path):
+        print(f"❌ Error: Input file not found at {input_path}")
+        return False
+
+    try:
+        start_time = time.time()
+        count = write_jsonl(output_path, embed_chunks(read_jsonl(input_path), engine, cache=cache))
+        print(
+            f"✅ Streamed {count} chunks with embeddings to {output_path} "
+            f"in {time.time() - start_time:.2f}s ({engine.stats['requests']} requests)"
+        )
+        if cache is not None:
+            print(f"💾 Embedding cache: {cache.hits} hits, {cache.misses} misses ({cache.path})")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error generating embeddings: {str(e)}")
+        return False
 
-def generate_embeddings():
+def generate_embeddings(
+    input_path=INPUT_CHUNKS_PATH,
+    output_path=OUTPUT_EMBEDDINGS_PATH,
+    model="text-embedding-3-small",
+    batch_size=128,
+    concurrency=4,
+    base_url=None,
+    cache=None,
+    output_format="npy",
+):
     """
     Generate embeddings for chunks and save them
     """
@@ -30,57 +84,56 @@ def generate_embeddings():
         return False
 
     # Ensure input file exists
-    if not os.path.exists(INPUT_CHUNKS_PATH):
-        print(f"❌ Error: Input file not found at {INPUT_CHUNKS_PATH}")
+    if not os.path.exists(input_path):
+        print(f"❌ Error: Input file not found at {input_path}")
         return False
 
     try:
         # Load chunks
-        with open(INPUT_CHUNKS_PATH, 'r', encoding='utf-8') as f:
+        with open(input_path, 'r', encoding='utf-8') as f:
             chunks = json.load(f)
 
         print(f"📚 Loaded {len(chunks)} chunks")
-
-        # Initialize OpenAI client
-        client = OpenAI(api_key=api_key)
-
-        # Add embeddings to each chunk
-        for i, chunk in enumerate(chunks):
-            try:
-                # Generate embeddings using OpenAI's text-embedding-3-small model (same as Big Book)
-                response = client.embeddings.create(
-                    model="text-embedding-3-small",
-                    input=chunk['text']
-                )
-
-                # Extract the embedding from the response
-                chunk['embedding'] = response.data[0].embedding
-                chunk['embedding_model'] = 'text-embedding-3-small'
-                chunk['dimensions'] = len(response.data[0].embedding)
-                chunk['created_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
-
-                # Log progress
-                if (i + 1) % 10 == 0 or i == 0 or i == len(chunks) - 1:
-                    print(f"✅ Processed chunk {i + 1}/{len(chunks)}")
-
-                # Add a small delay to avoid hitting API rate limits
-                time.sleep(0.2)
-
-            except Exception as e:
-                print(f"❌ Error generating embedding for chunk {i}: {str(e)}")
-                # Add longer delay if we hit rate limits
-                if "rate_limit" in str(e).lower():
-                    print("⏱ Rate limit hit, waiting 60 seconds...")
-                    time.sleep(60)
-                    # Retry this chunk
-                    i -= 1
-                    continue
+        print(f"⚙️ Batch size {batch_size}, {concurrency} requests in flight")
+
+        engine = EmbeddingEngine(
+            model=model,
+            batch_size=batch_size,
+            concurrency=concurrency,
+            api_key=api_key,
+            base_url=base_url,
+        )
+
+        def log_progress(done, total):
+            print(f"✅ Embedded {done}/{total} chunks")
+
+        start_time = time.time()
+        embeddings = embed_with_cache(
+            engine, cache, [chunk['text'] for chunk in chunks], progress=log_progress
+        )
+        elapsed = time.time() - start_time
+
+        if cache is not None:
+            print(f"💾 Embedding cache: {cache.hits} hits, {cache.misses} misses ({cache.path})")
+
+        created_at = time.strftime('%Y-%m-%d %H:%M:%S')
+        for chunk, embedding in zip(chunks, embeddings):
+            chunk['embedding_model'] = model
+            chunk['dimensions'] = len(embedding)
+            chunk['created_at'] = created_at
+
+        print(
+            f"⏱ {len(chunks)} chunks in {elapsed:.2f}s "
+            f"({engine.stats['requests']} requests, {engine.stats['retries']} retries, "
+            f"{engine.stats['rate_limited']} rate limited)"
+        )
 
         # Save chunks with embeddings
-        with open(OUTPUT_EMBEDDINGS_PATH, 'w', encoding='utf-8') as f:
-            json.dump(chunks, f, indent=2)
+        written = save_embedded_chunks(
+            output_path, chunks, embeddings, output_format=output_format, model=model
+        )
 
-        print(f"✅ Saved {len(chunks)} chunks with embeddings to {OUTPUT_EMBEDDINGS_PATH}")
+        print(f"✅ Saved {len(chunks)} chunks with embeddings to {', '.join(written)}")
 
         return True
 
@@ -89,4 +142,33 @@ def generate_embeddings():
         return False
 
 if __name__ == "__main__":
-    generate_embeddings()
\ No newline at end of file
+    args = parse_args()
+    cache = open_cache(args)
+    if args.jsonl:
+        ok = generate_embeddings_jsonl(
+            jsonl_path(args.input),
+            jsonl_path(args.output),
+            EmbeddingEngine(
+                model=args.model,
+                batch_size=args.batch_size,
+                concurrency=args.concurrency,
+                base_url=args.base_url,
+            ),
+            cache=cache,
+        )
+        if cache is not None:
+            cache.close()
+        sys.exit(0 if ok else 1)
+    ok = generate_embeddings(
+        input_path=args.input,
+        output_path=args.output,
+        model=args.model,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        base_url=args.base_url,
+        cache=cache,
+        output_format=args.format,
+    )
+    if cache is not None:
+        cache.close()
+    sys.exit(0 if ok else 1)
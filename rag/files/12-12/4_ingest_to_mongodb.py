@@ -5,10 +5,24 @@ Uses the same MongoDB database as the main application
 """
 
 import os
+import sys
+import time
+import argparse
 from pymongo import MongoClient
-import json
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from raglib.artifacts import embedded_chunks_exist, load_embedded_chunks
+from raglib.sources import get_source
+from raglib.stream import jsonl_path, read_jsonl
+from raglib.ingest import (
+    DEFAULT_BATCH_SIZE,
+    add_ingest_arguments,
+    ensure_indexes,
+    prune_missing_chunks,
+    upsert_chunks,
+)
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -16,60 +30,89 @@ load_dotenv()
 MONGODB_URI = os.getenv("MONGODB_URI")
 DB_NAME = 'dailyreflections'
 COLLECTION_NAME = 'text_chunks'  # Use the same collection as the Big Book
-
-# Input file
-INPUT_EMBEDDINGS_PATH = "12_12_chunks_with_embeddings.json"
-
-def ingest_to_mongodb():
+SOURCE = get_source("12-12").label
+
+# Input artifact (.meta.json + .f32.npy, falls back to the legacy .json)
+INPUT_EMBEDDINGS_PATH = "12_12_chunks_with_embeddings"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Ingest 12&12 chunks into MongoDB.")
+    parser.add_argument("--input", default=INPUT_EMBEDDINGS_PATH, help="Embedding artifact path")
+    add_ingest_arguments(parser)
+    parser.add_argument(
+        "--jsonl",
+        action="store_true",
+        help="Stream chunk records from 12_12_chunks_with_embeddings.jsonl",
+    )
+    return parser.parse_args()
+
+def ingest_to_mongodb(
+    input_path=INPUT_EMBEDDINGS_PATH,
+    batch_size=DEFAULT_BATCH_SIZE,
+    prune=False,
+    collection=None,
+    jsonl=False,
+):
     """
-    Ingest chunks with embeddings into MongoDB
+    Upsert chunks with embeddings into MongoDB
+    Unchanged chunks are skipped, so reruns write almost nothing
     """
     print("🔍 Ingesting Twelve Steps and Twelve Traditions chunks into MongoDB...")
 
     # Ensure MongoDB URI is available
-    if not MONGODB_URI:
+    if collection is None and not MONGODB_URI:
         print("❌ Error: MONGODB_URI not found in environment variables")
         return False
 
     # Ensure input file exists
-    if not os.path.exists(INPUT_EMBEDDINGS_PATH):
-        print(f"❌ Error: Input file not found at {INPUT_EMBEDDINGS_PATH}")
+    if jsonl:
+        input_path = jsonl_path(input_path)
+        if not os.path.exists(input_path):
+            print(f"❌ Error: Input file not found at {input_path}")
+            return False
+    elif not embedded_chunks_exist(input_path):
+        print(f"❌ Error: Input file not found at {input_path}")
         return False
 
     try:
-        # Load chunks with embeddings
-        with open(INPUT_EMBEDDINGS_PATH, 'r', encoding='utf-8') as f:
-            chunks = json.load(f)
-
-        print(f"📚 Loaded {len(chunks)} chunks with embeddings")
+        if jsonl:
+            # Records are read lazily, one batch in memory at a time
+            documents = read_jsonl(input_path)
+            total = "?"
+            print(f"📚 Streaming chunks from {input_path}")
+        else:
+            # Load chunks with embeddings (vectors stay memory-mapped until written)
+            artifact = load_embedded_chunks(input_path)
+            documents = artifact.iter_documents()
+            total = len(artifact)
+            print(f"📚 Loaded {len(artifact)} chunks with {artifact.dimensions}-dim embeddings")
 
         # Connect to MongoDB
-        client = MongoClient(MONGODB_URI)
-        db = client[DB_NAME]
-        collection = db[COLLECTION_NAME]
-
-        # Check if chunks already exist
-        existing_count = collection.count_documents({"source": "AA Twelve Steps and Twelve Traditions"})
-        if existing_count > 0:
-            print(f"⚠️ Found {existing_count} existing 12&12 chunks in MongoDB")
-            user_input = input("Delete existing chunks and reimport? (y/n): ").strip().lower()
-
-            if user_input == 'y' or user_input == 'yes':
-                print("🗑️ Deleting existing chunks...")
-                collection.delete_many({"source": "AA Twelve Steps and Twelve Traditions"})
-                print("✅ Existing chunks deleted")
-            else:
-                print("⚠️ Aborting import process")
-                return False
-
-        # Insert chunks into MongoDB
-        result = collection.insert_many(chunks)
-        print(f"✅ Inserted {len(result.inserted_ids)} documents into MongoDB")
-
-        # Create indexes for better performance
-        collection.create_index("page_number")
-        collection.create_index("chunk_id")
-        collection.create_index("source")
+        if collection is None:
+            client = MongoClient(MONGODB_URI)
+            collection = client[DB_NAME][COLLECTION_NAME]
+
+        ensure_indexes(collection)
+
+        def log_progress(stats):
+            done = stats["inserted"] + stats["updated"] + stats["unchanged"]
+            print(f"✅ Processed {done}/{total} chunks")
+
+        start_time = time.time()
+        stats = upsert_chunks(
+            collection,
+            documents,
+            batch_size=batch_size,
+            progress=log_progress,
+        )
+        print(
+            f"✅ {stats['inserted']} inserted, {stats['updated']} updated, "
+            f"{stats['unchanged']} unchanged in {time.time() - start_time:.2f}s"
+        )
+
+        if prune:
+            deleted = prune_missing_chunks(collection, SOURCE, stats["seen"])
+            print(f"🗑️ Removed {deleted} stale 12&12 chunks")
 
         print("""
 ✅ Twelve Steps and Twelve Traditions chunks successfully imported!
@@ -90,4 +133,11 @@ Next steps:
         return False
 
 if __name__ == "__main__":
-    ingest_to_mongodb()
\ No newline at end of file
+    args = parse_args()
+    ok = ingest_to_mongodb(
+        input_path=args.input,
+        batch_size=args.batch_size,
+        prune=args.prune,
+        jsonl=args.jsonl,
+    )
+    sys.exit(0 if ok else 1)
@@ -4,12 +4,27 @@ Test the RAG system with questions about the Twelve Steps and Twelve Traditions
 """
 
 import os
+import sys
 import json
+import argparse
 from openai import OpenAI
 from pymongo import MongoClient
 from dotenv import load_dotenv
 import time
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from raglib.artifacts import embedded_chunks_exist, truncate_embeddings
+from raglib.local_search import LocalVectorIndex, build_filter, search_local
+from raglib.lexical import DEFAULT_LEXICAL_INDEX_DIR, HYBRID_NUM_CANDIDATES_PER_RESULT, BM25Index, hybrid_search
+from raglib.ann_index import IVFIndex
+from raglib.quantization import QuantizedIndex
+from raglib.query_cache import DEFAULT_QUERY_CACHE_PATH, QueryEmbeddingCache
+from raglib.batch_search import add_batch_arguments, batch_search, read_queries
+from raglib.embedding_engine import EmbeddingEngine
+from raglib.rerank import add_rerank_arguments, rerank_candidates as default_rerank_candidates, reranker_from_args
+from raglib.stream import write_jsonl
+from raglib.vector_search import num_candidates_for, search_pipeline
+
 # Load environment variables
 load_dotenv()
 
@@ -21,6 +36,14 @@ client = MongoClient(os.getenv('MONGODB_URI'))
 db = client['dailyreflections']
 collection = db['text_chunks']
 
+EMBEDDING_MODEL = 'text-embedding-3-small'
+# Atlas query vectors are truncated to this size when the stored embeddings
+# were (run_pipeline.py --dimensions); local indexes truncate by themselves
+EMBEDDING_DIMENSIONS = int(os.getenv('EMBEDDING_DIMENSIONS', 0)) or None
+
+# Repeated questions skip the embeddings API; --query-cache persists it to disk
+query_cache = QueryEmbeddingCache()
+
 # Test queries
 TEST_QUERIES = [
     "What are the Twelve Steps?",
@@ -34,64 +57,156 @@ TEST_QUERIES = [
     "What is the primary purpose of an AA group?",
 ]
 
-def search_text_chunks(query, limit=5, min_score=0.65):
+# Embedding artifacts searched by --backend local
+DEFAULT_LOCAL_ARTIFACTS = [
+    "12_12_chunks_with_embeddings",
+    "../aa_chunks_with_openai_embeddings",
+]
+
+def embed_query(query):
+    """
+    Embedding for a query, served from query_cache when possible
+    """
+    def create_embedding(text):
+        response = openai.embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=text,
+        )
+        return response.data[0].embedding
+
+    if query_cache is None:
+        return create_embedding(query)
+    return query_cache.get_or_embed(EMBEDDING_MODEL, query, create_embedding)
+
+def search_text_chunks(
+    query,
+    limit=5,
+    min_score=0.65,
+    local_index=None,
+    source=None,
+    page_number=None,
+    query_embedding=None,
+    num_candidates=None,
+    text_chars=None,
+    lexical_index=None,
+    reranker=None,
+    rerank_candidates=None,
+):
     """
     Search for relevant text chunks using vector search
+    With local_index, the search runs in-process instead of on Atlas
+    query_embedding skips embedding the query (batch mode embeds up front)
+    text_chars truncates the returned text (Atlas only)
+    With lexical_index (a BM25Index), the vector results are fused with BM25
+    results; min_score then applies to the vector side only
+    With reranker, rerank_candidates results (default 4x limit) are fetched
+    and the reranker picks the top limit
     """
-    # Generate embedding for the query
-    response = openai.embeddings.create(
-        model='text-embedding-3-small',
-        input=query,
-    )
-    query_embedding = response.data[0].embedding
-
-    # Search for relevant chunks using vector search
-    pipeline = [
-        {
-            "$vectorSearch": {
-                "index": "text_vector_index",
-                "path": "embedding",
-                "queryVector": query_embedding,
-                "numCandidates": 100,
-                "limit": limit * 2,
-            },
-        },
-        # Project fields including the vector search score
-        {
-            "$project": {
-                "_id": 0,
-                "text": 1,
-                "page_number": 1,
-                "chunk_id": 1,
-                "source": 1,
-                "score": { "$meta": "vectorSearchScore" },
-            },
-        },
-        # Filter results above minimum score
-        {
-            "$match": {
-                "score": { "$gte": min_score }
-            },
-        },
-        # Sort by similarity score
-        {
-            "$sort": {
-                "score": -1,
-            },
-        },
-        # Limit results
-        {
-            "$limit": limit,
-        },
-    ]
-
-    results = list(collection.aggregate(pipeline))
+    # Generate embedding for the query (or reuse a cached one)
+    if query_embedding is None:
+        query_embedding = embed_query(query)
+    atlas_embedding = query_embedding
+    if EMBEDDING_DIMENSIONS and local_index is None:
+        atlas_embedding = truncate_embeddings(query_embedding, EMBEDDING_DIMENSIONS).tolist()
+
+    def vector_search(n, candidates=num_candidates):
+        if local_index is not None:
+            return search_local(
+                local_index,
+                query_embedding,
+                limit=n,
+                min_score=min_score,
+                source=source,
+                page_number=page_number,
+            )
+
+        # Filters run inside $vectorSearch; numCandidates is sized from limit
+        pipeline = search_pipeline(
+            atlas_embedding,
+            limit=n,
+            min_score=min_score,
+            source=source,
+            page_number=page_number,
+            num_candidates=candidates,
+            text_chars=text_chars,
+        )
+        return list(collection.aggregate(pipeline))
+
+    fetch = limit
+    if reranker is not None:
+        fetch = rerank_candidates or default_rerank_candidates(limit)
+
+    if lexical_index is None:
+        results = vector_search(fetch)
+    else:
+        # The BM25 side catches exact terms, so the vector side can scan fewer candidates
+        results = hybrid_search(
+            lexical_index,
+            query,
+            lambda n: vector_search(
+                n, num_candidates or num_candidates_for(n, per_result=HYBRID_NUM_CANDIDATES_PER_RESULT)
+            ),
+            limit=fetch,
+            filter=build_filter(source=source, page_number=page_number),
+        )
+
+    if reranker is not None:
+        results = reranker.rerank(query, results, limit=limit)
     return results
 
-def test_rag():
+def parse_args():
+    parser = argparse.ArgumentParser(description="Test RAG search over the 12&12 chunks.")
+    parser.add_argument(
+        "--backend",
+        choices=("atlas", "local"),
+        default="atlas",
+        help="Search with Atlas $vectorSearch or in-process over the embedding artifacts",
+    )
+    parser.add_argument(
+        "--artifact",
+        action="append",
+        default=None,
+        help="Embedding artifact for --backend local (repeatable)",
+    )
+    parser.add_argument(
+        "--ann-index",
+        default=None,
+        help="IVF index directory (python -m raglib.ann_index build) for approximate local search",
+    )
+    parser.add_argument(
+        "--quantized-index",
+        default=None,
+        help="Truncated/quantized index directory (python -m raglib.quantization build) for local search",
+    )
+    parser.add_argument(
+        "--query-cache",
+        nargs="?",
+        const=DEFAULT_QUERY_CACHE_PATH,
+        default=None,
+        help="Persist query embeddings to this SQLite file (default path if no value given)",
+    )
+    parser.add_argument("--no-query-cache", action="store_true", help="Always call the embeddings API")
+    parser.add_argument(
+        "--hybrid",
+        nargs="?",
+        const=DEFAULT_LEXICAL_INDEX_DIR,
+        default=None,
+        help="Fuse vector results with this BM25 index (python -m raglib.lexical build; default path if no value given)",
+    )
+    add_rerank_arguments(parser)
+    add_batch_arguments(parser)
+    parser.add_argument("--limit", type=int, default=5, help="Results per query in --batch mode")
+    parser.add_argument("--min-score", type=float, default=0.65, help="Minimum score in --batch mode")
+    parser.add_argument("--num-candidates", type=int, default=None, help="Atlas numCandidates (default: sized from --limit)")
+    parser.add_argument("--text-chars", type=int, default=None, help="Truncate returned text to this many characters (Atlas)")
+    return parser.parse_args()
+
+def test_rag(local_index=None, lexical_index=None, reranker=None, rerank_candidates=None):
     """
     Test the RAG system with sample questions
+    Returns the number of queries that failed
     """
+    failed = 0
     print("🔍 Testing RAG system with Twelve Steps and Twelve Traditions questions...\n")
 
     for i, query in enumerate(TEST_QUERIES, 1):
@@ -101,7 +216,14 @@ def test_rag():
         start_time = time.time()
         try:
             # Search for relevant chunks
-            results = search_text_chunks(query, limit=3)
+            results = search_text_chunks(
+                query,
+                limit=3,
+                local_index=local_index,
+                lexical_index=lexical_index,
+                reranker=reranker,
+                rerank_candidates=rerank_candidates,
+            )
             elapsed = time.time() - start_time
 
             print(f"Found {len(results)} relevant chunks in {elapsed:.2f} seconds\n")
@@ -121,9 +243,121 @@ def test_rag():
                 print(f"   \"{excerpt}\"\n")
 
         except Exception as e:
+            failed += 1
             print(f"❌ Error searching for query: {str(e)}")
 
-    print("\n✅ Testing complete!")
+    if query_cache is not None:
+        stats = query_cache.stats()
+        print(
+            f"\n💾 Query cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate'] * 100:.0f}% hit rate)"
+        )
+
+    if failed:
+        print(f"\n❌ Testing complete: {failed} of {len(TEST_QUERIES)} queries failed")
+    else:
+        print("\n✅ Testing complete!")
+    return failed
+
+def run_batch(
+    queries_path,
+    output_path=None,
+    limit=5,
+    min_score=0.65,
+    local_index=None,
+    concurrency=8,
+    num_candidates=None,
+    text_chars=None,
+    lexical_index=None,
+    reranker=None,
+    rerank_candidates=None,
+):
+    """
+    Answer every query in a file: one embedding pass, concurrent searches, JSONL out
+    """
+    records = read_queries(queries_path)
+    print(f"🔍 Answering {len(records)} queries from {queries_path}...", file=sys.stderr)
+
+    # Multi-input requests for the whole batch instead of one call per query
+    engine = EmbeddingEngine(model=EMBEDDING_MODEL, api_key=os.getenv('OPENAI_API_KEY'))
+
+    def search(query, query_embedding):
+        return search_text_chunks(
+            query,
+            limit=limit,
+            min_score=min_score,
+            local_index=local_index,
+            query_embedding=query_embedding,
+            num_candidates=num_candidates,
+            text_chars=text_chars,
+            lexical_index=lexical_index,
+            reranker=reranker,
+            rerank_candidates=rerank_candidates,
+        )
+
+    outputs, timings = batch_search(
+        records, engine, search, query_cache=query_cache, concurrency=concurrency
+    )
+
+    if output_path:
+        write_jsonl(output_path, outputs)
+    else:
+        for output in outputs:
+            print(json.dumps(output, ensure_ascii=False))
+
+    failed = sum(1 for output in outputs if "error" in output)
+    print(
+        f"✅ {len(outputs)} queries: embedding {timings['embed']:.2f}s "
+        f"({engine.stats['requests']} requests), searches {timings['search']:.2f}s"
+        + (f", {failed} failed" if failed else ""),
+        file=sys.stderr,
+    )
+    return failed == 0
 
 if __name__ == "__main__":
-    test_rag()
\ No newline at end of file
+    args = parse_args()
+    if args.no_query_cache:
+        query_cache = None
+    elif args.query_cache:
+        query_cache = QueryEmbeddingCache(persist_path=args.query_cache)
+    local_index = None
+    if args.backend == "local" and args.quantized_index:
+        local_index = QuantizedIndex.load(args.quantized_index)
+        print(
+            f"📚 Quantized index: {len(local_index)} chunks, "
+            f"{local_index.dimensions}-dim {local_index.kind} from {args.quantized_index}"
+        )
+    elif args.backend == "local":
+        artifacts = args.artifact or [path for path in DEFAULT_LOCAL_ARTIFACTS if embedded_chunks_exist(path)]
+        local_index = LocalVectorIndex.from_paths(artifacts)
+        print(f"📚 Local index: {len(local_index)} chunks from {', '.join(artifacts)}")
+        if args.ann_index:
+            local_index = IVFIndex.load(args.ann_index, local_index)
+            print(f"📚 Using IVF index {args.ann_index} ({local_index.nlist} lists)")
+    lexical_index = None
+    if args.hybrid:
+        lexical_index = BM25Index.load(args.hybrid)
+        print(f"📚 Hybrid search with BM25 index {args.hybrid} ({len(lexical_index)} chunks)", file=sys.stderr)
+    reranker = reranker_from_args(args)
+    if args.batch:
+        ok = run_batch(
+            args.batch,
+            output_path=args.output,
+            limit=args.limit,
+            min_score=args.min_score,
+            local_index=local_index,
+            concurrency=args.search_concurrency,
+            num_candidates=args.num_candidates,
+            text_chars=args.text_chars,
+            lexical_index=lexical_index,
+            reranker=reranker,
+            rerank_candidates=args.rerank_candidates,
+        )
+        sys.exit(0 if ok else 1)
+    failed = test_rag(
+        local_index=local_index,
+        lexical_index=lexical_index,
+        reranker=reranker,
+        rerank_candidates=args.rerank_candidates,
+    )
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""
+Run extract -> chunk -> embed -> ingest for the Twelve Steps and Twelve
+Traditions as one streaming, in-process pipeline
+Stages are chained generators with background prefetching, so PDF
+extraction, chunking, embedding requests and MongoDB writes overlap and
+only a batch of chunks is held in memory at a time
+"""
+
+import os
+import sys
+import time
+import argparse
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from raglib.chunking import TokenChunker
+from raglib.embedding_cache import add_cache_arguments, open_cache
+from raglib.embedding_engine import EmbeddingEngine, add_engine_arguments
+from raglib.ingest import ensure_indexes, prune_missing_chunks, upsert_chunks
+from raglib.sources import get_source
+from raglib.stream import chunk_pages, embed_chunks, extract_pages, prefetch, tee_jsonl
+
+# Load environment variables from .env file
+load_dotenv()
+
+TWELVE_AND_TWELVE = get_source("12-12")
+PDF_PATH = TWELVE_AND_TWELVE.pdf_path
+SOURCE = TWELVE_AND_TWELVE.label
+CHUNK_ID_PREFIX = TWELVE_AND_TWELVE.chunk_id_prefix
+DB_NAME = 'dailyreflections'
+COLLECTION_NAME = 'text_chunks'
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Streaming 12&12 RAG pipeline.")
+    parser.add_argument("--pdf", default=PDF_PATH, help="PDF to extract")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="PDF extraction processes")
+    parser.add_argument("--chunk-size", type=int, default=TWELVE_AND_TWELVE.chunk_size, help="Max tokens per chunk")
+    parser.add_argument("--overlap", type=int, default=TWELVE_AND_TWELVE.overlap, help="Tokens shared by consecutive chunks")
+    parser.add_argument("--ingest-batch-size", type=int, default=500, help="Documents per bulk_write")
+    parser.add_argument("--output-jsonl", default=None, help="Also write embedded chunk records to this JSONL file")
+    parser.add_argument("--no-ingest", action="store_true", help="Skip MongoDB (use with --output-jsonl)")
+    parser.add_argument("--prune", action="store_true", help="Delete 12&12 chunks not produced by this run")
+    add_engine_arguments(parser)
+    add_cache_arguments(parser)
+    return parser.parse_args()
+
+def build_pipeline(args, engine, cache):
+    """
+    Chain the stage generators; nothing runs until the result is consumed
+    """
+    chunker = TokenChunker(chunk_size=args.chunk_size, overlap=args.overlap, model=args.model)
+
+    pages = extract_pages(args.pdf, SOURCE, workers=args.workers)
+    chunks = prefetch(chunk_pages(pages, chunker, SOURCE, CHUNK_ID_PREFIX), depth=engine.batch_size)
+    embedded = prefetch(embed_chunks(chunks, engine, cache=cache), depth=args.ingest_batch_size)
+    if args.output_jsonl:
+        embedded = tee_jsonl(args.output_jsonl, embedded)
+    return embedded
+
+def run_pipeline(args):
+    print("🚀 Streaming Twelve Steps and Twelve Traditions pipeline...")
+
+    if not os.path.exists(args.pdf):
+        print(f"❌ Error: PDF file not found at {args.pdf}")
+        return False
+    if args.no_ingest and not args.output_jsonl:
+        print("❌ Error: --no-ingest needs --output-jsonl, otherwise the results go nowhere")
+        return False
+
+    mongodb_uri = os.getenv("MONGODB_URI")
+    if not args.no_ingest and not mongodb_uri:
+        print("❌ Error: MONGODB_URI not found in environment variables")
+        return False
+
+    cache = open_cache(args)
+    engine = EmbeddingEngine(
+        model=args.model,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        base_url=args.base_url,
+    )
+
+    try:
+        start_time = time.time()
+        embedded = build_pipeline(args, engine, cache)
+
+        if args.no_ingest:
+            count = sum(1 for _ in embedded)
+            print(f"✅ Wrote {count} embedded chunks to {args.output_jsonl}")
+        else:
+            collection = MongoClient(mongodb_uri)[DB_NAME][COLLECTION_NAME]
+            ensure_indexes(collection)
+
+            def log_progress(stats):
+                done = stats["inserted"] + stats["updated"] + stats["unchanged"]
+                print(f"✅ {done} chunks through the pipeline ({time.time() - start_time:.1f}s)")
+
+            stats = upsert_chunks(collection, embedded, batch_size=args.ingest_batch_size, progress=log_progress)
+            count = len(stats["seen"])
+            print(
+                f"✅ {stats['inserted']} inserted, {stats['updated']} updated, "
+                f"{stats['unchanged']} unchanged"
+            )
+            if args.prune:
+                deleted = prune_missing_chunks(collection, SOURCE, stats["seen"])
+                print(f"🗑️ Removed {deleted} stale 12&12 chunks")
+
+        elapsed = time.time() - start_time
+        print(f"⏱ {count} chunks in {elapsed:.2f}s ({engine.stats['requests']} embedding requests)")
+        if cache is not None:
+            print(f"💾 Embedding cache: {cache.hits} hits, {cache.misses} misses")
+        return True
+
+    except Exception as e:
+        print(f"❌ Pipeline failed: {str(e)}")
+        return False
+
+    finally:
+        if cache is not None:
+            cache.close()
+
+if __name__ == "__main__":
+    sys.exit(0 if run_pipeline(parse_args()) else 1)
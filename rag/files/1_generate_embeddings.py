@@ -1,31 +1,81 @@
+"""
+Generate embeddings for AA Big Book chunks with a local model
+Defaults to sentence-transformers all-MiniLM-L6-v2 (384 dimensions) on CPU.
+Chunks are encoded in large length-sorted batches, --processes shards them
+over a pool of worker processes, and the vectors are written straight into
+one preallocated float32 array
+Any provider works (--provider openai/sentence-transformers/onnx), and each
+chunk is tagged with the model and dimensions of its vector
+"""
 
-from sentence_transformers import SentenceTransformer
 import json
+import time
+import argparse
 
-# Load the model (only do this once)
-print("Loading embedding model...")
-model = SentenceTransformer('all-MiniLM-L6-v2')  # 384 dimensions
-# Alternative models:
+import numpy as np
+
+from raglib.artifacts import add_format_arguments, save_embedded_chunks
+from raglib.embedding_cache import add_cache_arguments, embed_with_cache, open_cache
+from raglib.embedding_providers import add_provider_arguments, provider_from_args
+
+# Alternative models (--model):
 # - 'all-mpnet-base-v2' (768 dim, more accurate but slower)
 # - 'multi-qa-MiniLM-L6-cos-v1' (384 dim, optimized for Q&A)
 
-# Load your chunks
-with open('/mnt/user-data/outputs/aa_chunks_token_based.json', 'r') as f:
-    chunks = json.load(f)
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate embeddings for AA Big Book chunks.")
+    parser.add_argument("--input", default="/mnt/user-data/outputs/aa_chunks_token_based.json", help="Chunks JSON file")
+    parser.add_argument(
+        "--output",
+        default="/mnt/user-data/outputs/aa_chunks_with_embeddings",
+        help="Output artifact path (.meta.json + .f32.npy, or .json with --format json)",
+    )
+    add_provider_arguments(parser, provider="sentence-transformers")
+    add_cache_arguments(parser)
+    add_format_arguments(parser)
+    return parser.parse_args()
+
+def generate_embeddings(input_path, output_path, provider, cache=None, output_format="npy"):
+    """
+    Embed the chunks in input_path and save them to output_path
+    Returns the number of chunks written
+    """
+    # Load your chunks
+    with open(input_path, 'r') as f:
+        chunks = json.load(f)
+
+    print(f"Generating embeddings for {len(chunks)} chunks with {provider.model}...")
+
+    def log_progress(done, total):
+        print(f"  Processed {done}/{total} chunks...")
+
+    start_time = time.time()
+    # Rows are filled in place, from the cache or the model
+    out = np.empty((len(chunks), provider.dimensions), dtype=np.float32) if provider.dimensions else None
+    embeddings = embed_with_cache(provider, cache, [chunk['text'] for chunk in chunks], progress=log_progress, out=out)
+
+    # Record which vector space each embedding belongs to
+    for chunk, embedding in zip(chunks, embeddings):
+        provider.tag(chunk, embedding)
 
-print(f"Generating embeddings for {len(chunks)} chunks...")
+    print(f"Embeddings generated in {time.time() - start_time:.2f}s!")
+    if cache is not None:
+        print(f"Embedding cache: {cache.hits} hits, {cache.misses} misses")
 
-# Add embeddings to each chunk
-for i, chunk in enumerate(chunks):
-    chunk['embedding'] = model.encode(chunk['text']).tolist()
-    
-    if (i + 1) % 50 == 0:
-        print(f"  Processed {i + 1}/{len(chunks)} chunks...")
+    # Save chunks with embeddings
+    written = save_embedded_chunks(output_path, chunks, embeddings, output_format=output_format, model=provider.model)
 
-print("Embeddings generated!")
+    print(f"Saved chunks with {provider.dimensions}-dim embeddings to {', '.join(written)}!")
+    return len(chunks)
 
-# Save chunks with embeddings
-with open('/mnt/user-data/outputs/aa_chunks_with_embeddings.json', 'w') as f:
-    json.dump(chunks, f, indent=2)
+if __name__ == "__main__":
+    args = parse_args()
 
-print("Saved chunks with embeddings!")
+    print("Loading embedding model...")
+    cache = open_cache(args)
+    try:
+        with provider_from_args(args) as provider:
+            generate_embeddings(args.input, args.output, provider, cache=cache, output_format=args.format)
+    finally:
+        if cache is not None:
+            cache.close()
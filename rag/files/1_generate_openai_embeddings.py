@@ -1,59 +1,86 @@
 """
 Generate OpenAI embeddings for AA Big Book chunks
 Uses the same embedding model as the Daily Reflections app
+Unchanged chunks are read back from the shared embedding cache
 """
 
 import os
 import json
 import time
-from openai import OpenAI
+import argparse
 from dotenv import load_dotenv
 
+from raglib.embedding_engine import EmbeddingEngine, add_engine_arguments
+from raglib.embedding_cache import add_cache_arguments, embed_with_cache, open_cache
+from raglib.artifacts import add_format_arguments, save_embedded_chunks
+from raglib.sources import get_source
+
 # Load environment variables from .env file
 load_dotenv()
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+SOURCE = get_source('bigbook').label
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate OpenAI embeddings for AA Big Book chunks.")
+    # Use token-based chunks (preferred based on README)
+    parser.add_argument("--input", default="aa_chunks_token_based.json", help="Chunks JSON file")
+    parser.add_argument(
+        "--output",
+        default="aa_chunks_with_openai_embeddings",
+        help="Output artifact path (.meta.json + .f32.npy, or .json with --format json)",
+    )
+    add_engine_arguments(parser)
+    add_cache_arguments(parser)
+    add_format_arguments(parser)
+    return parser.parse_args()
+
+def generate_openai_embeddings(input_path, output_path, engine, cache=None, output_format="npy"):
+    """
+    Embed the chunks in input_path and save them to output_path
+    Returns the number of chunks written
+    """
+    # Load your chunks
+    with open(input_path, 'r') as f:
+        chunks = json.load(f)
+
+    print(f"Generating embeddings for {len(chunks)} chunks...")
+
+    def log_progress(done, total):
+        print(f"  Embedded {done}/{total} uncached chunks...")
+
+    start_time = time.time()
+    embeddings = embed_with_cache(engine, cache, [chunk['text'] for chunk in chunks], progress=log_progress)
+
+    # Add source field for consistency with the search function, and tag the vector space
+    for chunk, embedding in zip(chunks, embeddings):
+        chunk['source'] = SOURCE
+        chunk['embedding_model'] = engine.model
+        chunk['dimensions'] = len(embedding)
+
+    print(f"Embeddings generated in {time.time() - start_time:.2f}s!")
+    if cache is not None:
+        print(f"Embedding cache: {cache.hits} hits, {cache.misses} misses")
+
+    # Save chunks with embeddings
+    written = save_embedded_chunks(output_path, chunks, embeddings, output_format=output_format, model=engine.model)
 
-# Load your chunks - use token-based chunks (preferred based on README)
-with open('aa_chunks_token_based.json', 'r') as f:
-    chunks = json.load(f)
+    print(f"Saved chunks with OpenAI embeddings to {', '.join(written)}!")
+    return len(chunks)
 
-print(f"Generating embeddings for {len(chunks)} chunks...")
+if __name__ == "__main__":
+    args = parse_args()
 
-# Add embeddings to each chunk
-for i, chunk in enumerate(chunks):
+    # Initialize the embedding engine (OpenAI client with batching and backoff)
+    engine = EmbeddingEngine(
+        model=args.model,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        api_key=os.getenv('OPENAI_API_KEY'),
+        base_url=args.base_url,
+    )
+    cache = open_cache(args)
     try:
-        # Generate embeddings using OpenAI's text-embedding-3-small model (same as Daily Reflections)
-        response = client.embeddings.create(
-            model="text-embedding-3-small",
-            input=chunk['text']
-        )
-
-        # Extract the embedding from the response
-        chunk['embedding'] = response.data[0].embedding
-
-        # Add source field for consistency with the search function
-        chunk['source'] = 'AA Big Book 4th Edition'
-
-        # Log progress and add delay to avoid rate limiting
-        if (i + 1) % 25 == 0:
-            print(f"  Processed {i + 1}/{len(chunks)} chunks...")
-            time.sleep(0.5)  # Small delay to avoid hitting rate limits
-
-    except Exception as e:
-        print(f"Error generating embedding for chunk {i}: {e}")
-        # Wait longer if we hit a rate limit
-        if "rate_limit" in str(e).lower():
-            print("Rate limit hit, waiting 60 seconds...")
-            time.sleep(60)
-            # Retry this chunk
-            i -= 1
-
-print("Embeddings generated!")
-
-# Save chunks with embeddings
-with open('aa_chunks_with_openai_embeddings.json', 'w') as f:
-    json.dump(chunks, f, indent=2)
-
-print("Saved chunks with OpenAI embeddings!")
\ No newline at end of file
+        generate_openai_embeddings(args.input, args.output, engine, cache=cache, output_format=args.format)
+    finally:
+        if cache is not None:
+            cache.close()
@@ -4,44 +4,62 @@ Uses the same MongoDB database as the main application
 """
 
 import os
+import argparse
 from pymongo import MongoClient
-import json
 from dotenv import load_dotenv
 
+from raglib.artifacts import load_embedded_chunks
+from raglib.sources import get_source
+from raglib.ingest import DEFAULT_BATCH_SIZE, add_ingest_arguments, ensure_indexes, prune_missing_chunks, upsert_chunks
+
 # Load environment variables from .env file
 load_dotenv()
 
-# Connect to MongoDB
-MONGODB_URI = os.getenv("MONGODB_URI")
-client = MongoClient(MONGODB_URI)
+SOURCE = get_source("bigbook").label
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Ingest AA Big Book chunks into MongoDB.")
+    parser.add_argument("--input", default="aa_chunks_with_openai_embeddings", help="Embedding artifact path")
+    add_ingest_arguments(parser)
+    return parser.parse_args()
+
+def ingest_big_book(input_path, batch_size=DEFAULT_BATCH_SIZE, prune=False, collection=None):
+    """
+    Upsert the embedded Big Book chunks; returns the upsert_chunks stats
+    """
+    if collection is None:
+        # Connect to MongoDB
+        client = MongoClient(os.getenv("MONGODB_URI"))
+
+        # Select database and collection - use the same DB as the Daily Reflections app
+        db = client['dailyreflections']
+        collection = db['text_chunks']  # Collection for AA Big Book chunks
 
-# Select database and collection - use the same DB as the Daily Reflections app
-db = client['dailyreflections']
-collection = db['text_chunks']  # Collection for AA Big Book chunks
+    # Load chunks with embeddings (.meta.json + .f32.npy artifact, or the legacy .json)
+    artifact = load_embedded_chunks(input_path)
 
-# Load chunks with embeddings
-with open('aa_chunks_with_openai_embeddings.json', 'r') as f:
-    chunks = json.load(f)
+    print(f"Upserting {len(artifact)} AA Big Book chunks into MongoDB...")
 
-print(f"Inserting {len(chunks)} AA Big Book chunks into MongoDB...")
+    # Create indexes for better performance (and for the upsert lookups)
+    ensure_indexes(collection)
 
-# Check if chunks already exist - clean up if needed
-existing_chunks = collection.count_documents({"source": "AA Big Book 4th Edition"})
-if existing_chunks > 0:
-    print(f"Found {existing_chunks} existing AA Big Book chunks. Removing them before insertion...")
-    collection.delete_many({"source": "AA Big Book 4th Edition"})
+    # Upsert in batches - unchanged chunks are skipped and existing chunks stay
+    # searchable for the whole run
+    stats = upsert_chunks(collection, artifact.iter_documents(), batch_size=batch_size)
+    print(f"Inserted {stats['inserted']}, updated {stats['updated']}, skipped {stats['unchanged']} unchanged documents!")
 
-# Insert into MongoDB
-result = collection.insert_many(chunks)
-print(f"Inserted {len(result.inserted_ids)} documents!")
+    if prune:
+        deleted = prune_missing_chunks(collection, SOURCE, stats["seen"])
+        print(f"Removed {deleted} stale AA Big Book chunks")
 
-# Create indexes for better performance
-collection.create_index("page_number")
-collection.create_index("chunk_id")
+    print("Collection ready!")
+    return stats
 
-print("Collection ready!")
+if __name__ == "__main__":
+    args = parse_args()
+    ingest_big_book(args.input, batch_size=args.batch_size, prune=args.prune)
 
-print("""
+    print("""
 Next steps:
 1. Create a vector search index in MongoDB Atlas:
    - Go to your MongoDB Atlas cluster
@@ -51,4 +69,4 @@ Next steps:
    - Paste the contents from the 3_vector_search_index_modified.json file
    - Name it 'text_vector_index'
 2. Test the chatbot functionality with questions about the AA Big Book
-""")
\ No newline at end of file
+""")
@@ -1,6 +1,6 @@
-
 from pymongo import MongoClient
-import json
+
+from raglib.artifacts import load_embedded_chunks
 
 # Connect to MongoDB
 MONGODB_URI = "your_mongodb_connection_string_here"
@@ -10,13 +10,12 @@ client = MongoClient(MONGODB_URI)
 db = client['aa_rag_database']
 collection = db['text_chunks']
 
-# Load chunks with embeddings
-with open('/mnt/user-data/outputs/aa_chunks_with_embeddings.json', 'r') as f:
-    chunks = json.load(f)
+# Load chunks with embeddings (artifact or legacy JSON from 1_generate_embeddings.py)
+artifact = load_embedded_chunks('/mnt/user-data/outputs/aa_chunks_with_embeddings')
 
-# Insert into MongoDB
-print(f"Inserting {len(chunks)} chunks into MongoDB...")
-result = collection.insert_many(chunks)
+# Insert into MongoDB; each document keeps its embedding_model and dimensions tags
+print(f"Inserting {len(artifact)} {artifact.model} chunks into MongoDB...")
+result = collection.insert_many(list(artifact.iter_documents()))
 print(f"Inserted {len(result.inserted_ids)} documents!")
 
 # Create indexes for better performance
@@ -1,54 +1,76 @@
 
-from sentence_transformers import SentenceTransformer
+from typing import Dict, List, Optional
+
 from pymongo import MongoClient
 
-# Initialize
-model = SentenceTransformer('all-MiniLM-L6-v2')
+from raglib.context import DEFAULT_CONTEXT_TOKENS, format_context, pack_context
+from raglib.embedding_providers import EmbeddingProvider, SentenceTransformerProvider
+from raglib.local_search import LocalVectorIndex
+from raglib.rerank import Reranker, rerank_candidates
+from raglib.vector_search import vector_search_pipeline
+
+# Initialize; queries must use the model the chunks were embedded with
+provider: EmbeddingProvider = SentenceTransformerProvider('all-MiniLM-L6-v2')
 client = MongoClient("your_mongodb_uri")
 collection = client['aa_rag_database']['text_chunks']
 
-def query_rag(user_question: str, num_results: int = 5):
+# To search offline, load the embedding artifact into a local index instead:
+# local_index = LocalVectorIndex.from_paths(['aa_chunks_with_embeddings'])
+local_index: Optional[LocalVectorIndex] = None
+
+# To send fewer, better chunks to the LLM, rerank a larger candidate set:
+# reranker = Reranker(time_budget=0.2)
+reranker: Optional[Reranker] = None
+
+def atlas_pipeline(query_embedding: List[float], num_results: int):
+    """
+    $vectorSearch pipeline (numCandidates sized from num_results)
+    """
+    return vector_search_pipeline(
+        query_embedding,
+        limit=num_results,
+        fields=("text", "page_number", "chunk_id"),
+        index=provider.index_name,
+    )
+
+def query_rag(
+    user_question: str,
+    num_results: int = 5,
+    index: Optional[LocalVectorIndex] = None,
+    reranker: Optional[Reranker] = None,
+):
     """
     Query the RAG system and return relevant chunks.
+    With a LocalVectorIndex, the search runs in-process instead of on Atlas.
+    With a Reranker, more candidates are fetched and reranked down to num_results.
+    A local index must hold vectors from the provider's model.
     """
     # 1. Generate embedding for the question
-    query_embedding = model.encode(user_question).tolist()
-    
+    query_embedding = provider.embed_query(user_question)
+    fetch = rerank_candidates(num_results) if reranker is not None else num_results
+
     # 2. Perform vector search
-    pipeline = [
-        {
-            "$vectorSearch": {
-                "index": "vector_index",
-                "path": "embedding",
-                "queryVector": query_embedding,
-                "numCandidates": 100,  # Number of candidates to consider
-                "limit": num_results    # Top results to return
-            }
-        },
-        {
-            "$project": {
-                "_id": 0,
-                "text": 1,
-                "page_number": 1,
-                "chunk_id": 1,
-                "score": { "$meta": "vectorSearchScore" }
-            }
-        }
-    ]
-    
-    results = list(collection.aggregate(pipeline))
+    if index is not None:
+        provider.check_index(index)
+        results = index.search(query_embedding, limit=fetch)
+    else:
+        results = list(collection.aggregate(atlas_pipeline(query_embedding, fetch)))
+
+    # 3. Optionally rerank the candidates
+    if reranker is not None:
+        results = reranker.rerank(user_question, results, limit=num_results)
     return results
 
-def generate_answer(question: str, context_chunks: List[Dict]):
+def generate_answer(question: str, context_chunks: List[Dict], token_budget: int = DEFAULT_CONTEXT_TOKENS):
     """
     Generate answer using retrieved context.
     You would typically send this to an LLM like GPT-4 or Claude.
+    Overlapping chunks are merged and deduplicated, and the most relevant
+    text is packed into token_budget tokens of context.
     """
     # Combine context
-    context = "\n\n".join([
-        f"[Page {chunk['page_number']}] {chunk['text']}"
-        for chunk in context_chunks
-    ])
+    passages = pack_context(context_chunks, token_budget=token_budget)
+    context = format_context(passages)
     
     # Create prompt for LLM
     prompt = f"""Based on the following excerpts from the AA Big Book, please answer the question.
@@ -67,7 +89,7 @@ question = "What are the 12 steps of Alcoholics Anonymous?"
 print(f"Question: {question}\n")
 
 # Retrieve relevant chunks
-relevant_chunks = query_rag(question, num_results=5)
+relevant_chunks = query_rag(question, num_results=5, index=local_index, reranker=reranker)
 
 print(f"Found {len(relevant_chunks)} relevant chunks:\n")
 for i, chunk in enumerate(relevant_chunks, 1):
@@ -0,0 +1,5 @@
+"""
+Shared helpers for the RAG ingestion and search scripts in rag/files
+The numbered scripts stay the entry points; this package holds the pieces
+they have in common so the Big Book and 12&12 pipelines don't drift apart
+"""
@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+"""
+Approximate nearest-neighbour (IVF) index for the local retriever
+Chunk vectors are clustered with spherical k-means; a query only scores the
+chunks in the clusters closest to it. Every inverted list is stored
+contiguously in a float32 .npy file, so probing a list reads one slice of
+a memory-mapped matrix
+
+num_candidates mirrors Atlas' numCandidates: lists are probed, nearest
+centroid first, until at least that many chunks have been scored. With a
+filter, only matching chunks are scored and counted
+
+Usage:
+  python -m raglib.ann_index build --artifact 12-12/12_12_chunks_with_embeddings \
+      --artifact aa_chunks_with_openai_embeddings --output ivf_index
+  python -m raglib.ann_index recall --index ivf_index \
+      --artifact 12-12/12_12_chunks_with_embeddings --artifact aa_chunks_with_openai_embeddings
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from raglib.local_search import LocalVectorIndex, RESULT_FIELDS, cosine_to_score
+
+FORMAT_VERSION = "raglib-ivf/1"
+DEFAULT_NUM_CANDIDATES = 100
+# Filter masks kept per index, keyed on the filter
+FILTER_CACHE_SIZE = 64
+
+
+def _normalize_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def default_nlist(count):
+    """
+    About 4 * sqrt(N) lists, the usual IVF starting point
+    """
+    return max(1, min(count, int(round(4 * math.sqrt(count)))))
+
+
+def spherical_kmeans(vectors, nlist, iterations=20, sample_size=None, seed=0):
+    """
+    k-means on unit vectors using dot-product assignment
+    Trains on a sample of at most sample_size rows (default 256 per list)
+    """
+    rng = np.random.default_rng(seed)
+    count = vectors.shape[0]
+    sample_size = sample_size or nlist * 256
+    if count > sample_size:
+        training = vectors[np.sort(rng.choice(count, sample_size, replace=False))]
+    else:
+        training = vectors
+
+    if not 1 <= nlist <= training.shape[0]:
+        raise ValueError(f"nlist must be between 1 and the {training.shape[0]} training vectors, got {nlist}")
+    centroids = training[rng.choice(training.shape[0], nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(training @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, training)
+        counts = np.bincount(assignment, minlength=nlist)
+
+        empty = counts == 0
+        if empty.any():
+            # Reseed empty lists from random training rows
+            sums[empty] = training[rng.choice(training.shape[0], int(empty.sum()))]
+        centroids = _normalize_rows(sums)
+
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file index over the chunks of a LocalVectorIndex
+    Returns results in the same shape and score scale as LocalVectorIndex
+    """
+
+    def __init__(self, base, centroids, offsets, ids, vectors):
+        self.base = base
+        self.centroids = centroids
+        self.offsets = offsets
+        self.ids = ids
+        self.vectors = vectors
+        self._filter_masks = OrderedDict()
+
+    @property
+    def nlist(self):
+        return self.centroids.shape[0]
+
+    @classmethod
+    def build(cls, base, nlist=None, iterations=20, seed=0):
+        """
+        Cluster every chunk vector of base into nlist inverted lists
+        nlist is capped at the number of chunks
+        """
+        matrix = _normalize_rows(
+            np.concatenate([artifact.embeddings for artifact, _ in base.parts])
+        )
+        if matrix.shape[0] == 0:
+            raise ValueError("Can't build an IVF index over no chunks")
+        nlist = min(nlist or default_nlist(matrix.shape[0]), matrix.shape[0])
+        centroids = spherical_kmeans(matrix, nlist, iterations=iterations, seed=seed)
+
+        assignment = np.argmax(matrix @ centroids.T, axis=1)
+        ids = np.argsort(assignment, kind="stable").astype(np.int64)
+        counts = np.bincount(assignment, minlength=nlist)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        vectors = np.ascontiguousarray(matrix[ids])
+        return cls(base, centroids, offsets, ids, vectors)
+
+    def save(self, directory, artifact_paths=None):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "centroids.f32.npy"), self.centroids)
+        np.save(os.path.join(directory, "offsets.npy"), self.offsets)
+        np.save(os.path.join(directory, "ids.npy"), self.ids)
+        np.save(os.path.join(directory, "vectors.f32.npy"), self.vectors)
+        with open(os.path.join(directory, "ivf.meta.json"), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "format": FORMAT_VERSION,
+                    "count": int(self.ids.shape[0]),
+                    "dimensions": int(self.vectors.shape[1]),
+                    "nlist": int(self.nlist),
+                    "artifacts": list(artifact_paths or []),
+                },
+                f,
+                indent=2,
+            )
+
+    @classmethod
+    def load(cls, directory, base):
+        """
+        Load an index built over the same chunks as base; arrays are mmap'd
+        """
+        with open(os.path.join(directory, "ivf.meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format in {directory}: {meta.get('format')}")
+        if meta["count"] != len(base) or meta["dimensions"] != base.dimensions:
+            raise ValueError(
+                f"Index in {directory} was built over {meta['count']} x {meta['dimensions']} "
+                f"vectors, artifacts have {len(base)} x {base.dimensions}; rebuild it"
+            )
+
+        def load_array(name):
+            return np.load(os.path.join(directory, name), mmap_mode="r")
+
+        return cls(
+            base,
+            np.asarray(load_array("centroids.f32.npy")),
+            np.asarray(load_array("offsets.npy")),
+            load_array("ids.npy"),
+            load_array("vectors.f32.npy"),
+        )
+
+    def list_filter(self, filter):
+        """
+        (mask over rows in list order, matching rows per list) for a filter
+        Cached, so a repeated filter isn't evaluated over every chunk again
+        """
+        key = json.dumps(filter, sort_keys=True, default=str)
+        cached = self._filter_masks.get(key)
+        if cached is not None:
+            self._filter_masks.move_to_end(key)
+            return cached
+        mask = self.base.filter_mask(filter)[self.ids]
+        matched = np.concatenate([[0], np.cumsum(mask)])
+        cached = mask, matched[self.offsets[1:]] - matched[self.offsets[:-1]]
+        self._filter_masks[key] = cached
+        while len(self._filter_masks) > FILTER_CACHE_SIZE:
+            self._filter_masks.popitem(last=False)
+        return cached
+
+    def probe_lists(self, query, num_candidates=DEFAULT_NUM_CANDIDATES, nprobe=None, sizes=None):
+        """
+        Lists to scan, nearest centroid first
+        nprobe fixes the number of lists; otherwise enough lists are taken to
+        cover num_candidates chunks. sizes (default: list lengths) is the
+        number of chunks each list contributes; lists contributing none are
+        skipped
+        """
+        if sizes is None:
+            sizes = np.diff(self.offsets)
+        order = np.argsort(-(self.centroids @ query))
+        order = order[sizes[order] > 0]
+        if nprobe is not None:
+            return order[:max(1, nprobe)]
+        covered = np.searchsorted(np.cumsum(sizes[order]), num_candidates) + 1
+        return order[:min(len(order), max(1, covered))]
+
+    def search(
+        self,
+        query_embedding,
+        limit=5,
+        min_score=None,
+        filter=None,
+        num_candidates=DEFAULT_NUM_CANDIDATES,
+        nprobe=None,
+        fields=RESULT_FIELDS,
+    ):
+        query = self.base.fit_query(query_embedding)
+        query = query / (float(np.linalg.norm(query)) or 1.0)
+
+        mask = sizes = None
+        if filter:
+            # Probe until num_candidates matching chunks have been scored
+            mask, sizes = self.list_filter(filter)
+        lists = self.probe_lists(query, num_candidates=num_candidates, nprobe=nprobe, sizes=sizes)
+        candidate_ids = []
+        candidate_scores = []
+        for list_id in lists:
+            start, end = self.offsets[list_id], self.offsets[list_id + 1]
+            if mask is None:
+                rows = slice(start, end)
+            else:
+                rows = start + np.flatnonzero(mask[start:end])
+            candidate_ids.append(self.ids[rows])
+            candidate_scores.append(self.vectors[rows] @ query)
+        if not candidate_ids:
+            return []
+
+        ids = np.concatenate(candidate_ids)
+        scores = cosine_to_score(np.concatenate(candidate_scores))
+
+        if min_score is not None:
+            keep = scores >= min_score
+            ids, scores = ids[keep], scores[keep]
+        if len(ids) == 0 or limit <= 0:
+            return []
+
+        order = np.argsort(-scores, kind="stable")[:limit]
+        results = []
+        for i in order:
+            chunk = self.base.chunks[ids[i]]
+            result = {field: chunk[field] for field in fields if field in chunk}
+            result["score"] = float(scores[i])
+            results.append(result)
+        return results
+
+
+def recall_report(base, index, ks=(1, 5, 10), num_candidates_values=(25, 50, 100, 200), queries=200, seed=0):
+    """
+    Recall@k of the IVF index against exact search, plus mean latency
+    Queries are chunk vectors sampled from the corpus with a little noise
+    added, so each query's exact neighbours aren't simply itself
+    """
+    rng = np.random.default_rng(seed)
+    matrix = np.concatenate([artifact.embeddings for artifact, _ in base.parts])
+    sample = rng.choice(matrix.shape[0], min(queries, matrix.shape[0]), replace=False)
+    query_vectors = _normalize_rows(matrix[sample])
+    query_vectors = _normalize_rows(
+        query_vectors + rng.normal(0, 0.02, query_vectors.shape).astype(np.float32)
+    )
+    max_k = max(ks)
+
+    def ids_of(results):
+        return [(result.get("source"), result.get("chunk_id")) for result in results]
+
+    start = time.perf_counter()
+    exact = [ids_of(base.search(q, limit=max_k)) for q in query_vectors]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(query_vectors)
+
+    report = {
+        "chunks": len(base),
+        "nlist": int(index.nlist),
+        "queries": len(query_vectors),
+        "exact_ms": exact_ms,
+        "runs": [],
+    }
+    for num_candidates in num_candidates_values:
+        start = time.perf_counter()
+        approximate = [
+            ids_of(index.search(q, limit=max_k, num_candidates=num_candidates))
+            for q in query_vectors
+        ]
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(query_vectors)
+        recalls = {}
+        for k in ks:
+            hits = sum(
+                len(set(a[:k]) & set(e[:k])) / max(1, len(e[:k]))
+                for a, e in zip(approximate, exact)
+            )
+            recalls[f"recall@{k}"] = hits / len(query_vectors)
+        report["runs"].append({"num_candidates": num_candidates, "ms": elapsed_ms, **recalls})
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and evaluate the IVF ANN index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Build an index from embedding artifacts")
+    build.add_argument("--artifact", action="append", required=True)
+    build.add_argument("--output", required=True, help="Index directory")
+    build.add_argument("--nlist", type=int, default=None, help="Number of inverted lists")
+    build.add_argument("--iterations", type=int, default=20)
+
+    recall = subparsers.add_parser("recall", help="Recall@k report against exact search")
+    recall.add_argument("--index", required=True, help="Index directory")
+    recall.add_argument("--artifact", action="append", required=True)
+    recall.add_argument("--queries", type=int, default=200)
+    recall.add_argument(
+        "--num-candidates",
+        type=int,
+        nargs="+",
+        default=[25, 50, 100, 200],
+        help="numCandidates values to sweep",
+    )
+    recall.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    args = parser.parse_args()
+    base = LocalVectorIndex.from_paths(args.artifact)
+
+    if args.command == "build":
+        start = time.perf_counter()
+        index = IVFIndex.build(base, nlist=args.nlist, iterations=args.iterations)
+        index.save(args.output, artifact_paths=args.artifact)
+        print(
+            f"✅ Indexed {len(base)} chunks into {index.nlist} lists in "
+            f"{time.perf_counter() - start:.2f}s -> {args.output}"
+        )
+        return
+
+    index = IVFIndex.load(args.index, base)
+    report = recall_report(
+        base, index, num_candidates_values=args.num_candidates, queries=args.queries
+    )
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(
+        f"📊 {report['chunks']} chunks, {report['nlist']} lists, {report['queries']} queries, "
+        f"exact search {report['exact_ms']:.3f} ms/query"
+    )
+    for run in report["runs"]:
+        recalls = ", ".join(
+            f"{key} {value:.3f}" for key, value in run.items() if key.startswith("recall@")
+        )
+        print(f"   numCandidates {run['num_candidates']:>5}: {run['ms']:.3f} ms/query, {recalls}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+"""
+Columnar embedding artifacts
+A chunk set with embeddings is stored as two files sharing a stem:
+  <stem>.meta.json  - chunk metadata (text, chunk_id, page_number, source, ...)
+  <stem>.f32.npy    - contiguous float32 matrix, one row per chunk
+The matrix is memory-mapped on load, so downstream stages read vectors
+without parsing or copying them
+
+Convert an existing JSON artifact:
+  python -m raglib.artifacts convert aa_chunks_with_openai_embeddings.json
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+FORMAT_VERSION = "raglib-embeddings/1"
+META_SUFFIX = ".meta.json"
+VECTORS_SUFFIX = ".f32.npy"
+
+
+def artifact_stem(path):
+    """
+    Strip any known artifact/JSON suffix so a stem, a legacy .json path or
+    either half of an artifact all resolve to the same stem
+    """
+    for suffix in (META_SUFFIX, VECTORS_SUFFIX, ".json"):
+        if path.endswith(suffix):
+            return path[: -len(suffix)]
+    return path
+
+
+def artifact_paths(path):
+    stem = artifact_stem(path)
+    return stem + META_SUFFIX, stem + VECTORS_SUFFIX
+
+
+def artifact_exists(path):
+    meta_path, vectors_path = artifact_paths(path)
+    return os.path.exists(meta_path) and os.path.exists(vectors_path)
+
+
+class EmbeddingArtifact:
+    """
+    Chunk metadata plus an (N, D) float32 embedding matrix
+    Row i of embeddings belongs to chunks[i]
+    truncated_from is the model's full dimension count when the vectors
+    were shortened (truncate_embeddings)
+    """
+
+    def __init__(self, chunks, embeddings, model=None, truncated_from=None):
+        if len(chunks) != embeddings.shape[0]:
+            raise ValueError(
+                f"{len(chunks)} chunks but {embeddings.shape[0]} embedding rows"
+            )
+        self.chunks = chunks
+        self.embeddings = embeddings
+        self.model = model
+        self.truncated_from = truncated_from
+
+    def __len__(self):
+        return len(self.chunks)
+
+    @property
+    def dimensions(self):
+        return int(self.embeddings.shape[1]) if self.embeddings.ndim == 2 else 0
+
+    def iter_documents(self):
+        """
+        Yield chunk dicts with an 'embedding' list, one row at a time
+        """
+        for chunk, row in zip(self.chunks, self.embeddings):
+            document = dict(chunk)
+            document["embedding"] = row.tolist()
+            yield document
+
+
+def _as_matrix(embeddings):
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim == 1 and matrix.size == 0:
+        matrix = matrix.reshape(0, 0)
+    if matrix.ndim != 2:
+        raise ValueError("embeddings must be a 2-D array or a list of equal-length vectors")
+    return np.ascontiguousarray(matrix)
+
+
+def truncate_embeddings(embeddings, dimensions):
+    """
+    First `dimensions` components of each vector, renormalized to unit
+    length. text-embedding-3 vectors are trained so that this prefix is
+    itself a usable embedding (what the API's `dimensions` option returns)
+    Works on one vector or a matrix
+    """
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    if dimensions > vectors.shape[-1]:
+        raise ValueError(f"Can't truncate {vectors.shape[-1]}-dim embeddings to {dimensions}")
+    vectors = vectors[..., :dimensions]
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(vectors / norms, dtype=np.float32)
+
+
+def write_artifact(path, chunks, embeddings, model=None, truncated_from=None):
+    """
+    Write chunks and their embeddings as a columnar artifact
+    Any 'embedding' key on the chunk dicts is dropped from the metadata
+    """
+    meta_path, vectors_path = artifact_paths(path)
+    matrix = _as_matrix(embeddings)
+    metadata = [
+        {key: value for key, value in chunk.items() if key != "embedding"}
+        for chunk in chunks
+    ]
+    if len(metadata) != matrix.shape[0]:
+        raise ValueError(f"{len(metadata)} chunks but {matrix.shape[0]} embedding rows")
+
+    # Write to temp files and rename so readers never see half an artifact
+    tmp_vectors = vectors_path + ".tmp"
+    with open(tmp_vectors, "wb") as f:
+        np.save(f, matrix)
+    meta = {
+        "format": FORMAT_VERSION,
+        "model": model,
+        "count": matrix.shape[0],
+        "dimensions": matrix.shape[1],
+    }
+    if truncated_from:
+        meta["truncated_from"] = truncated_from
+    meta["chunks"] = metadata
+    tmp_meta = meta_path + ".tmp"
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_vectors, vectors_path)
+    os.replace(tmp_meta, meta_path)
+    return meta_path, vectors_path
+
+
+def load_artifact(path, mmap=True):
+    """
+    Load a columnar artifact; the matrix is memory-mapped read-only by default
+    """
+    meta_path, vectors_path = artifact_paths(path)
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format in {meta_path}: {meta.get('format')}")
+
+    embeddings = np.load(vectors_path, mmap_mode="r" if mmap else None)
+    if embeddings.dtype != np.float32:
+        raise ValueError(f"Expected float32 embeddings in {vectors_path}, got {embeddings.dtype}")
+    return EmbeddingArtifact(
+        meta["chunks"],
+        embeddings,
+        model=meta.get("model"),
+        truncated_from=meta.get("truncated_from"),
+    )
+
+
+def load_json_chunks(json_path):
+    """
+    Read a legacy chunks-with-embeddings JSON file into an in-memory artifact
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        chunks = json.load(f)
+    embeddings = _as_matrix([chunk["embedding"] for chunk in chunks])
+    model = chunks[0].get("embedding_model") if chunks else None
+    truncated_from = chunks[0].get("truncated_from") if chunks else None
+    metadata = [
+        {key: value for key, value in chunk.items() if key not in ("embedding", "truncated_from")}
+        for chunk in chunks
+    ]
+    return EmbeddingArtifact(metadata, embeddings, model=model, truncated_from=truncated_from)
+
+
+def load_embedded_chunks(path, mmap=True):
+    """
+    Load chunks with embeddings from whichever form exists for path
+    The columnar artifact is preferred; a legacy JSON file is the fallback
+    """
+    if artifact_exists(path):
+        return load_artifact(path, mmap=mmap)
+    json_path = artifact_stem(path) + ".json"
+    if os.path.exists(json_path):
+        return load_json_chunks(json_path)
+    raise FileNotFoundError(f"No embedding artifact or JSON file found for {path}")
+
+
+def embedded_chunks_exist(path):
+    return artifact_exists(path) or os.path.exists(artifact_stem(path) + ".json")
+
+
+def save_embedded_chunks(path, chunks, embeddings, output_format="npy", model=None, truncated_from=None):
+    """
+    Save chunks with embeddings as a columnar artifact ("npy") or legacy JSON
+    Returns the list of files written
+    """
+    if output_format == "json":
+        json_path = artifact_stem(path) + ".json"
+        documents = []
+        for chunk, embedding in zip(chunks, embeddings):
+            document = dict(chunk)
+            document["embedding"] = (
+                embedding.tolist() if hasattr(embedding, "tolist") else list(embedding)
+            )
+            # JSON has no header, so each document records the full size
+            if truncated_from:
+                document["truncated_from"] = truncated_from
+            documents.append(document)
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(documents, f, indent=2)
+        return [json_path]
+    return list(write_artifact(path, chunks, embeddings, model=model, truncated_from=truncated_from))
+
+
+def add_format_arguments(parser):
+    parser.add_argument(
+        "--format",
+        choices=("npy", "json"),
+        default="npy",
+        help="Output as a float32 .npy artifact (default) or legacy JSON",
+    )
+    return parser
+
+
+def convert_json(json_path, output=None):
+    """
+    Convert a legacy chunks-with-embeddings JSON file to a columnar artifact
+    """
+    artifact = load_json_chunks(json_path)
+    return write_artifact(
+        output or json_path,
+        artifact.chunks,
+        artifact.embeddings,
+        model=artifact.model,
+        truncated_from=artifact.truncated_from,
+    ), artifact
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding artifact tools.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert = subparsers.add_parser("convert", help="Convert JSON artifacts to .meta.json + .f32.npy")
+    convert.add_argument("inputs", nargs="+", help="Chunks-with-embeddings JSON files")
+
+    info = subparsers.add_parser("info", help="Describe an artifact")
+    info.add_argument("path")
+
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        for json_path in args.inputs:
+            (meta_path, vectors_path), artifact = convert_json(json_path)
+            before = os.path.getsize(json_path)
+            after = os.path.getsize(meta_path) + os.path.getsize(vectors_path)
+            print(
+                f"✅ {json_path}: {len(artifact)} chunks x {artifact.dimensions} dims, "
+                f"{before / 1e6:.1f} MB -> {after / 1e6:.1f} MB ({meta_path}, {vectors_path})"
+            )
+    elif args.command == "info":
+        artifact = load_embedded_chunks(args.path)
+        truncated = f" (truncated from {artifact.truncated_from})" if artifact.truncated_from else ""
+        print(f"📚 {len(artifact)} chunks, {artifact.dimensions} dims{truncated}, model={artifact.model}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+"""
+asyncio retrieval client for serving many chatbot retrievals from one process
+One AsyncOpenAI client and one async MongoDB client (PyMongo's
+AsyncMongoClient, or Motor on older PyMongo) are shared by every call, so
+HTTP and MongoDB connections are pooled. Each call has its own timeout, a
+semaphore caps how many retrievals run at once, and cancelling a call
+releases its slot and closes its cursor
+
+Usage:
+  python -m raglib.async_retrieval "What is the Third Tradition?" "Explain Step Four"
+"""
+
+import argparse
+import asyncio
+import inspect
+import os
+import time
+
+from openai import AsyncOpenAI
+
+try:
+    from pymongo import AsyncMongoClient
+except ImportError:  # PyMongo < 4.9
+    from motor.motor_asyncio import AsyncIOMotorClient as AsyncMongoClient
+
+from raglib.artifacts import truncate_embeddings
+from raglib.embedding_engine import DEFAULT_MODEL
+from raglib.lexical import HYBRID_NUM_CANDIDATES_PER_RESULT, hybrid_candidates, reciprocal_rank_fusion
+from raglib.local_search import build_filter
+from raglib.rerank import rerank_candidates
+from raglib.vector_search import INDEX_NAME, num_candidates_for, vector_search_pipeline
+
+DB_NAME = "dailyreflections"
+COLLECTION_NAME = "text_chunks"
+
+DEFAULT_MAX_CONCURRENCY = 32
+DEFAULT_EMBED_TIMEOUT = 10.0
+DEFAULT_SEARCH_TIMEOUT = 10.0
+DEFAULT_MAX_POOL_SIZE = 50
+
+
+class AsyncRetriever:
+    """
+    Shared-pool async version of search_text_chunks
+    Use as an async context manager, or call close() when done
+    """
+
+    def __init__(
+        self,
+        mongodb_uri=None,
+        mongo_client=None,
+        openai_client=None,
+        model=DEFAULT_MODEL,
+        db_name=DB_NAME,
+        collection_name=COLLECTION_NAME,
+        index_name=INDEX_NAME,
+        max_concurrency=DEFAULT_MAX_CONCURRENCY,
+        embed_timeout=DEFAULT_EMBED_TIMEOUT,
+        search_timeout=DEFAULT_SEARCH_TIMEOUT,
+        max_pool_size=DEFAULT_MAX_POOL_SIZE,
+        query_cache=None,
+        lexical_index=None,
+        reranker=None,
+        dimensions=None,
+    ):
+        self._owns_mongo = mongo_client is None
+        self.mongo_client = mongo_client or AsyncMongoClient(
+            mongodb_uri or os.getenv("MONGODB_URI"),
+            maxPoolSize=max_pool_size,
+        )
+        self._owns_openai = openai_client is None
+        # Retries are left to the caller's timeout budget
+        self.openai = openai_client or AsyncOpenAI(max_retries=1, timeout=embed_timeout)
+        self.collection = self.mongo_client[db_name][collection_name]
+        self.model = model
+        self.index_name = index_name
+        self.embed_timeout = embed_timeout
+        self.search_timeout = search_timeout
+        self.query_cache = query_cache
+        # With a BM25Index, results are fused with BM25 hits (see raglib.lexical)
+        self.lexical_index = lexical_index
+        # With a Reranker, more candidates are fetched and reranked in a thread
+        self.reranker = reranker
+        # Query vectors are truncated to match truncated stored embeddings
+        self.dimensions = dimensions
+        self._slots = asyncio.Semaphore(max_concurrency)
+        # Identical queries in flight at the same time share one embedding call
+        self._pending_embeddings = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        if self._owns_openai:
+            await self.openai.close()
+        if self._owns_mongo:
+            result = self.mongo_client.close()
+            if inspect.isawaitable(result):
+                await result
+
+    async def _create_embedding(self, query):
+        response = await self.openai.embeddings.create(
+            model=self.model,
+            input=query,
+            timeout=self.embed_timeout,
+        )
+        return response.data[0].embedding
+
+    async def embed(self, query):
+        """
+        Query embedding, from the query cache when possible
+        """
+        if self.query_cache is not None:
+            vector = self.query_cache.get(self.model, query)
+            if vector is not None:
+                return vector
+
+        pending = self._pending_embeddings.get(query)
+        if pending is None:
+            pending = asyncio.ensure_future(self._create_embedding(query))
+            self._pending_embeddings[query] = pending
+            pending.add_done_callback(lambda _: self._pending_embeddings.pop(query, None))
+
+        # shield() keeps one caller's cancellation from cancelling the call
+        # other callers are waiting on
+        vector = await asyncio.shield(pending)
+        if self.query_cache is not None:
+            self.query_cache.put(self.model, query, vector)
+        return vector
+
+    async def _aggregate(self, pipeline, timeout):
+        # maxTimeMS makes the server give up too, not just this client
+        cursor = self.collection.aggregate(pipeline, maxTimeMS=int(timeout * 1000))
+        if inspect.isawaitable(cursor):
+            cursor = await cursor
+        try:
+            return await cursor.to_list(length=None)
+        finally:
+            closed = cursor.close()
+            if inspect.isawaitable(closed):
+                await closed
+
+    async def search(
+        self,
+        query,
+        limit=5,
+        min_score=0.65,
+        source=None,
+        page_number=None,
+        num_candidates=None,
+        text_chars=None,
+        timeout=None,
+    ):
+        """
+        Embed the query and run the vector search
+        timeout bounds the whole call (default: embed + search timeouts);
+        asyncio.TimeoutError is raised when it runs out
+        """
+        if timeout is None:
+            timeout = self.embed_timeout + self.search_timeout
+
+        search_filter = build_filter(source=source, page_number=page_number)
+
+        def pipeline(query_embedding, n, candidates):
+            if self.dimensions:
+                query_embedding = truncate_embeddings(query_embedding, self.dimensions).tolist()
+            return vector_search_pipeline(
+                query_embedding,
+                limit=n,
+                min_score=min_score,
+                filter=search_filter,
+                num_candidates=candidates,
+                text_chars=text_chars,
+                index=self.index_name,
+            )
+
+        async def retrieve():
+            async with self._slots:
+                query_embedding = await self.embed(query)
+                fetch = limit if self.reranker is None else rerank_candidates(limit)
+                if self.lexical_index is None:
+                    results = await self._aggregate(
+                        pipeline(query_embedding, fetch, num_candidates), self.search_timeout
+                    )
+                else:
+                    n = hybrid_candidates(fetch)
+                    candidates = num_candidates or num_candidates_for(n, per_result=HYBRID_NUM_CANDIDATES_PER_RESULT)
+                    vector_results = await self._aggregate(
+                        pipeline(query_embedding, n, candidates), self.search_timeout
+                    )
+                    lexical_results = self.lexical_index.search(query, limit=n, filter=search_filter)
+                    results = reciprocal_rank_fusion(
+                        {"vector": vector_results, "lexical": lexical_results}, limit=fetch
+                    )
+
+                if self.reranker is not None:
+                    # The cross-encoder is CPU-bound; keep it off the event loop
+                    results = await asyncio.to_thread(self.reranker.rerank, query, results, limit=limit)
+                return results
+
+        return await asyncio.wait_for(retrieve(), timeout)
+
+    async def search_many(self, queries, return_exceptions=True, **kwargs):
+        """
+        Run searches for many queries at once (still capped by max_concurrency)
+        With return_exceptions, a failed query yields its exception in place
+        """
+        return await asyncio.gather(
+            *(self.search(query, **kwargs) for query in queries),
+            return_exceptions=return_exceptions,
+        )
+
+
+async def _main(args):
+    async with AsyncRetriever(
+        model=args.model,
+        max_concurrency=args.concurrency,
+        search_timeout=args.timeout,
+    ) as retriever:
+        start = time.perf_counter()
+        results = await retriever.search_many(args.queries, limit=args.limit, min_score=args.min_score)
+        elapsed = time.perf_counter() - start
+
+    for query, result in zip(args.queries, results):
+        print(f"\n🔍 {query}")
+        if isinstance(result, BaseException):
+            print(f"   ❌ {type(result).__name__}: {result}")
+            continue
+        for i, chunk in enumerate(result, 1):
+            excerpt = chunk["text"][:120].replace("\n", " ")
+            print(f"   {i}. {chunk.get('source', '')} p.{chunk.get('page_number', '?')} ({chunk['score']:.3f}) {excerpt}")
+    print(f"\n⏱ {len(args.queries)} queries in {elapsed:.2f}s")
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Run concurrent async retrievals against Atlas.")
+    parser.add_argument("queries", nargs="+")
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--min-score", type=float, default=0.65)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY, help="Retrievals in flight")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_SEARCH_TIMEOUT, help="Per-search timeout (s)")
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
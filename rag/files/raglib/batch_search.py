@@ -0,0 +1,116 @@
+"""
+Batch query mode for the RAG search scripts
+All queries are embedded together (multi-input requests through the
+embedding engine, after the query cache), then the vector searches run
+concurrently in a thread pool. Results are written as JSONL in input order
+"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_SEARCH_CONCURRENCY = 8
+
+
+def read_queries(path):
+    """
+    Queries from a file: JSONL records with a 'query' field (other fields
+    are carried through to the output), or one plain-text query per line
+    """
+    queries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                record = json.loads(line)
+                if "query" not in record:
+                    raise ValueError(f"Query record without a 'query' field: {line[:80]}")
+                queries.append(record)
+            else:
+                queries.append({"query": line})
+    return queries
+
+
+def embed_queries(engine, queries, query_cache=None):
+    """
+    One embedding per query string, in order
+    Cache hits are reused; the misses (deduplicated) go to the engine in as
+    few requests as its batch size allows
+    """
+    embeddings = [None] * len(queries)
+    pending = {}
+    for i, query in enumerate(queries):
+        vector = query_cache.get(engine.model, query) if query_cache is not None else None
+        if vector is None:
+            pending.setdefault(query, []).append(i)
+        else:
+            embeddings[i] = vector
+
+    if pending:
+        texts = list(pending)
+        for text, vector in zip(texts, engine.embed(texts)):
+            if query_cache is not None:
+                query_cache.put(engine.model, text, vector)
+            for i in pending[text]:
+                embeddings[i] = vector
+    return embeddings
+
+
+def batch_search(records, engine, search, query_cache=None, concurrency=DEFAULT_SEARCH_CONCURRENCY):
+    """
+    Answer many queries at once
+    search(query, query_embedding) returns the results for one query and
+    must be safe to call from several threads (pymongo and the local
+    indexes are)
+    Returns (output records in input order, timings in seconds)
+    """
+    start = time.perf_counter()
+    embeddings = embed_queries(engine, [record["query"] for record in records], query_cache)
+    embed_seconds = time.perf_counter() - start
+
+    def run(item):
+        record, embedding = item
+        started = time.perf_counter()
+        try:
+            results = search(record["query"], embedding)
+            error = None
+        except Exception as e:
+            results, error = [], str(e)
+        output = dict(record)
+        output["results"] = results
+        output["search_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        if error:
+            output["error"] = error
+        return output
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+        outputs = list(executor.map(run, zip(records, embeddings)))
+    search_seconds = time.perf_counter() - start
+
+    return outputs, {"embed": embed_seconds, "search": search_seconds}
+
+
+def add_batch_arguments(parser):
+    """
+    Register the common --batch/--output/--search-concurrency flags
+    """
+    parser.add_argument(
+        "--batch",
+        default=None,
+        help="Answer every query in this file (JSONL with a 'query' field, or one query per line)",
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="JSONL file for --batch results (default: stdout)",
+    )
+    parser.add_argument(
+        "--search-concurrency",
+        type=int,
+        default=DEFAULT_SEARCH_CONCURRENCY,
+        help="Vector searches in flight in --batch mode",
+    )
+    return parser
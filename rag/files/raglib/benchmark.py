@@ -0,0 +1,470 @@
+#!/usr/bin/env python
+"""
+Retrieval benchmark over a labelled query set
+Each query lists the (source, pages) locations that answer it. A run scores
+recall@k (share of those locations hit in the top k) and MRR. It also times
+every query in three parts: embed, vector search and post-filter (min_score
+and limit). The sweep covers chunkers, backends, numCandidates and
+min_score, and the report is written as JSON. --baseline compares it with an
+earlier report and exits non-zero on a recall/MRR regression
+
+Usage:
+  python -m raglib.benchmark --output benchmark.json
+  python -m raglib.benchmark --chunkers token paragraph large --backends local ivf \
+      --num-candidates 50 100 200 --min-score 0 0.65 --baseline benchmark.json
+  python -m raglib.benchmark --backends ivf --hybrid --num-candidates 25 50 100
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from raglib.ann_index import IVFIndex
+from raglib.artifacts import EmbeddingArtifact, embedded_chunks_exist, load_embedded_chunks
+from raglib.embedding_cache import add_cache_arguments, embed_with_cache, open_cache
+from raglib.embedding_engine import EmbeddingEngine, add_engine_arguments
+from raglib.lexical import BM25Index, reciprocal_rank_fusion
+from raglib.local_search import RESULT_FIELDS, LocalVectorIndex
+from raglib.sources import RAG_FILES_DIR, SOURCES, source_for_label
+from raglib.vector_search import vector_search_pipeline
+
+FORMAT_VERSION = "raglib-benchmark/1"
+DEFAULT_QUERIES_PATH = os.path.join(RAG_FILES_DIR, "benchmark_queries.json")
+CHUNKERS = ("token", "paragraph", "large")
+BACKENDS = ("local", "ivf", "atlas")
+
+
+def load_queries(path=DEFAULT_QUERIES_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["queries"]
+
+
+def pages_of(chunk):
+    """
+    Pages a chunk covers: its page_range when it spans pages, else page_number
+    """
+    page_range = chunk.get("page_range")
+    if page_range:
+        first, _, last = str(page_range).partition("-")
+        return range(int(first), int(last or first) + 1)
+    return range(chunk.get("page_number", 0), chunk.get("page_number", 0) + 1)
+
+
+def matched_location(result, relevant):
+    """
+    Index of the relevant location a result falls in, or None
+    """
+    pages = pages_of(result)
+    for i, location in enumerate(relevant):
+        if result.get("source") == location["source"] and any(p in pages for p in location["pages"]):
+            return i
+    return None
+
+
+def score_query(results, relevant, ks):
+    """
+    recall@k and reciprocal rank for one query's ranked results
+    """
+    locations = [matched_location(result, relevant) for result in results]
+    scores = {}
+    for k in ks:
+        hit = {location for location in locations[:k] if location is not None}
+        scores[f"recall@{k}"] = len(hit) / len(relevant)
+    first = next((rank for rank, location in enumerate(locations, 1) if location is not None), None)
+    scores["mrr"] = 1.0 / first if first else 0.0
+    return scores
+
+
+def latency_summary(seconds):
+    """
+    p50/p95/p99/mean in milliseconds
+    """
+    if not seconds:
+        return {}
+    ms = np.asarray(seconds, dtype=np.float64) * 1000
+    return {
+        "p50": float(np.percentile(ms, 50)),
+        "p95": float(np.percentile(ms, 95)),
+        "p99": float(np.percentile(ms, 99)),
+        "mean": float(ms.mean()),
+    }
+
+
+def post_filter(candidates, min_score, limit):
+    """
+    The $match/$sort/$limit tail of the search pipeline, applied to candidates
+    """
+    kept = [result for result in candidates if result["score"] >= min_score]
+    kept.sort(key=lambda result: result["score"], reverse=True)
+    return kept[:limit]
+
+
+def variant_chunks_path(source, chunker):
+    """
+    Chunks file of a source for a chunker, e.g. aa_chunks_paragraph.json
+    None if the source has no chunks for that chunker
+    """
+    if chunker == "token":
+        path = source.chunks_path
+    else:
+        path = source.chunks_path.replace("token_based", chunker)
+    return path if os.path.exists(path) else None
+
+
+def build_variant_index(chunker, sources, engine, cache=None):
+    """
+    Exact index over every source's chunks for one chunker
+    Token chunks reuse the embedding artifacts when they were made with the
+    same model; the other chunkers are embedded (through the cache)
+    """
+    artifacts = []
+    for source in sources:
+        if (
+            chunker == "token"
+            and embedded_chunks_exist(source.embeddings_path)
+        ):
+            artifact = load_embedded_chunks(source.embeddings_path)
+            if artifact.model in (None, engine.model):
+                artifacts.append(artifact)
+                continue
+
+        path = variant_chunks_path(source, chunker)
+        if path is None:
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+        for chunk in chunks:
+            chunk.setdefault("source", source.label)
+        embeddings = embed_with_cache(engine, cache, [chunk["text"] for chunk in chunks])
+        artifacts.append(
+            EmbeddingArtifact(chunks, np.asarray(embeddings, dtype=np.float32), model=engine.model)
+        )
+    return LocalVectorIndex(artifacts) if artifacts else None
+
+
+def atlas_searcher(collection, labels):
+    """
+    search(query_vector, limit, num_candidates) running the $vectorSearch
+    pipeline without min_score, so the post-filter is timed separately
+    """
+    fields = RESULT_FIELDS + ("page_range",)
+
+    def search(query_vector, limit, num_candidates):
+        pipeline = vector_search_pipeline(
+            query_vector,
+            limit=limit,
+            filter={"source": {"$in": labels}},
+            num_candidates=num_candidates,
+            fields=fields,
+        )
+        return list(collection.aggregate(pipeline))
+
+    return search
+
+
+def hybrid_searcher(search, lexical_index):
+    """
+    search(vector, n, text) that also fetches the top-n BM25 hits, for
+    hybrid_post_filter
+    """
+    def hybrid(vector, n, text):
+        lexical = lexical_index.search(text, limit=n, fields=RESULT_FIELDS + ("page_range",))
+        return search(vector, n, text), lexical
+
+    return hybrid
+
+
+def hybrid_post_filter(candidates, min_score, limit):
+    """
+    min_score on the vector candidates, then reciprocal rank fusion with the
+    BM25 candidates (as in hybrid_search)
+    """
+    vector, lexical = candidates
+    vector = post_filter(vector, min_score, len(vector))
+    return reciprocal_rank_fusion({"vector": vector, "lexical": lexical}, limit=limit)
+
+
+def run_config(search, queries, query_vectors, ks, min_scores, limit, candidate_limit, finish=post_filter):
+    """
+    Time search + post-filter for every query and score each min_score
+    search(vector, n, text) returns the candidates finish() filters
+    """
+    search_seconds = []
+    filter_seconds = []
+    per_min_score = {min_score: [] for min_score in min_scores}
+
+    for query, vector in zip(queries, query_vectors):
+        start = time.perf_counter()
+        candidates = search(vector, candidate_limit, query["query"])
+        search_seconds.append(time.perf_counter() - start)
+
+        for min_score in min_scores:
+            start = time.perf_counter()
+            results = finish(candidates, min_score, limit)
+            filter_seconds.append(time.perf_counter() - start)
+            per_min_score[min_score].append(score_query(results, query["relevant"], ks))
+
+    runs = []
+    for min_score, scores in per_min_score.items():
+        metrics = {
+            key: float(np.mean([score[key] for score in scores]))
+            for key in scores[0]
+        }
+        runs.append({"min_score": min_score, **metrics})
+    return runs, latency_summary(search_seconds), latency_summary(filter_seconds)
+
+
+def benchmark(
+    queries,
+    engine,
+    chunkers=("token",),
+    backends=("local",),
+    num_candidates_values=(100,),
+    min_scores=(0.0, 0.65),
+    ks=(1, 3, 5, 10),
+    sources=None,
+    cache=None,
+    collection=None,
+    hybrid=False,
+    log=print,
+):
+    """
+    Run the sweep and return the JSON-able report
+    With hybrid, every backend also runs fused with BM25 as <backend>+bm25
+    """
+    if sources is None:
+        labels = {location["source"] for query in queries for location in query["relevant"]}
+        sources = [source for source in (source_for_label(label) for label in sorted(labels)) if source]
+    labels = [source.label for source in sources]
+    limit = max(ks)
+    # Like search_text_chunks, fetch twice the limit before the score filter
+    candidate_limit = limit * 2
+
+    embed_seconds = []
+    query_vectors = []
+    for query in queries:
+        start = time.perf_counter()
+        query_vectors.append(engine.embed([query["query"]])[0])
+        embed_seconds.append(time.perf_counter() - start)
+    query_vectors = np.asarray(query_vectors, dtype=np.float32)
+
+    report = {
+        "format": FORMAT_VERSION,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "model": engine.model,
+        "queries": len(queries),
+        "sources": labels,
+        "ks": list(ks),
+        "limit": limit,
+        "latency_ms": {"embed": latency_summary(embed_seconds)},
+        "runs": [],
+        "skipped": [],
+    }
+
+    def add_runs(chunker, backend, num_candidates, chunks, search, extra=None, finish=post_filter):
+        runs, search_latency, filter_latency = run_config(
+            search, queries, query_vectors, ks, min_scores, limit, candidate_limit, finish=finish
+        )
+        for run in runs:
+            report["runs"].append({
+                "chunker": chunker,
+                "backend": backend,
+                "num_candidates": num_candidates,
+                "chunks": chunks,
+                **run,
+                "latency_ms": {"search": search_latency, "post_filter": filter_latency},
+                **(extra or {}),
+            })
+        best = max(runs, key=lambda run: run["mrr"])
+        log(
+            f"  {chunker:<9} {backend:<10} numCandidates {num_candidates or '-':>5}: "
+            f"MRR {best['mrr']:.3f} (min_score {best['min_score']}), "
+            f"search p50 {search_latency['p50']:.2f} ms"
+        )
+
+    for chunker in chunkers:
+        index = build_variant_index(chunker, sources, engine, cache=cache)
+        if index is None:
+            report["skipped"].append({"chunker": chunker, "reason": "no chunks for the selected sources"})
+            continue
+
+        lexical_index = None
+        if hybrid:
+            start = time.perf_counter()
+            lexical_index = BM25Index.build(index.chunks)
+            lexical_seconds = time.perf_counter() - start
+
+        def add_backend_runs(backend, num_candidates, search, extra=None):
+            add_runs(chunker, backend, num_candidates, len(index), search, extra=extra)
+            if lexical_index is not None:
+                add_runs(
+                    chunker, f"{backend}+bm25", num_candidates, len(index),
+                    hybrid_searcher(search, lexical_index),
+                    extra={**(extra or {}), "bm25_build_seconds": lexical_seconds},
+                    finish=hybrid_post_filter,
+                )
+
+        if "local" in backends:
+            add_backend_runs(
+                "local", None,
+                lambda vector, n, text: index.search(vector, limit=n, fields=RESULT_FIELDS + ("page_range",)),
+            )
+
+        if "ivf" in backends:
+            start = time.perf_counter()
+            ivf = IVFIndex.build(index)
+            build_seconds = time.perf_counter() - start
+            for num_candidates in num_candidates_values:
+                add_backend_runs(
+                    "ivf", num_candidates,
+                    lambda vector, n, text, nc=num_candidates: ivf.search(
+                        vector, limit=n, num_candidates=nc, fields=RESULT_FIELDS + ("page_range",)
+                    ),
+                    extra={"nlist": int(ivf.nlist), "build_seconds": build_seconds},
+                )
+
+        if "atlas" in backends:
+            if chunker != "token":
+                report["skipped"].append({
+                    "chunker": chunker,
+                    "backend": "atlas",
+                    "reason": "only token chunks are ingested",
+                })
+            elif collection is None:
+                report["skipped"].append({"chunker": chunker, "backend": "atlas", "reason": "MONGODB_URI not set"})
+            else:
+                atlas_search = atlas_searcher(collection, labels)
+                for num_candidates in num_candidates_values:
+                    add_backend_runs(
+                        "atlas", num_candidates,
+                        lambda vector, n, text, nc=num_candidates: atlas_search(vector, n, nc),
+                    )
+
+    return report
+
+
+def run_key(run):
+    return (run["chunker"], run["backend"], run["num_candidates"], run["min_score"])
+
+
+def compare_reports(current, baseline, max_regression=0.02):
+    """
+    Human-readable regressions of recall@k/MRR against a baseline report
+    """
+    previous = {run_key(run): run for run in baseline.get("runs", [])}
+    regressions = []
+    for run in current["runs"]:
+        before = previous.get(run_key(run))
+        if before is None:
+            continue
+        for metric, value in run.items():
+            if not (metric == "mrr" or metric.startswith("recall@")) or metric not in before:
+                continue
+            if value < before[metric] - max_regression:
+                chunker, backend, num_candidates, min_score = run_key(run)
+                regressions.append(
+                    f"{chunker}/{backend} numCandidates={num_candidates} min_score={min_score}: "
+                    f"{metric} {before[metric]:.3f} -> {value:.3f}"
+                )
+    return regressions
+
+
+def main():
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Benchmark retrieval quality and latency.")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES_PATH, help="Labelled query set (JSON)")
+    parser.add_argument(
+        "--sources",
+        nargs="+",
+        choices=list(SOURCES),
+        default=None,
+        help="Sources to index (default: the ones the labels refer to)",
+    )
+    parser.add_argument("--chunkers", nargs="+", choices=CHUNKERS, default=["token"])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=["local"])
+    parser.add_argument("--num-candidates", type=int, nargs="+", default=[100], help="numCandidates to sweep")
+    parser.add_argument("--min-score", type=float, nargs="+", default=[0.0, 0.65], help="min_score values to sweep")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10], help="Cut-offs for recall@k")
+    parser.add_argument("--output", default=None, help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", default=None, help="Earlier report to compare against")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.02,
+        help="Allowed absolute drop in recall@k/MRR before failing",
+    )
+    parser.add_argument("--hybrid", action="store_true", help="Also run every backend fused with BM25")
+    add_engine_arguments(parser)
+    add_cache_arguments(parser)
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    engine = EmbeddingEngine(
+        model=args.model,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        base_url=args.base_url,
+    )
+    sources = [SOURCES[name] for name in args.sources] if args.sources else None
+
+    collection = None
+    if "atlas" in args.backends and os.getenv("MONGODB_URI"):
+        collection = MongoClient(os.getenv("MONGODB_URI"))["dailyreflections"]["text_chunks"]
+
+    # Progress goes to stderr so the JSON report can go to stdout
+    def log(message):
+        print(message, file=sys.stderr)
+
+    cache = open_cache(args)
+    try:
+        log(f"📊 Benchmarking {len(queries)} labelled queries")
+        report = benchmark(
+            queries,
+            engine,
+            chunkers=args.chunkers,
+            backends=args.backends,
+            num_candidates_values=args.num_candidates,
+            min_scores=args.min_score,
+            ks=sorted(args.k),
+            sources=sources,
+            cache=cache,
+            collection=collection,
+            hybrid=args.hybrid,
+            log=log,
+        )
+    finally:
+        if cache is not None:
+            cache.close()
+
+    for skipped in report["skipped"]:
+        log(f"⚠️ Skipped {skipped}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        log(f"✅ Report written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_reports(report, baseline, max_regression=args.max_regression)
+        if regressions:
+            log("❌ Retrieval regressions against the baseline:")
+            for regression in regressions:
+                log(f"   {regression}")
+            sys.exit(1)
+        log("✅ No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
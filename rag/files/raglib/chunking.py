@@ -0,0 +1,138 @@
+"""
+Token-based chunking with the embedding model's own BPE tokenizer
+Each sentence is encoded once; chunks are built from a sliding window of
+(page, token ids) pieces, so overlap is a slice of token ids rather than a
+re-split of the chunk text and the whole pass is linear in the corpus size
+"""
+
+from functools import lru_cache
+
+import tiktoken
+
+DEFAULT_EMBEDDING_MODEL = "text-embedding-3-small"
+DEFAULT_ENCODING = "cl100k_base"
+
+# Input limit of the OpenAI text-embedding-3 / ada-002 models
+MAX_EMBEDDING_TOKENS = 8191
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model=DEFAULT_EMBEDDING_MODEL):
+    """
+    tiktoken encoding for an embedding model, loaded once per process
+    """
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+def count_tokens(text, model=DEFAULT_EMBEDDING_MODEL):
+    return len(get_encoding(model).encode_ordinary(text))
+
+
+def _sentence_splitter():
+    import nltk
+    from nltk.tokenize import sent_tokenize
+
+    try:
+        nltk.data.find("tokenizers/punkt")
+    except LookupError:
+        nltk.download("punkt")
+    return sent_tokenize
+
+
+class TokenChunker:
+    """
+    Pack sentences into chunks of at most chunk_size model tokens with
+    overlap tokens carried over from the end of the previous chunk
+    Sentences longer than a whole chunk are split on token boundaries
+    """
+
+    def __init__(
+        self,
+        chunk_size=512,
+        overlap=50,
+        model=DEFAULT_EMBEDDING_MODEL,
+        split_sentences=None,
+    ):
+        if chunk_size > MAX_EMBEDDING_TOKENS:
+            raise ValueError(f"chunk_size {chunk_size} exceeds the model limit of {MAX_EMBEDDING_TOKENS}")
+        if not 0 <= overlap < chunk_size:
+            raise ValueError("overlap must be at least 0 and smaller than chunk_size")
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.encoding = get_encoding(model)
+        self.split_sentences = split_sentences or _sentence_splitter()
+
+    def _sentence_pieces(self, pages):
+        """
+        Yield (page_number, token ids) per sentence, each encoded with a
+        leading space so concatenated pieces decode to space-joined text
+        """
+        for page in pages:
+            sentences = self.split_sentences(page["text"])
+            if not sentences:
+                continue
+            encoded = self.encoding.encode_ordinary_batch([" " + sentence for sentence in sentences])
+            for tokens in encoded:
+                # A sentence longer than a chunk is cut on token boundaries
+                for start in range(0, len(tokens), self.chunk_size):
+                    yield page["page_number"], tokens[start:start + self.chunk_size]
+
+    def _word_start(self, tokens, start):
+        """
+        Index of the last token at or before start that begins a word, so
+        overlap never starts mid-word or inside a multibyte character
+        """
+        while start > 0 and not self.encoding.decode_single_token_bytes(tokens[start])[:1].isspace():
+            start -= 1
+        return start
+
+    def _overlap_pieces(self, pieces):
+        """
+        Trailing pieces holding the last `overlap` tokens of a chunk, moved
+        back to the start of a word
+        """
+        if not self.overlap:
+            return []
+        kept = []
+        needed = self.overlap
+        for page_number, tokens in reversed(pieces):
+            if needed <= 0:
+                break
+            start = self._word_start(tokens, max(0, len(tokens) - needed))
+            kept.append((page_number, tokens[start:]))
+            needed -= len(kept[-1][1])
+        kept.reverse()
+        return kept
+
+    def iter_chunks(self, pages):
+        """
+        Yield (text, token_count, pages) for each chunk, pages sorted
+        """
+        pieces = []
+        window_tokens = 0
+        fresh = False  # Whether the window has anything beyond the carried-over overlap
+
+        for page_number, tokens in self._sentence_pieces(pages):
+            if window_tokens + len(tokens) > self.chunk_size and fresh:
+                yield self._emit(pieces)
+                pieces = self._overlap_pieces(pieces)
+                window_tokens = sum(len(piece_tokens) for _, piece_tokens in pieces)
+                fresh = False
+                # Drop overlap that wouldn't leave room for this sentence
+                while pieces and window_tokens + len(tokens) > self.chunk_size:
+                    window_tokens -= len(pieces.pop(0)[1])
+
+            pieces.append((page_number, tokens))
+            window_tokens += len(tokens)
+            fresh = True
+
+        if fresh:
+            yield self._emit(pieces)
+
+    def _emit(self, pieces):
+        tokens = [token for _, piece_tokens in pieces for token in piece_tokens]
+        pages = sorted({page_number for page_number, _ in pieces})
+        return self.encoding.decode(tokens).strip(), len(tokens), pages
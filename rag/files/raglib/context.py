@@ -0,0 +1,199 @@
+"""
+Context assembly for LLM prompts
+Retrieved chunks overlap: token chunks share their last 50 tokens with the
+next chunk, and paragraph chunks repeat text from the token chunks. Before
+they go into a prompt, chunks are taken most relevant first and
+  - merged into the passage they continue (or that continues them) when
+    one's end overlaps the other's start, keeping the overlap once,
+  - stripped of sentences already in the context,
+  - dropped when (almost) nothing new is left,
+and packed greedily until the token budget is used up
+Duplicates are found on letters and digits only, because the chunk sets
+come from different PDF extractions that differ in spacing
+("in all" vs "inall")
+"""
+
+import re
+
+from raglib.chunking import DEFAULT_EMBEDDING_MODEL, count_tokens as count_model_tokens
+
+DEFAULT_CONTEXT_TOKENS = 1500
+# Shortest end/start overlap treated as adjacent chunks rather than chance
+MIN_OVERLAP_CHARS = 40
+# Sentences shorter than this aren't deduplicated ("Step Nine.", headings)
+MIN_SENTENCE_CHARS = 30
+# A chunk with less than this share of new text is dropped
+MIN_NEW_TEXT_RATIO = 0.2
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?\"”])\s+|(?<=[a-z][.!?])(?=[A-Z])")
+_NON_ALNUM_RE = re.compile(r"[\W_]+")
+
+
+def normalize_whitespace(text):
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def split_sentences(text):
+    return [sentence for sentence in _SENTENCE_RE.split(text) if sentence]
+
+
+def dedup_key(text):
+    """
+    Lowercase letters and digits only
+    """
+    return _NON_ALNUM_RE.sub("", text.lower())
+
+
+def overlap_length(left, right, min_overlap=MIN_OVERLAP_CHARS):
+    """
+    Length of the longest suffix of left that is a prefix of right, or 0 if
+    shorter than min_overlap
+    """
+    if len(left) < min_overlap or len(right) < min_overlap:
+        return 0
+    anchor = right[:min_overlap]
+    start = max(0, len(left) - len(right))
+    position = left.find(anchor, start)
+    while position != -1:
+        if right.startswith(left[position:]):
+            return len(left) - position
+        position = left.find(anchor, position + 1)
+    return 0
+
+
+def _pages(chunk):
+    page_range = chunk.get("page_range")
+    if page_range:
+        first, _, last = str(page_range).partition("-")
+        return set(range(int(first), int(last or first) + 1))
+    if chunk.get("page_number") is not None:
+        return {chunk["page_number"]}
+    return set()
+
+
+class Passage:
+    """
+    Contiguous text from one source, built from one or more chunks
+    """
+
+    def __init__(self, chunk, text):
+        self.source = chunk.get("source")
+        self.pages = _pages(chunk)
+        self.text = text
+        self.chunk_ids = [chunk.get("chunk_id")]
+        self.score = chunk.get("score", 0.0)
+
+    def add(self, chunk):
+        self.pages |= _pages(chunk)
+        self.chunk_ids.append(chunk.get("chunk_id"))
+        self.score = max(self.score, chunk.get("score", 0.0))
+
+    def to_dict(self, tokens):
+        pages = sorted(self.pages)
+        return {
+            "source": self.source,
+            "page_number": pages[0] if pages else None,
+            "page_range": f"{pages[0]}-{pages[-1]}" if pages else None,
+            "text": self.text,
+            "chunk_ids": self.chunk_ids,
+            "score": self.score,
+            "tokens": tokens,
+        }
+
+
+def pack_context(
+    chunks,
+    token_budget=DEFAULT_CONTEXT_TOKENS,
+    count_tokens=None,
+    model=DEFAULT_EMBEDDING_MODEL,
+    min_overlap=MIN_OVERLAP_CHARS,
+):
+    """
+    Deduplicated passages for a prompt, most relevant first, within
+    token_budget tokens of passage text
+    chunks are search results (text, source, page_number/page_range,
+    chunk_id, score); count_tokens(text) defaults to the model's tokenizer
+    Each passage has source, page_number, page_range, text, chunk_ids,
+    score (best chunk) and tokens
+    """
+    if count_tokens is None:
+        def count_tokens(text):
+            return count_model_tokens(text, model)
+
+    passages = []
+    tokens = []
+    used = 0
+    # dedup_key of every passage, for substring checks
+    seen = ""
+
+    for chunk in sorted(chunks, key=lambda chunk: chunk.get("score", 0.0), reverse=True):
+        text = normalize_whitespace(chunk.get("text", ""))
+        if not text:
+            continue
+
+        merged = False
+        for i, passage in enumerate(passages):
+            if passage.source != chunk.get("source"):
+                continue
+            if dedup_key(text) in dedup_key(passage.text):
+                passage.add(chunk)
+                merged = True
+                break
+            # This chunk continues the passage, or the passage continues it
+            after = overlap_length(passage.text, text, min_overlap)
+            before = 0 if after else overlap_length(text, passage.text, min_overlap)
+            if not (after or before):
+                continue
+            if after:
+                candidate = passage.text + text[after:]
+            else:
+                candidate = text + passage.text[before:]
+            candidate_tokens = count_tokens(candidate)
+            if used - tokens[i] + candidate_tokens > token_budget:
+                merged = True  # Adjacent but no room: don't add it twice
+                break
+            used += candidate_tokens - tokens[i]
+            passage.text, tokens[i] = candidate, candidate_tokens
+            passage.add(chunk)
+            seen = "|".join(dedup_key(passage.text) for passage in passages)
+            merged = True
+            break
+        if merged:
+            continue
+
+        # Keep only sentences not already in the context
+        sentences = split_sentences(text)
+        fresh = [
+            sentence for sentence in sentences
+            if len(sentence) < MIN_SENTENCE_CHARS or dedup_key(sentence) not in seen
+        ]
+        fresh_text = " ".join(fresh)
+        if len(fresh_text) < MIN_NEW_TEXT_RATIO * len(text):
+            continue
+
+        fresh_tokens = count_tokens(fresh_text)
+        if used + fresh_tokens > token_budget:
+            continue
+        passages.append(Passage(chunk, fresh_text))
+        tokens.append(fresh_tokens)
+        used += fresh_tokens
+        seen += "|" + dedup_key(fresh_text)
+
+    return [passage.to_dict(count) for passage, count in zip(passages, tokens)]
+
+
+def format_context(passages):
+    """
+    Prompt context block, one "[source, Page(s) ...]" passage per paragraph
+    """
+    blocks = []
+    for passage in passages:
+        first, _, last = (passage.get("page_range") or "").partition("-")
+        if first and last and first != last:
+            where = f"Pages {first}-{last}"
+        else:
+            where = f"Page {passage.get('page_number')}"
+        label = f"{passage['source']}, {where}" if passage.get("source") else where
+        blocks.append(f"[{label}] {passage['text']}")
+    return "\n\n".join(blocks)
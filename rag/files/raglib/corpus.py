@@ -0,0 +1,197 @@
+"""
+Source-agnostic extract -> chunk -> embed -> ingest stages
+A CorpusBuilder holds what every source shares (one embedding engine and its
+HTTP pool and rate-limit gate, the embedding cache file and one MongoDB
+client), and turns any registered source into pipeline Stages
+"""
+
+import json
+import os
+
+from raglib.artifacts import artifact_paths, load_embedded_chunks, save_embedded_chunks, truncate_embeddings
+from raglib.chunking import TokenChunker
+from raglib.dedup import drop_duplicates, find_duplicates
+from raglib.embedding_cache import EmbeddingCache, embed_with_cache
+from raglib.ingest import DEFAULT_BATCH_SIZE, ensure_indexes, prune_missing_chunks, upsert_chunks
+from raglib.pdf_text import iter_pages
+from raglib.pipeline import Stage
+from raglib.stream import chunk_pages
+
+RAGLIB_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DB_NAME = "dailyreflections"
+COLLECTION_NAME = "text_chunks"
+
+
+def _code(*names):
+    return [os.path.join(RAGLIB_DIR, name) for name in names]
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class CorpusBuilder:
+    """
+    Runs the stages of any source against shared resources
+    Each method returns the stats dict the pipeline runner reports
+    """
+
+    def __init__(
+        self,
+        engine,
+        cache_path=None,
+        mongo_client=None,
+        extract_workers=1,
+        ingest_batch_size=DEFAULT_BATCH_SIZE,
+        prune=False,
+        dedup=False,
+        dimensions=None,
+    ):
+        self.engine = engine
+        self.cache_path = cache_path
+        self.mongo_client = mongo_client
+        self.extract_workers = extract_workers
+        self.ingest_batch_size = ingest_batch_size
+        self.prune = prune
+        # Leave near-duplicate chunks (raglib.dedup) out of the ingest
+        self.dedup = dedup
+        # Truncate text-embedding-3 vectors to this many dimensions; the cache
+        # keeps the full vectors, so changing it doesn't re-embed anything
+        self.dimensions = dimensions
+
+    @property
+    def collection(self):
+        if self.mongo_client is None:
+            raise RuntimeError("MONGODB_URI is not set; ingest needs a MongoDB connection")
+        return self.mongo_client[DB_NAME][COLLECTION_NAME]
+
+    def extract(self, source):
+        pages = []
+        os.makedirs(source.directory, exist_ok=True)
+        with open(source.text_path, "w", encoding="utf-8") as text_file:
+            for page_number, text in iter_pages(source.pdf_path, workers=self.extract_workers):
+                text_file.write(text)
+                text_file.write("\n\n")
+                pages.append({"page_number": page_number, "text": text, "source": source.label})
+        _write_json(source.pages_path, pages)
+        return {"items": len(pages)}
+
+    def chunk(self, source):
+        with open(source.pages_path, "r", encoding="utf-8") as f:
+            pages = json.load(f)
+        chunker = TokenChunker(
+            chunk_size=source.chunk_size,
+            overlap=source.overlap,
+            model=self.engine.model,
+        )
+        chunks = list(chunk_pages(pages, chunker, source.label, source.chunk_id_prefix))
+        _write_json(source.chunks_path, chunks)
+        return {"items": len(chunks)}
+
+    def embed(self, source):
+        with open(source.chunks_path, "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+
+        # Every stage uses the same cache file through its own connection
+        cache = EmbeddingCache(self.cache_path) if self.cache_path else None
+        try:
+            embeddings = embed_with_cache(self.engine, cache, [chunk["text"] for chunk in chunks])
+        finally:
+            if cache is not None:
+                cache.close()
+
+        truncated_from = None
+        if self.dimensions and len(embeddings) and len(embeddings[0]) > self.dimensions:
+            truncated_from = len(embeddings[0])
+            embeddings = truncate_embeddings(embeddings, self.dimensions)
+
+        for chunk, embedding in zip(chunks, embeddings):
+            chunk["source"] = source.label
+            chunk["embedding_model"] = self.engine.model
+            chunk["dimensions"] = len(embedding)
+        save_embedded_chunks(
+            source.embeddings_path,
+            chunks,
+            embeddings,
+            model=self.engine.model,
+            truncated_from=truncated_from,
+        )
+
+        stats = {"items": len(chunks)}
+        if cache is not None:
+            stats["cache_hits"] = cache.hits
+            stats["cache_misses"] = cache.misses
+        return stats
+
+    def ingest(self, source):
+        collection = self.collection
+        ensure_indexes(collection)
+        artifact = load_embedded_chunks(source.embeddings_path)
+        duplicates = []
+        if self.dedup:
+            duplicates = find_duplicates(artifact.chunks, artifact.embeddings)["drop"]
+            artifact = drop_duplicates(artifact, duplicates)
+        stats = upsert_chunks(collection, artifact.iter_documents(), batch_size=self.ingest_batch_size)
+        result = {
+            "items": len(artifact),
+            "inserted": stats["inserted"],
+            "updated": stats["updated"],
+            "unchanged": stats["unchanged"],
+        }
+        if self.dedup:
+            result["duplicates"] = len(duplicates)
+        if self.prune:
+            result["pruned"] = prune_missing_chunks(collection, source.label, stats["seen"])
+        return result
+
+    def stages(self, source):
+        """
+        Pipeline stages <name>.extract/.chunk/.embed/.ingest for a source
+        """
+        artifact = list(artifact_paths(source.embeddings_path))
+        stages = []
+        if not source.prechunked:
+            stages.append(Stage(
+                f"{source.name}.extract",
+                lambda: self.extract(source),
+                inputs=[source.pdf_path],
+                outputs=[source.text_path, source.pages_path],
+                code=_code("corpus.py", "pdf_text.py"),
+            ))
+            stages.append(Stage(
+                f"{source.name}.chunk",
+                lambda: self.chunk(source),
+                inputs=[source.pages_path],
+                outputs=[source.chunks_path],
+                deps=[f"{source.name}.extract"],
+                params={
+                    "chunk_size": source.chunk_size,
+                    "overlap": source.overlap,
+                    "chunk_id_prefix": source.chunk_id_prefix,
+                    "model": self.engine.model,
+                },
+                code=_code("corpus.py", "chunking.py", "stream.py"),
+            ))
+        stages.append(Stage(
+            f"{source.name}.embed",
+            lambda: self.embed(source),
+            inputs=[source.chunks_path],
+            outputs=artifact,
+            deps=[] if source.prechunked else [f"{source.name}.chunk"],
+            params={"label": source.label, "model": self.engine.model, "dimensions": self.dimensions},
+            code=_code("corpus.py", "embedding_engine.py", "embedding_cache.py", "artifacts.py"),
+        ))
+        stages.append(Stage(
+            f"{source.name}.ingest",
+            lambda: self.ingest(source),
+            inputs=artifact,
+            deps=[f"{source.name}.embed"],
+            params={"prune": self.prune, "dedup": self.dedup},
+            code=_code("corpus.py", "ingest.py") + (_code("dedup.py") if self.dedup else []),
+        ))
+        return stages
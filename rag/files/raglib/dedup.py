@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+"""
+Near-duplicate chunk detection before ingest
+Two vectorized passes, merged into duplicate clusters:
+  - text: MinHash signatures over character shingles (letters and digits
+    only, so spacing differences between PDF extractions don't matter),
+    with LSH banding to find candidate pairs and the signature agreement
+    as the Jaccard estimate
+  - embeddings: cosine self-similarity computed block by block, so only a
+    block_size x N slice of the similarity matrix is in memory at a time
+Within each cluster the first chunk is kept and the others are reported
+(and, with --drop or CorpusBuilder(dedup=True), left out of the ingest)
+
+Usage:
+  python -m raglib.dedup --artifact aa_chunks_with_openai_embeddings
+  python -m raglib.dedup --chunks aa_chunks_token_based.json --chunks aa_chunks_paragraph.json \
+      --chunks aa_chunks_large.json --report duplicates.json
+  python -m raglib.dedup --artifact aa_chunks_with_openai_embeddings --drop \
+      --output aa_chunks_with_openai_embeddings_dedup
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from raglib.artifacts import EmbeddingArtifact, load_embedded_chunks, save_embedded_chunks
+from raglib.context import dedup_key
+
+DEFAULT_SHINGLE_CHARS = 9
+DEFAULT_NUM_PERM = 128
+# 16 bands of 8 rows: pairs above ~0.7 Jaccard collide in some band
+DEFAULT_BANDS = 16
+DEFAULT_JACCARD_THRESHOLD = 0.8
+DEFAULT_COSINE_THRESHOLD = 0.97
+DEFAULT_BLOCK_SIZE = 1024
+
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+def shingle_hashes(text, shingle_chars=DEFAULT_SHINGLE_CHARS):
+    """
+    Distinct hashes (< 2^31) of the character shingles of a text's dedup_key
+    """
+    key = np.frombuffer(dedup_key(text).encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+    if len(key) == 0:
+        return np.zeros(0, dtype=np.uint64)
+    if len(key) < shingle_chars:
+        key = np.pad(key, (0, shingle_chars - len(key)))
+    powers = np.asarray(
+        [pow(257, shingle_chars - 1 - i, 1 << 64) for i in range(shingle_chars)], dtype=np.uint64
+    )
+    # Polynomial rolling hash; uint64 arithmetic wraps
+    hashes = sliding_window_view(key, shingle_chars) @ powers
+    return np.unique(hashes % np.uint64(_MERSENNE_PRIME))
+
+
+class MinHasher:
+    """
+    num_perm universal hashes (a * x + b) mod (2^31 - 1)
+    """
+
+    def __init__(self, num_perm=DEFAULT_NUM_PERM, seed=0):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, _MERSENNE_PRIME, num_perm, dtype=np.uint64)[:, None]
+        self.b = rng.integers(0, _MERSENNE_PRIME, num_perm, dtype=np.uint64)[:, None]
+
+    def signature(self, hashes):
+        if len(hashes) == 0:
+            return np.full(self.num_perm, _MERSENNE_PRIME, dtype=np.uint64)
+        return ((self.a * hashes[None, :] + self.b) % np.uint64(_MERSENNE_PRIME)).min(axis=1)
+
+    def signatures(self, texts, shingle_chars=DEFAULT_SHINGLE_CHARS):
+        """
+        (N, num_perm) signature matrix
+        """
+        signatures = np.empty((len(texts), self.num_perm), dtype=np.uint64)
+        for i, text in enumerate(texts):
+            signatures[i] = self.signature(shingle_hashes(text, shingle_chars))
+        return signatures
+
+
+def lsh_candidate_pairs(signatures, bands=DEFAULT_BANDS):
+    """
+    Pairs (i, j), i < j, whose signatures are identical in at least one band
+    """
+    count, num_perm = signatures.shape
+    rows = num_perm // bands
+    pairs = set()
+    for band in range(bands):
+        block = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        _, buckets = np.unique(block, axis=0, return_inverse=True)
+        buckets = buckets.reshape(-1)
+        order = np.argsort(buckets, kind="stable")
+        boundaries = np.flatnonzero(np.diff(buckets[order])) + 1
+        for members in np.split(order, boundaries):
+            if len(members) < 2:
+                continue
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    pairs.add((int(members[x]), int(members[y])))
+    return pairs
+
+
+def text_duplicate_pairs(
+    texts,
+    threshold=DEFAULT_JACCARD_THRESHOLD,
+    num_perm=DEFAULT_NUM_PERM,
+    bands=DEFAULT_BANDS,
+    shingle_chars=DEFAULT_SHINGLE_CHARS,
+    seed=0,
+):
+    """
+    [(i, j, estimated Jaccard)] for text pairs at or above threshold
+    """
+    signatures = MinHasher(num_perm=num_perm, seed=seed).signatures(texts, shingle_chars)
+    pairs = []
+    for i, j in sorted(lsh_candidate_pairs(signatures, bands=bands)):
+        similarity = float(np.mean(signatures[i] == signatures[j]))
+        if similarity >= threshold:
+            pairs.append((i, j, similarity))
+    return pairs
+
+
+def embedding_duplicate_pairs(embeddings, threshold=DEFAULT_COSINE_THRESHOLD, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    [(i, j, cosine)] for embedding pairs at or above threshold
+    Row block [start, end) is compared with rows start.. only, so each pair
+    is computed once
+    """
+    norms = np.linalg.norm(embeddings, axis=1).astype(np.float32)
+    norms[norms == 0] = 1.0
+    pairs = []
+    for start in range(0, embeddings.shape[0], block_size):
+        end = min(start + block_size, embeddings.shape[0])
+        block = np.asarray(embeddings[start:end], dtype=np.float32) / norms[start:end, None]
+        rest = np.asarray(embeddings[start:], dtype=np.float32)
+        cosines = (block @ rest.T) / norms[None, start:]
+        # Keep j > i: column c is row start + c
+        cosines[np.tril_indices(end - start, 0, cosines.shape[1])] = -np.inf
+        rows, columns = np.nonzero(cosines >= threshold)
+        for row, column in zip(rows, columns):
+            pairs.append((start + int(row), start + int(column), float(cosines[row, column])))
+    return pairs
+
+
+def _clusters(count, pairs):
+    parent = list(range(count))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in pairs:
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    groups = {}
+    for i in range(count):
+        groups.setdefault(find(i), []).append(i)
+    return [members for members in groups.values() if len(members) > 1]
+
+
+def find_duplicates(
+    chunks,
+    embeddings=None,
+    jaccard_threshold=DEFAULT_JACCARD_THRESHOLD,
+    cosine_threshold=DEFAULT_COSINE_THRESHOLD,
+    cross_source=False,
+    block_size=DEFAULT_BLOCK_SIZE,
+):
+    """
+    Near-duplicate report for chunks (and their embedding rows, if given)
+    Only chunks of the same source are compared unless cross_source
+    Returns {"chunks", "text_pairs", "embedding_pairs", "clusters", "drop",
+    "seconds"}; pairs and clusters hold chunk indices, and drop lists every
+    cluster member but the first
+    """
+    start = time.perf_counter()
+    text_pairs = text_duplicate_pairs([chunk.get("text", "") for chunk in chunks], threshold=jaccard_threshold)
+    text_seconds = time.perf_counter() - start
+
+    embedding_pairs = []
+    if embeddings is not None and cosine_threshold is not None:
+        embedding_pairs = embedding_duplicate_pairs(embeddings, threshold=cosine_threshold, block_size=block_size)
+    embedding_seconds = time.perf_counter() - start - text_seconds
+
+    if not cross_source:
+        def same_source(pair):
+            return chunks[pair[0]].get("source") == chunks[pair[1]].get("source")
+
+        text_pairs = [pair for pair in text_pairs if same_source(pair)]
+        embedding_pairs = [pair for pair in embedding_pairs if same_source(pair)]
+
+    clusters = _clusters(len(chunks), [pair[:2] for pair in text_pairs + embedding_pairs])
+    return {
+        "chunks": len(chunks),
+        "text_pairs": text_pairs,
+        "embedding_pairs": embedding_pairs,
+        "clusters": clusters,
+        "drop": sorted(i for members in clusters for i in members[1:]),
+        "seconds": {"text": text_seconds, "embeddings": embedding_seconds},
+    }
+
+
+def drop_duplicates(artifact, drop):
+    """
+    Copy of an artifact without the rows in drop
+    """
+    keep = np.setdiff1d(np.arange(len(artifact)), np.asarray(drop, dtype=np.int64))
+    return EmbeddingArtifact(
+        [artifact.chunks[i] for i in keep],
+        np.ascontiguousarray(artifact.embeddings[keep]),
+        model=artifact.model,
+        truncated_from=artifact.truncated_from,
+    )
+
+
+def _describe(chunk, origin):
+    return f"{origin} {chunk.get('source') or '?'}:{chunk.get('chunk_id')} (p.{chunk.get('page_number', '?')})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find near-duplicate chunks before ingest.")
+    parser.add_argument("--artifact", action="append", default=[], help="Embedding artifact (text + embeddings)")
+    parser.add_argument("--chunks", action="append", default=[], help="Chunks JSON file (text only)")
+    parser.add_argument("--jaccard", type=float, default=DEFAULT_JACCARD_THRESHOLD, help="MinHash Jaccard threshold")
+    parser.add_argument("--cosine", type=float, default=DEFAULT_COSINE_THRESHOLD, help="Embedding cosine threshold")
+    parser.add_argument("--cross-source", action="store_true", help="Also match chunks of different sources")
+    parser.add_argument("--report", default=None, help="Write the JSON report here")
+    parser.add_argument("--drop", action="store_true", help="Write the artifact without its duplicates")
+    parser.add_argument("--output", default=None, help="Output artifact for --drop (one --artifact only)")
+    parser.add_argument("--show", type=int, default=10, help="Example pairs to print")
+    args = parser.parse_args()
+
+    if not args.artifact and not args.chunks:
+        parser.error("give at least one --artifact or --chunks")
+    if args.drop and (len(args.artifact) != 1 or args.chunks or not args.output):
+        parser.error("--drop needs exactly one --artifact and --output")
+
+    chunks = []
+    origins = []
+    matrices = []
+    for path in args.artifact:
+        artifact = load_embedded_chunks(path)
+        chunks.extend(artifact.chunks)
+        origins.extend([os.path.basename(path)] * len(artifact))
+        matrices.append(artifact.embeddings)
+    for path in args.chunks:
+        with open(path, "r", encoding="utf-8") as f:
+            file_chunks = json.load(f)
+        chunks.extend(file_chunks)
+        origins.extend([os.path.basename(path)] * len(file_chunks))
+    # The embedding pass needs a vector for every chunk
+    embeddings = np.concatenate(matrices) if matrices and not args.chunks else None
+
+    report = find_duplicates(
+        chunks,
+        embeddings,
+        jaccard_threshold=args.jaccard,
+        cosine_threshold=args.cosine,
+        cross_source=args.cross_source,
+    )
+    print(
+        f"📊 {report['chunks']} chunks: {len(report['text_pairs'])} text pairs "
+        f"({report['seconds']['text']:.2f}s), {len(report['embedding_pairs'])} embedding pairs "
+        f"({report['seconds']['embeddings']:.2f}s), {len(report['clusters'])} clusters, "
+        f"{len(report['drop'])} duplicates"
+    )
+    for kind in ("text_pairs", "embedding_pairs"):
+        for i, j, similarity in report[kind][:args.show]:
+            print(f"   {kind.split('_')[0]:<9} {similarity:.3f}  {_describe(chunks[i], origins[i])}  ~  {_describe(chunks[j], origins[j])}")
+
+    if args.report:
+        described = dict(report)
+        for kind in ("text_pairs", "embedding_pairs"):
+            described[kind] = [
+                {"keep": _describe(chunks[i], origins[i]), "duplicate": _describe(chunks[j], origins[j]), "similarity": similarity}
+                for i, j, similarity in report[kind]
+            ]
+        described["clusters"] = [[_describe(chunks[i], origins[i]) for i in members] for members in report["clusters"]]
+        described["drop"] = [_describe(chunks[i], origins[i]) for i in report["drop"]]
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(described, f, indent=2)
+        print(f"✅ Report written to {args.report}")
+
+    if args.drop:
+        deduped = drop_duplicates(artifact, report["drop"])
+        save_embedded_chunks(
+            args.output,
+            deduped.chunks,
+            deduped.embeddings,
+            model=deduped.model,
+            truncated_from=deduped.truncated_from,
+        )
+        print(f"✅ {len(deduped)} chunks written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
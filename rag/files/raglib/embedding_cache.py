@@ -0,0 +1,185 @@
+"""
+Persistent content-hash embedding cache
+Vectors are stored as float32 blobs in SQLite, keyed by (model, hash of the
+normalized chunk text), so reruns only embed new or changed chunks
+"""
+
+import hashlib
+import os
+import sqlite3
+import unicodedata
+from array import array
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "embedding_cache.sqlite",
+)
+
+_LOOKUP_BATCH = 500  # Stay well under SQLite's bound-parameter limit
+
+
+def normalize_text(text):
+    """
+    Canonical form of a chunk for hashing: NFC, collapsed whitespace
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_hash(text):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def _pack(vector):
+    return array("f", vector).tobytes()
+
+
+def _unpack(blob):
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class EmbeddingCache:
+    """
+    SQLite-backed (model, text hash) -> float32 vector store
+    Keeps hit/miss counters for the lookups made through it
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        # The streaming pipeline uses the cache from a prefetch thread
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                dimensions INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            ) WITHOUT ROWID
+            """
+        )
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def get_many(self, model, texts):
+        """
+        Look up vectors for texts; returns a list with None for every miss
+        """
+        hashes = [text_hash(text) for text in texts]
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        for start in range(0, len(unique), _LOOKUP_BATCH):
+            batch = unique[start:start + _LOOKUP_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.conn.execute(
+                f"SELECT text_hash, vector FROM embeddings "
+                f"WHERE model = ? AND text_hash IN ({placeholders})",
+                [model, *batch],
+            )
+            for digest, blob in rows:
+                found[digest] = _unpack(blob)
+
+        results = [found.get(digest) for digest in hashes]
+        hit_count = sum(1 for vector in results if vector is not None)
+        self.hits += hit_count
+        self.misses += len(results) - hit_count
+        return results
+
+    def put_many(self, model, texts, vectors):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, text_hash, dimensions, vector) "
+            "VALUES (?, ?, ?, ?)",
+            [
+                (model, text_hash(text), len(vector), _pack(vector))
+                for text, vector in zip(texts, vectors)
+            ],
+        )
+        self.conn.commit()
+
+    def count(self, model=None):
+        if model is None:
+            return self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM embeddings WHERE model = ?", (model,)
+        ).fetchone()[0]
+
+
+def embed_with_cache(engine, cache, texts, progress=None, out=None):
+    """
+    Embed texts through the cache: hits are read back, misses go to the engine
+    Identical texts in one call are only embedded once
+    With out, a preallocated (len(texts), D) array, the vectors are written
+    into it and it is returned instead of a list
+    """
+    texts = list(texts)
+    if cache is None:
+        vectors = engine.embed(texts, progress=progress)
+        if out is None:
+            return vectors
+        if len(texts):
+            out[:] = vectors
+        return out
+
+    embeddings = cache.get_many(engine.model, texts)
+
+    pending = {}
+    for i, vector in enumerate(embeddings):
+        if vector is None:
+            pending.setdefault(text_hash(texts[i]), []).append(i)
+        elif out is not None:
+            out[i] = vector
+
+    if pending:
+        positions = list(pending.values())
+        miss_texts = [texts[indexes[0]] for indexes in positions]
+        vectors = engine.embed(miss_texts, progress=progress)
+        cache.put_many(engine.model, miss_texts, vectors)
+        for indexes, vector in zip(positions, vectors):
+            if out is not None:
+                out[indexes] = vector
+                continue
+            for i in indexes:
+                embeddings[i] = vector
+
+    return embeddings if out is None else out
+
+
+def add_cache_arguments(parser):
+    """
+    Register the common --cache/--no-cache flags
+    """
+    parser.add_argument(
+        "--cache",
+        default=DEFAULT_CACHE_PATH,
+        help="SQLite embedding cache file",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Embed every chunk and leave the cache untouched",
+    )
+    return parser
+
+
+def open_cache(args):
+    """
+    Open the cache selected by add_cache_arguments flags, or None
+    """
+    if getattr(args, "no_cache", False):
+        return None
+    return EmbeddingCache(args.cache)
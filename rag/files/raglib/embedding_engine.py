@@ -0,0 +1,272 @@
+"""
+Batched, concurrent OpenAI embedding engine
+Sends many chunks per request, keeps a bounded number of requests in flight
+and backs off using the rate-limit headers returned by the API
+"""
+
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    OpenAI,
+    RateLimitError,
+)
+
+DEFAULT_MODEL = "text-embedding-3-small"
+DEFAULT_BATCH_SIZE = 128
+DEFAULT_CONCURRENCY = 4
+MAX_INPUTS_PER_REQUEST = 2048  # Hard limit of the embeddings endpoint
+MAX_RETRIES = 6
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_reset_duration(value):
+    """
+    Parse an OpenAI reset header ("1s", "6m0s", "20ms", "0.5") into seconds
+    Returns None when the value can't be understood
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    scale = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    return sum(float(amount) * scale[unit] for amount, unit in parts)
+
+
+def backoff_from_headers(headers):
+    """
+    Work out how long to pause from rate-limit response headers
+    Prefers retry-after, then the request/token reset windows
+    """
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms is not None:
+        try:
+            return float(retry_after_ms) / 1000.0
+        except ValueError:
+            pass
+
+    retry_after = parse_reset_duration(headers.get("retry-after"))
+    if retry_after is not None:
+        return retry_after
+
+    resets = [
+        parse_reset_duration(headers.get("x-ratelimit-reset-requests")),
+        parse_reset_duration(headers.get("x-ratelimit-reset-tokens")),
+    ]
+    resets = [r for r in resets if r is not None]
+    return max(resets) if resets else None
+
+
+class RateLimitGate:
+    """
+    Shared pause point for all workers
+    When one request is throttled every worker waits, instead of each one
+    hammering the API and collecting its own 429
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+    def wait(self):
+        while True:
+            with self._lock:
+                delay = self._resume_at - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    def observe(self, headers):
+        """
+        Pause proactively when the API reports the current window is used up
+        """
+        if not headers:
+            return
+        for remaining_key, reset_key in (
+            ("x-ratelimit-remaining-requests", "x-ratelimit-reset-requests"),
+            ("x-ratelimit-remaining-tokens", "x-ratelimit-reset-tokens"),
+        ):
+            remaining = headers.get(remaining_key)
+            if remaining is None:
+                continue
+            try:
+                exhausted = int(float(remaining)) <= 0
+            except ValueError:
+                continue
+            if exhausted:
+                reset = parse_reset_duration(headers.get(reset_key))
+                if reset:
+                    self.pause(reset)
+
+
+class EmbeddingEngine:
+    """
+    Embed lists of texts with batching, bounded concurrency and adaptive backoff
+    Results always come back in the same order as the input texts
+    """
+
+    def __init__(
+        self,
+        client=None,
+        model=DEFAULT_MODEL,
+        batch_size=DEFAULT_BATCH_SIZE,
+        concurrency=DEFAULT_CONCURRENCY,
+        max_retries=MAX_RETRIES,
+        api_key=None,
+        base_url=None,
+        timeout=60.0,
+    ):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        # The OpenAI client is created on first use, so building pipeline
+        # stages (e.g. --dry-run) doesn't need an API key
+        self._client = client
+        self._client_options = {"api_key": api_key, "base_url": base_url, "timeout": timeout}
+        self._client_lock = threading.Lock()
+        self.model = model
+        self.batch_size = min(batch_size, MAX_INPUTS_PER_REQUEST)
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.gate = RateLimitGate()
+        self.stats = {"requests": 0, "retries": 0, "rate_limited": 0, "inputs": 0}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._client_lock:
+            if self._client is None:
+                # Retries are handled here so the backoff is shared across workers
+                self._client = OpenAI(max_retries=0, **self._client_options)
+            return self._client
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def _embed_batch(self, texts):
+        attempt = 0
+        while True:
+            self.gate.wait()
+            try:
+                raw = self.client.embeddings.with_raw_response.create(
+                    model=self.model,
+                    input=texts,
+                )
+                self._count("requests")
+                self.gate.observe(raw.headers)
+                response = raw.parse()
+                # The API doesn't promise to keep input order
+                data = sorted(response.data, key=lambda item: item.index)
+                return [item.embedding for item in data]
+
+            except RateLimitError as e:
+                self._count("rate_limited")
+                delay = backoff_from_headers(e.response.headers if e.response else None)
+                error = e
+            except (APIConnectionError, APITimeoutError) as e:
+                delay = None
+                error = e
+            except APIStatusError as e:
+                if e.status_code < 500:
+                    raise
+                delay = backoff_from_headers(e.response.headers if e.response else None)
+                error = e
+
+            attempt += 1
+            if attempt > self.max_retries:
+                raise error
+            self._count("retries")
+
+            if delay is None:
+                delay = min(60.0, (2 ** attempt) * 0.5)
+            # Jitter so workers released together don't collide again
+            delay += random.uniform(0, min(1.0, delay * 0.1))
+            self.gate.pause(delay)
+
+    def embed(self, texts, progress=None):
+        """
+        Embed all texts, returning one vector per text in input order
+        progress, if given, is called as progress(done, total) after each batch
+        """
+        texts = list(texts)
+        total = len(texts)
+        if total == 0:
+            return []
+
+        batches = [
+            (start, texts[start:start + self.batch_size])
+            for start in range(0, total, self.batch_size)
+        ]
+        embeddings = [None] * total
+        done = 0
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {
+                executor.submit(self._embed_batch, batch): (start, len(batch))
+                for start, batch in batches
+            }
+            for future in as_completed(futures):
+                start, size = futures[future]
+                vectors = future.result()
+                if len(vectors) != size:
+                    raise RuntimeError(
+                        f"Expected {size} embeddings, got {len(vectors)}"
+                    )
+                embeddings[start:start + size] = vectors
+                done += size
+                self._count("inputs", size)
+                if progress:
+                    progress(done, total)
+
+        return embeddings
+
+
+def add_engine_arguments(parser):
+    """
+    Register the common --model/--batch-size/--concurrency/--base-url flags
+    """
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Embedding model name")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Chunks per embeddings request (max {MAX_INPUTS_PER_REQUEST})",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="Maximum embeddings requests in flight",
+    )
+    parser.add_argument(
+        "--base-url",
+        default=None,
+        help="Override the OpenAI API base URL (e.g. a local fake server)",
+    )
+    return parser
@@ -0,0 +1,343 @@
+"""
+Embedding providers: one interface over the OpenAI API and local
+sentence-transformers models (PyTorch, or ONNX Runtime) on CPU
+A provider has a model name, a dimension count and the Atlas vector index
+that holds its vectors, and tags every chunk it embeds with the model and
+dimensions, so vectors from different models are never searched together
+  embed(texts, progress=None) -> one vector per text, in input order
+  embed_query(text)           -> one vector
+Providers have .model and .embed(), so they also work with
+embedding_cache.embed_with_cache
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from raglib.embedding_engine import DEFAULT_MODEL, EmbeddingEngine
+
+DEFAULT_LOCAL_MODEL = "all-MiniLM-L6-v2"
+DEFAULT_LOCAL_BATCH_SIZE = 128
+# Largest shard of work sent to one process, in batches
+SHARD_BATCHES = 8
+
+# Vector spaces in use: dimensions and the Atlas vector index holding them
+MODEL_SPACES = {
+    "text-embedding-3-small": {"dimensions": 1536, "index": "text_vector_index"},
+    "all-MiniLM-L6-v2": {"dimensions": 384, "index": "vector_index"},
+}
+
+
+class EmbeddingProvider(ABC):
+    """
+    Base class; subclasses implement embed()
+    """
+
+    backend = None
+
+    def __init__(self, model, dimensions=None, index_name=None):
+        space = MODEL_SPACES.get(model, {})
+        self.model = model
+        self.dimensions = dimensions or space.get("dimensions")
+        self.index_name = index_name or space.get("index")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    @abstractmethod
+    def embed(self, texts, progress=None):
+        """
+        One vector per text, in input order; progress(done, total) if given
+        """
+
+    def embed_query(self, text):
+        return self.embed([text])[0]
+
+    def _observe(self, dimensions):
+        """
+        Record the model's dimension count, or fail if it isn't the expected one
+        """
+        if self.dimensions is None:
+            self.dimensions = dimensions
+        elif dimensions != self.dimensions:
+            raise ValueError(f"{self.model} returned {dimensions}-dim vectors, expected {self.dimensions}")
+
+    def tag(self, chunk, embedding):
+        """
+        Mark a chunk with the vector space of its embedding
+        """
+        self._observe(len(embedding))
+        chunk["embedding_model"] = self.model
+        chunk["dimensions"] = len(embedding)
+        return chunk
+
+    def check_index(self, index):
+        """
+        Raise ValueError unless a local index (LocalVectorIndex, IVFIndex or
+        QuantizedIndex) holds this model's vectors
+        """
+        index = getattr(index, "base", index)
+        model = getattr(index, "model", None)
+        if model is not None and model != self.model:
+            raise ValueError(f"Index holds {model} embeddings; queries are embedded with {self.model}")
+        truncated = getattr(index, "truncated", False) or getattr(index, "truncated_from", None)
+        if self.dimensions is not None and not truncated and index.dimensions != self.dimensions:
+            raise ValueError(f"Index holds {index.dimensions}-dim embeddings; {self.model} gives {self.dimensions}")
+
+
+class OpenAIProvider(EmbeddingProvider):
+    """
+    OpenAI embeddings API through an EmbeddingEngine (batching, concurrency,
+    rate-limit backoff)
+    """
+
+    backend = "openai"
+
+    def __init__(self, engine=None, model=DEFAULT_MODEL, index_name=None, **engine_kwargs):
+        self.engine = engine or EmbeddingEngine(model=model, **engine_kwargs)
+        super().__init__(self.engine.model, index_name=index_name)
+
+    @property
+    def stats(self):
+        return self.engine.stats
+
+    def embed(self, texts, progress=None):
+        vectors = self.engine.embed(texts, progress=progress)
+        if vectors:
+            self._observe(len(vectors[0]))
+        return vectors
+
+
+# Model loaded once in each pool worker process
+_worker_model = None
+
+
+def _init_worker(model, model_kwargs, threads):
+    global _worker_model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    # Workers split the cores instead of each using all of them
+    torch.set_num_threads(threads)
+    _worker_model = SentenceTransformer(model, **model_kwargs)
+
+
+def _worker_dimensions():
+    return _worker_model.get_sentence_embedding_dimension()
+
+
+def _encode_shard(texts, batch_size):
+    return np.asarray(
+        _worker_model.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False),
+        dtype=np.float32,
+    )
+
+
+class SentenceTransformerProvider(EmbeddingProvider):
+    """
+    Local sentence-transformers model
+    Texts are sorted by length, longest first, so each model.encode batch
+    holds texts of similar length (little padding), and cut into shards of
+    a few batches. With processes > 1 the shards go to a pool of worker
+    processes (one model copy each, the cores split between them)
+    embed() fills a preallocated (N, D) float32 array, unit-normalized if
+    normalize, in input order
+    """
+
+    backend = "sentence-transformers"
+
+    def __init__(
+        self,
+        model=DEFAULT_LOCAL_MODEL,
+        device="cpu",
+        batch_size=DEFAULT_LOCAL_BATCH_SIZE,
+        processes=1,
+        normalize=True,
+        sort_by_length=True,
+        index_name=None,
+    ):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        super().__init__(model, index_name=index_name)
+        self.device = device
+        self.batch_size = batch_size
+        self.processes = max(1, processes)
+        self.normalize = normalize
+        self.sort_by_length = sort_by_length
+        self.stats = {"inputs": 0, "seconds": 0.0}
+        self._model = None
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _model_kwargs(self):
+        return {"device": self.device}
+
+    def load(self):
+        """
+        The SentenceTransformer, loaded on first use (single-process mode)
+        """
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import SentenceTransformer
+
+                self._model = SentenceTransformer(self.model, **self._model_kwargs())
+                self._observe(self._model.get_sentence_embedding_dimension())
+            return self._model
+
+    def _start_pool(self):
+        with self._lock:
+            if self._pool is None:
+                threads = max(1, (os.cpu_count() or 1) // self.processes)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.model, self._model_kwargs(), threads),
+                )
+            pool = self._pool
+        if self.dimensions is None:
+            self._observe(pool.submit(_worker_dimensions).result())
+        return pool
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def _encode(self, texts):
+        return self._model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+
+    def _shards(self, texts):
+        """
+        Row indexes of texts, longest text first, cut into shards
+        """
+        if self.sort_by_length:
+            order = np.argsort([-len(text) for text in texts], kind="stable")
+        else:
+            order = np.arange(len(texts))
+        # Several shards per process, so a slow shard doesn't hold up the rest
+        size = min(self.batch_size * SHARD_BATCHES, -(-len(texts) // (self.processes * 4)))
+        size = max(size, min(self.batch_size, len(texts)), 1)
+        return [order[start:start + size] for start in range(0, len(texts), size)]
+
+    def embed(self, texts, progress=None):
+        texts = list(texts)
+        start_time = time.perf_counter()
+        pool = self._start_pool() if self.processes > 1 else None
+        if pool is None:
+            self.load()
+        embeddings = np.empty((len(texts), self.dimensions), dtype=np.float32)
+        done = 0
+
+        if pool is None:
+            for rows in self._shards(texts):
+                embeddings[rows] = self._encode([texts[i] for i in rows])
+                done += len(rows)
+                if progress:
+                    progress(done, len(texts))
+        else:
+            futures = {
+                pool.submit(_encode_shard, [texts[i] for i in rows], self.batch_size): rows
+                for rows in self._shards(texts)
+            }
+            for future in as_completed(futures):
+                rows = futures[future]
+                embeddings[rows] = future.result()
+                done += len(rows)
+                if progress:
+                    progress(done, len(texts))
+
+        if self.normalize and len(texts):
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            embeddings /= norms
+        self.stats["inputs"] += len(texts)
+        self.stats["seconds"] += time.perf_counter() - start_time
+        return embeddings
+
+
+class ONNXProvider(SentenceTransformerProvider):
+    """
+    sentence-transformers model run with ONNX Runtime (backend="onnx";
+    needs sentence-transformers >= 3.2 and optimum[onnxruntime]). Same vector
+    space as the PyTorch model of the same name
+    """
+
+    backend = "onnx"
+
+    def _model_kwargs(self):
+        return {"device": self.device, "backend": "onnx"}
+
+
+PROVIDERS = {
+    "openai": OpenAIProvider,
+    "sentence-transformers": SentenceTransformerProvider,
+    "onnx": ONNXProvider,
+}
+
+
+def get_provider(name, **kwargs):
+    try:
+        provider_class = PROVIDERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown embedding provider {name!r}; expected one of {sorted(PROVIDERS)}") from None
+    return provider_class(**kwargs)
+
+
+def add_provider_arguments(parser, provider="openai"):
+    """
+    Register --provider plus the OpenAI and local model flags
+    --model and --batch-size default per provider
+    """
+    parser.add_argument("--provider", choices=list(PROVIDERS), default=provider, help="Embedding provider")
+    parser.add_argument(
+        "--model",
+        default=None,
+        help=f"Embedding model (default {DEFAULT_MODEL} for openai, {DEFAULT_LOCAL_MODEL} for local providers)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help="Texts per embeddings request (openai) or per model.encode batch (local)",
+    )
+    parser.add_argument("--concurrency", type=int, default=None, help="Embeddings requests in flight (openai)")
+    parser.add_argument("--base-url", default=None, help="Override the OpenAI API base URL (openai)")
+    parser.add_argument("--device", default="cpu", help="Torch device for local models")
+    parser.add_argument("--processes", type=int, default=1, help="Worker processes for local models")
+    return parser
+
+
+def provider_from_args(args, **kwargs):
+    if args.provider == "openai":
+        engine_kwargs = {"base_url": args.base_url}
+        if args.batch_size:
+            engine_kwargs["batch_size"] = args.batch_size
+        if args.concurrency:
+            engine_kwargs["concurrency"] = args.concurrency
+        return OpenAIProvider(model=args.model or DEFAULT_MODEL, **engine_kwargs, **kwargs)
+    return get_provider(
+        args.provider,
+        model=args.model or DEFAULT_LOCAL_MODEL,
+        device=args.device,
+        batch_size=args.batch_size or DEFAULT_LOCAL_BATCH_SIZE,
+        processes=args.processes,
+        **kwargs,
+    )
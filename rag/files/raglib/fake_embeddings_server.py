@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""
+Local fake of the OpenAI /v1/embeddings endpoint for exercising the pipeline
+Returns deterministic unit vectors derived from a hash of each input and can
+simulate throttling with a 429 every N requests
+
+Usage:
+  python -m raglib.fake_embeddings_server --port 8765 --throttle-every 5
+  python 3_generate_embeddings.py --base-url http://127.0.0.1:8765/v1
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_embedding(text, dimensions):
+    """
+    Deterministic pseudo-random unit vector for a piece of text
+    """
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dimensions)]
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def make_handler(dimensions, throttle_every, retry_after):
+    state = {"requests": 0}
+    lock = threading.Lock()
+
+    class FakeEmbeddingsHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/embeddings"):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+
+            with lock:
+                state["requests"] += 1
+                count = state["requests"]
+
+            if throttle_every and count % throttle_every == 0:
+                self._send_json(
+                    429,
+                    {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                    headers={"retry-after": str(retry_after)},
+                )
+                return
+
+            inputs = request.get("input", [])
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            dims = request.get("dimensions") or dimensions
+
+            self._send_json(
+                200,
+                {
+                    "object": "list",
+                    "model": request.get("model"),
+                    "data": [
+                        {"object": "embedding", "index": i, "embedding": fake_embedding(text, dims)}
+                        for i, text in enumerate(inputs)
+                    ],
+                    "usage": {"prompt_tokens": 0, "total_tokens": 0},
+                },
+                headers={
+                    "x-ratelimit-remaining-requests": "1000",
+                    "x-ratelimit-reset-requests": "1s",
+                },
+            )
+
+    return FakeEmbeddingsHandler
+
+
+def serve(host="127.0.0.1", port=8765, dimensions=1536, throttle_every=0, retry_after=0.5):
+    """
+    Start the fake server; returns the server so callers can shut it down
+    """
+    handler = make_handler(dimensions, throttle_every, retry_after)
+    server = ThreadingHTTPServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI embeddings server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument(
+        "--throttle-every",
+        type=int,
+        default=0,
+        help="Answer every Nth request with a 429 (0 disables)",
+    )
+    parser.add_argument("--retry-after", type=float, default=0.5)
+    args = parser.parse_args()
+
+    handler = make_handler(args.dimensions, args.throttle_every, args.retry_after)
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"🧪 Fake embeddings server on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Streaming, idempotent ingest of chunk documents into MongoDB
+Documents are upserted in unordered bulk_write batches keyed on
+(source, chunk_id); a content hash stored on each document lets reruns skip
+chunks that haven't changed. The collection is never emptied, so live
+search keeps working while an ingest runs
+"""
+
+import hashlib
+import json
+from array import array
+from itertools import islice
+
+from pymongo import ReplaceOne
+
+DEFAULT_BATCH_SIZE = 500
+
+# Fields that change between runs without the chunk itself changing
+HASH_EXCLUDED_FIELDS = {"_id", "content_hash", "created_at", "ingested_at"}
+
+
+def content_hash(document):
+    """
+    Stable hash of a chunk document's metadata and embedding
+    """
+    metadata = {
+        key: value
+        for key, value in document.items()
+        if key not in HASH_EXCLUDED_FIELDS and key != "embedding"
+    }
+    digest = hashlib.sha256(
+        json.dumps(metadata, sort_keys=True, default=str).encode("utf-8")
+    )
+    embedding = document.get("embedding")
+    if embedding is not None:
+        digest.update(array("f", embedding).tobytes())
+    return digest.hexdigest()
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def ensure_indexes(collection):
+    collection.create_index([("source", 1), ("chunk_id", 1)])
+    collection.create_index("page_number")
+    collection.create_index("chunk_id")
+    collection.create_index("source")
+
+
+def upsert_chunks(collection, documents, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Upsert documents batch by batch, skipping ones whose content hash matches
+    Returns counts of inserted, updated and unchanged documents plus the set
+    of (source, chunk_id) keys seen, which prune_missing_chunks can use
+    """
+    stats = {"inserted": 0, "updated": 0, "unchanged": 0, "seen": set()}
+
+    for batch in batched(documents, batch_size):
+        keys = []
+        for document in batch:
+            document["content_hash"] = content_hash(document)
+            keys.append((document.get("source"), document["chunk_id"]))
+
+        existing = {}
+        for source in {source for source, _ in keys}:
+            chunk_ids = [chunk_id for key_source, chunk_id in keys if key_source == source]
+            for row in collection.find(
+                {"source": source, "chunk_id": {"$in": chunk_ids}},
+                {"_id": 0, "chunk_id": 1, "content_hash": 1},
+            ):
+                existing[(source, row["chunk_id"])] = row.get("content_hash")
+
+        operations = []
+        for key, document in zip(keys, batch):
+            stats["seen"].add(key)
+            if key in existing and existing[key] == document["content_hash"]:
+                stats["unchanged"] += 1
+                continue
+            if key in existing:
+                stats["updated"] += 1
+            else:
+                stats["inserted"] += 1
+            source, chunk_id = key
+            operations.append(
+                ReplaceOne({"source": source, "chunk_id": chunk_id}, document, upsert=True)
+            )
+
+        if operations:
+            collection.bulk_write(operations, ordered=False)
+
+        if progress:
+            progress(stats)
+
+    return stats
+
+
+def prune_missing_chunks(collection, source, seen):
+    """
+    Delete chunks of a source that weren't part of the latest ingest
+    Runs after the upserts so the source is never missing from the collection
+    """
+    keep = [chunk_id for key_source, chunk_id in seen if key_source == source]
+    result = collection.delete_many({"source": source, "chunk_id": {"$nin": keep}})
+    return result.deleted_count
+
+
+def add_ingest_arguments(parser):
+    """
+    Register the common --batch-size/--prune flags
+    """
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Documents per bulk_write batch",
+    )
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="After upserting, delete chunks of this source that are no longer produced",
+    )
+    return parser
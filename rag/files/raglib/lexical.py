@@ -0,0 +1,361 @@
+#!/usr/bin/env python
+"""
+BM25 lexical index and hybrid (lexical + vector) retrieval
+Questions like "Explain the Third Tradition" or "Step Nine amends" hinge on
+exact terms that dense vectors match poorly. The BM25 index is built over
+the chunk texts when the corpus is built and kept in CSR form: one postings
+slice per term (doc ids and precomputed BM25 weights), memory-mapped from
+.npy files, so scoring a query is a few NumPy slice adds
+
+hybrid_search fuses the lexical ranking with a vector ranking by reciprocal
+rank fusion. Each side only has to bring a short candidate list, so the
+vector search can run with a smaller numCandidates
+
+Usage:
+  python -m raglib.lexical build --artifact 12-12/12_12_chunks_with_embeddings \
+      --artifact aa_chunks_with_openai_embeddings --output bm25_index
+  python -m raglib.lexical search --index bm25_index "Step Nine amends"
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from collections import Counter
+
+import numpy as np
+
+from raglib.artifacts import load_embedded_chunks
+from raglib.local_search import RESULT_FIELDS, ChunkColumns, filter_mask
+from raglib.sources import RAG_FILES_DIR
+
+FORMAT_VERSION = "raglib-bm25/1"
+DEFAULT_LEXICAL_INDEX_DIR = os.path.join(RAG_FILES_DIR, "bm25_index")
+INDEX_FILES = ("bm25.meta.json", "terms.json", "docs.json", "offsets.npy", "doc_ids.npy", "weights.f32.npy")
+
+# Fields kept per chunk; page_range lets the benchmark score lexical hits
+STORED_FIELDS = RESULT_FIELDS + ("page_range",)
+
+DEFAULT_K1 = 1.2
+DEFAULT_B = 0.75
+DEFAULT_RRF_K = 60
+
+# Depth of each ranked list fed to the fusion, per requested result
+CANDIDATES_PER_RESULT = 2
+MIN_CANDIDATES = 10
+# numCandidates per vector candidate in hybrid mode (plain search uses 20)
+HYBRID_NUM_CANDIDATES_PER_RESULT = 5
+
+STOPWORDS = frozenset("""
+a about after all also am an and any are as at be been but by can could did do
+does for from had has have he her him his how i if in into is it its me more my
+no not of on or our out she so some such than that the their them then there
+these they this to up us was we were what when where which who why will with
+would you your
+""".split())
+
+# "Step Nine", "Ninth Step" and "Step 9" all become the token 9
+NUMBER_WORDS = {
+    word: str(number)
+    for number, words in enumerate(
+        [
+            ("one", "first"),
+            ("two", "second"),
+            ("three", "third"),
+            ("four", "fourth"),
+            ("five", "fifth"),
+            ("six", "sixth"),
+            ("seven", "seventh"),
+            ("eight", "eighth"),
+            ("nine", "ninth"),
+            ("ten", "tenth"),
+            ("eleven", "eleventh"),
+            ("twelve", "twelfth"),
+        ],
+        1,
+    )
+    for word in words
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """
+    Lowercased terms without stopwords; number words map to digits and a
+    plural 's' is dropped, so "Steps" matches "step"
+    """
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        token = NUMBER_WORDS.get(token, token)
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+class BM25Index:
+    """
+    Okapi BM25 over chunk texts
+    Postings are grouped by term (offsets[t]:offsets[t + 1]) and carry the
+    full BM25 weight of the term in each chunk, so k1 and b are fixed when
+    the index is built
+    """
+
+    def __init__(self, terms, offsets, doc_ids, weights, docs, k1=DEFAULT_K1, b=DEFAULT_B):
+        self.terms = terms
+        self.vocabulary = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.docs = docs
+        self.k1 = k1
+        self.b = b
+        self.column = ChunkColumns(docs)
+
+    def __len__(self):
+        return len(self.docs)
+
+    @classmethod
+    def build(cls, chunks, k1=DEFAULT_K1, b=DEFAULT_B):
+        vocabulary = {}
+        term_ids = []
+        doc_ids = []
+        frequencies = []
+        lengths = np.zeros(len(chunks), dtype=np.float32)
+        for doc_id, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk.get("text", "")))
+            lengths[doc_id] = sum(counts.values())
+            for term, count in counts.items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_ids.append(doc_id)
+                frequencies.append(count)
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        term_ids = term_ids[order]
+        doc_ids = np.asarray(doc_ids, dtype=np.int32)[order]
+        frequencies = np.asarray(frequencies, dtype=np.float32)[order]
+
+        document_frequency = np.bincount(term_ids, minlength=len(vocabulary)).astype(np.float32)
+        offsets = np.concatenate([[0], np.cumsum(document_frequency)]).astype(np.int64)
+        idf = np.log1p((len(chunks) - document_frequency + 0.5) / (document_frequency + 0.5))
+        average_length = float(lengths.mean()) if len(chunks) else 1.0
+        length_norm = k1 * (1 - b + b * lengths[doc_ids] / (average_length or 1.0))
+        weights = idf[term_ids] * frequencies * (k1 + 1) / (frequencies + length_norm)
+
+        docs = [{field: chunk[field] for field in STORED_FIELDS if field in chunk} for chunk in chunks]
+        terms = sorted(vocabulary, key=vocabulary.get)
+        return cls(terms, offsets, doc_ids, weights.astype(np.float32), docs, k1=k1, b=b)
+
+    @classmethod
+    def from_artifacts(cls, paths, k1=DEFAULT_K1, b=DEFAULT_B):
+        """
+        Index the chunks of embedding artifacts (they carry the source label)
+        """
+        chunks = [chunk for path in paths for chunk in load_embedded_chunks(path).chunks]
+        return cls.build(chunks, k1=k1, b=b)
+
+    def save(self, directory, artifact_paths=None):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "offsets.npy"), self.offsets)
+        np.save(os.path.join(directory, "doc_ids.npy"), self.doc_ids)
+        np.save(os.path.join(directory, "weights.f32.npy"), self.weights)
+        with open(os.path.join(directory, "terms.json"), "w", encoding="utf-8") as f:
+            json.dump(self.terms, f)
+        with open(os.path.join(directory, "docs.json"), "w", encoding="utf-8") as f:
+            json.dump(self.docs, f)
+        with open(os.path.join(directory, "bm25.meta.json"), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "format": FORMAT_VERSION,
+                    "count": len(self.docs),
+                    "terms": len(self.terms),
+                    "postings": int(self.doc_ids.shape[0]),
+                    "k1": self.k1,
+                    "b": self.b,
+                    "artifacts": list(artifact_paths or []),
+                },
+                f,
+                indent=2,
+            )
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Load a saved index; the postings arrays are mmap'd
+        """
+        with open(os.path.join(directory, "bm25.meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format in {directory}: {meta.get('format')}")
+        with open(os.path.join(directory, "terms.json"), "r", encoding="utf-8") as f:
+            terms = json.load(f)
+        with open(os.path.join(directory, "docs.json"), "r", encoding="utf-8") as f:
+            docs = json.load(f)
+
+        def load_array(name):
+            return np.load(os.path.join(directory, name), mmap_mode="r")
+
+        return cls(
+            terms,
+            np.asarray(load_array("offsets.npy")),
+            load_array("doc_ids.npy"),
+            load_array("weights.f32.npy"),
+            docs,
+            k1=meta["k1"],
+            b=meta["b"],
+        )
+
+    def scores(self, query):
+        """
+        BM25 score of every chunk for a query, in index order
+        """
+        scores = np.zeros(len(self.docs), dtype=np.float32)
+        for term, count in Counter(tokenize(query)).items():
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            # A chunk appears at most once per postings slice
+            scores[self.doc_ids[start:end]] += count * self.weights[start:end]
+        return scores
+
+    def filter_mask(self, filter):
+        return filter_mask(self.column, len(self), filter)
+
+    def search(self, query, limit=5, filter=None, fields=RESULT_FIELDS):
+        """
+        Top-k chunks containing any query term, best first
+        filter uses $vectorSearch filter syntax, like LocalVectorIndex
+        """
+        scores = self.scores(query)
+        candidates = np.flatnonzero(scores > 0)
+        if filter:
+            candidates = candidates[self.filter_mask(filter)[candidates]]
+        if len(candidates) == 0 or limit <= 0:
+            return []
+
+        if len(candidates) > limit:
+            top = np.argpartition(-scores[candidates], limit - 1)[:limit]
+            candidates = candidates[top]
+        order = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        results = []
+        for i in order:
+            doc = self.docs[i]
+            result = {field: doc[field] for field in fields if field in doc}
+            result["score"] = float(scores[i])
+            results.append(result)
+        return results
+
+
+def result_key(result):
+    return (result.get("source"), result.get("chunk_id"))
+
+
+def reciprocal_rank_fusion(rankings, k=DEFAULT_RRF_K, weights=None, limit=None):
+    """
+    Fuse ranked result lists given as {name: results best first}
+    A chunk scores sum(weight / (k + rank)) over the lists that returned it,
+    normalized so that ranking first in every list scores 1. Fused results
+    keep the fields of the first list that returned them, plus
+    <name>_score and <name>_rank for every list they were in
+    """
+    weights = weights or {}
+    best_possible = sum(weights.get(name, 1.0) for name in rankings) / (k + 1)
+    fused = {}
+    for name, results in rankings.items():
+        weight = weights.get(name, 1.0)
+        for rank, result in enumerate(results, 1):
+            entry = fused.get(result_key(result))
+            if entry is None:
+                entry = {field: value for field, value in result.items() if field != "score"}
+                entry["score"] = 0.0
+                fused[result_key(result)] = entry
+            entry["score"] += weight / (k + rank)
+            entry[f"{name}_score"] = result["score"]
+            entry[f"{name}_rank"] = rank
+
+    results = sorted(fused.values(), key=lambda result: result["score"], reverse=True)
+    for result in results:
+        result["score"] = result["score"] / best_possible if best_possible else 0.0
+    return results[:limit] if limit is not None else results
+
+
+def hybrid_candidates(limit):
+    """
+    How many results each side of a hybrid search should bring
+    """
+    return max(MIN_CANDIDATES, limit * CANDIDATES_PER_RESULT)
+
+
+def hybrid_search(
+    lexical_index,
+    query,
+    vector_search,
+    limit=5,
+    filter=None,
+    candidates=None,
+    rrf_k=DEFAULT_RRF_K,
+    weights=None,
+    fields=RESULT_FIELDS,
+):
+    """
+    Lexical + vector retrieval fused with reciprocal rank fusion
+    vector_search(n) returns the top-n vector results (with the same filter
+    applied); min_score, if any, is its business, since BM25 scores aren't on
+    the same scale. The fused 'score' is the normalized RRF score, and
+    'vector_score' / 'lexical_score' keep the originals
+    """
+    candidates = candidates or hybrid_candidates(limit)
+    rankings = {
+        "vector": vector_search(candidates),
+        "lexical": lexical_index.search(query, limit=candidates, filter=filter, fields=fields),
+    }
+    return reciprocal_rank_fusion(rankings, k=rrf_k, weights=weights, limit=limit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query the BM25 lexical index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Build an index from embedding artifacts")
+    build.add_argument("--artifact", action="append", required=True)
+    build.add_argument("--output", default=DEFAULT_LEXICAL_INDEX_DIR, help="Index directory")
+    build.add_argument("--k1", type=float, default=DEFAULT_K1)
+    build.add_argument("--b", type=float, default=DEFAULT_B)
+
+    search = subparsers.add_parser("search", help="Lexical search only")
+    search.add_argument("query", nargs="+")
+    search.add_argument("--index", default=DEFAULT_LEXICAL_INDEX_DIR, help="Index directory")
+    search.add_argument("--limit", type=int, default=5)
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        index = BM25Index.from_artifacts(args.artifact, k1=args.k1, b=args.b)
+        index.save(args.output, artifact_paths=args.artifact)
+        print(
+            f"✅ Indexed {len(index)} chunks, {len(index.terms)} terms in "
+            f"{time.perf_counter() - start:.2f}s -> {args.output}"
+        )
+        return
+
+    index = BM25Index.load(args.index)
+    for query in args.query:
+        start = time.perf_counter()
+        results = index.search(query, limit=args.limit)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"\n🔍 \"{query}\" - {len(results)} results in {elapsed_ms:.3f} ms")
+        for j, result in enumerate(results, 1):
+            excerpt = result["text"][:150].replace("\n", " ")
+            print(f"{j}. {result.get('source')} Page {result.get('page_number')} (BM25 {result['score']:.2f})\n   \"{excerpt}\"")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+"""
+Local in-process vector search over embedding artifacts
+Exact cosine top-k with NumPy over the memory-mapped float32 matrices, as an
+offline alternative (and reference) for the Atlas $vectorSearch pipeline
+
+Scores use Atlas' cosine normalization, score = (1 + cosine) / 2, so the
+min_score thresholds used with Atlas mean the same thing here
+
+Usage:
+  python -m raglib.local_search "What are the Twelve Steps?" \
+      --artifact 12-12/12_12_chunks_with_embeddings \
+      --artifact aa_chunks_with_openai_embeddings --source "AA Big Book 4th Edition"
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from raglib.artifacts import load_embedded_chunks, truncate_embeddings
+
+RESULT_FIELDS = ("text", "page_number", "chunk_id", "source")
+
+_COMPARISONS = {
+    "$eq": np.equal,
+    "$ne": np.not_equal,
+    "$gt": np.greater,
+    "$gte": np.greater_equal,
+    "$lt": np.less,
+    "$lte": np.less_equal,
+}
+# Comparisons that fail on None; numeric columns never hold None
+_ORDERINGS = ("$gt", "$gte", "$lt", "$lte")
+
+
+def cosine_to_score(cosine):
+    """
+    Map cosine similarity to Atlas' vectorSearchScore range [0, 1]
+    """
+    return (1.0 + cosine) / 2.0
+
+
+def _column(chunks, field):
+    values = [chunk.get(field) for chunk in chunks]
+    if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+        return np.asarray(values)
+    return np.asarray(values, dtype=object)
+
+
+def _condition_mask(column, condition):
+    """
+    Evaluate one $vectorSearch-style filter condition against a column
+    Supports a bare value (equality), $eq/$ne/$gt/$gte/$lt/$lte, $in and $nin
+    """
+    if not isinstance(condition, dict):
+        condition = {"$eq": condition}
+
+    mask = np.ones(len(column), dtype=bool)
+    for operator, operand in condition.items():
+        if operator in _ORDERINGS and column.dtype == object:
+            # Chunks without the field don't match, as in Atlas
+            present = np.array([value is not None for value in column], dtype=bool)
+            matches = np.zeros(len(column), dtype=bool)
+            matches[present] = _COMPARISONS[operator](column[present], operand).astype(bool)
+            mask &= matches
+        elif operator in _COMPARISONS:
+            mask &= _COMPARISONS[operator](column, operand).astype(bool)
+        elif operator == "$in":
+            mask &= np.isin(column, list(operand))
+        elif operator == "$nin":
+            mask &= ~np.isin(column, list(operand))
+        else:
+            raise ValueError(f"Unsupported filter operator: {operator}")
+    return mask
+
+
+def filter_mask(column, count, filter):
+    """
+    Boolean mask over count chunks for a {field: condition} filter
+    column(field) returns that field's values for every chunk
+    """
+    mask = np.ones(count, dtype=bool)
+    for field, condition in (filter or {}).items():
+        if field == "$and":
+            for clause in condition:
+                mask &= filter_mask(column, count, clause)
+            continue
+        mask &= _condition_mask(column(field), condition)
+    return mask
+
+
+class ChunkColumns:
+    """
+    Lazily built per-field columns over a list of chunks, for filtering
+    """
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self._columns = {}
+
+    def __call__(self, field):
+        if field not in self._columns:
+            self._columns[field] = _column(self.chunks, field)
+        return self._columns[field]
+
+
+class LocalVectorIndex:
+    """
+    Exact cosine search over one or more embedding artifacts
+    Matrices stay memory-mapped; only per-row norms and filter columns are
+    held in memory
+    """
+
+    def __init__(self, artifacts):
+        self.parts = []
+        dimensions = None
+        model = None
+        for artifact in artifacts:
+            if dimensions is not None and artifact.dimensions != dimensions:
+                raise ValueError(
+                    f"Can't mix {dimensions}-dim and {artifact.dimensions}-dim embeddings"
+                )
+            if model is not None and artifact.model is not None and artifact.model != model:
+                raise ValueError(f"Can't mix {model} and {artifact.model} embeddings")
+            dimensions = artifact.dimensions
+            model = model or artifact.model
+            norms = np.linalg.norm(artifact.embeddings, axis=1).astype(np.float32)
+            norms[norms == 0] = 1.0
+            self.parts.append((artifact, norms))
+        self.dimensions = dimensions or 0
+        self.model = model
+        # Full-size query vectors are truncated to match truncated artifacts
+        self.truncated = bool(self.parts) and all(artifact.truncated_from for artifact, _ in self.parts)
+        self.chunks = [chunk for artifact, _ in self.parts for chunk in artifact.chunks]
+        self.column = ChunkColumns(self.chunks)
+
+    @classmethod
+    def from_paths(cls, paths):
+        return cls([load_embedded_chunks(path) for path in paths])
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def filter_mask(self, filter):
+        """
+        Boolean mask over all chunks for a {field: condition} filter
+        """
+        return filter_mask(self.column, len(self), filter)
+
+    def fit_query(self, query_embedding):
+        """
+        Query as float32, truncated to the index's dimensions if the
+        artifacts were truncated
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if self.truncated and query.shape[-1] > self.dimensions:
+            query = truncate_embeddings(query, self.dimensions)
+        return query
+
+    def scores(self, query_embedding):
+        """
+        Atlas-normalized cosine scores for every chunk, in index order
+        """
+        query = self.fit_query(query_embedding)
+        if query.shape != (self.dimensions,):
+            raise ValueError(
+                f"Query has {query.shape[-1]} dims, index has {self.dimensions}"
+            )
+        query_norm = float(np.linalg.norm(query)) or 1.0
+        cosines = [
+            (artifact.embeddings @ query) / (norms * query_norm)
+            for artifact, norms in self.parts
+        ]
+        return cosine_to_score(np.concatenate(cosines) if cosines else np.zeros(0))
+
+    def search(self, query_embedding, limit=5, min_score=None, filter=None, fields=RESULT_FIELDS):
+        """
+        Top-k chunks for a query vector, best first
+        filter uses $vectorSearch filter syntax, e.g.
+        {"source": "AA Big Book 4th Edition", "page_number": {"$gte": 60, "$lte": 90}}
+        """
+        scores = self.scores(query_embedding)
+        candidates = np.flatnonzero(self.filter_mask(filter))
+        if min_score is not None:
+            candidates = candidates[scores[candidates] >= min_score]
+        if len(candidates) == 0 or limit <= 0:
+            return []
+
+        if len(candidates) > limit:
+            top = np.argpartition(-scores[candidates], limit - 1)[:limit]
+            candidates = candidates[top]
+        order = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        results = []
+        for i in order:
+            chunk = self.chunks[i]
+            result = {field: chunk[field] for field in fields if field in chunk}
+            result["score"] = float(scores[i])
+            results.append(result)
+        return results
+
+
+def build_filter(source=None, page_number=None, page_from=None, page_to=None):
+    """
+    Build a $vectorSearch-style filter from the common CLI options
+    """
+    clauses = {}
+    if source:
+        clauses["source"] = source if isinstance(source, str) else {"$in": list(source)}
+    if page_number is not None:
+        clauses["page_number"] = page_number
+    elif page_from is not None or page_to is not None:
+        page_range = {}
+        if page_from is not None:
+            page_range["$gte"] = page_from
+        if page_to is not None:
+            page_range["$lte"] = page_to
+        clauses["page_number"] = page_range
+    return clauses or None
+
+
+def search_local(index, query_embedding, limit=5, min_score=0.65, source=None, page_number=None):
+    """
+    Library entry point mirroring search_text_chunks, given a query vector
+    """
+    return index.search(
+        query_embedding,
+        limit=limit,
+        min_score=min_score,
+        filter=build_filter(source=source, page_number=page_number),
+    )
+
+
+def main():
+    from dotenv import load_dotenv
+
+    from raglib.embedding_engine import DEFAULT_MODEL, EmbeddingEngine
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Local exact vector search over embedding artifacts.")
+    parser.add_argument("query", nargs="+", help="Query text (several queries allowed)")
+    parser.add_argument(
+        "--artifact",
+        action="append",
+        required=True,
+        help="Embedding artifact path (repeat to search several)",
+    )
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--min-score", type=float, default=0.65)
+    parser.add_argument("--source", action="append", help="Only search these sources")
+    parser.add_argument("--page", type=int, default=None, help="Only search this page number")
+    parser.add_argument("--page-from", type=int, default=None)
+    parser.add_argument("--page-to", type=int, default=None)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--base-url", default=None)
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    index = LocalVectorIndex.from_paths(args.artifact)
+    print(f"📚 Loaded {len(index)} chunks in {(time.perf_counter() - start_time) * 1000:.1f} ms")
+
+    engine = EmbeddingEngine(model=args.model, api_key=os.getenv("OPENAI_API_KEY"), base_url=args.base_url)
+    query_embeddings = engine.embed(args.query)
+    search_filter = build_filter(
+        source=args.source[0] if args.source and len(args.source) == 1 else args.source,
+        page_number=args.page,
+        page_from=args.page_from,
+        page_to=args.page_to,
+    )
+
+    for query, query_embedding in zip(args.query, query_embeddings):
+        start_time = time.perf_counter()
+        results = index.search(
+            query_embedding, limit=args.limit, min_score=args.min_score, filter=search_filter
+        )
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+
+        print(f"\n🔍 \"{query}\" - {len(results)} results in {elapsed_ms:.2f} ms")
+        for j, result in enumerate(results, 1):
+            excerpt = result["text"][:150].replace("\n", " ")
+            print(
+                f"{j}. {result.get('source')} Page {result.get('page_number')} "
+                f"(Relevance: {result['score'] * 100:.1f}%)\n   \"{excerpt}\""
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Page-level PDF text extraction shared by the extract stages
+Page ranges can be extracted in parallel worker processes while still being
+yielded in page order
+"""
+
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from pypdf import PdfReader
+
+# Pages handed to a worker at a time
+PAGES_PER_TASK = 16
+
+
+def clean_page_text(page_text):
+    """
+    Normalize whitespace and fix common extraction artifacts
+    """
+    page_text = page_text.strip()
+    # Replace multiple spaces and newlines with single ones
+    page_text = re.sub(r'\s+', ' ', page_text)
+    # Fix common OCR issues
+    page_text = re.sub(r'- ', '', page_text)
+    return page_text
+
+
+def count_pages(pdf_path):
+    return len(PdfReader(pdf_path).pages)
+
+
+def extract_page_range(task):
+    """
+    Worker: open the PDF and extract pages [start, end)
+    Each process opens its own reader, since PdfReader can't be shared
+    """
+    pdf_path, start, end = task
+    reader = PdfReader(pdf_path)
+    return [
+        (i + 1, clean_page_text(reader.pages[i].extract_text()))
+        for i in range(start, end)
+    ]
+
+
+def iter_pages(pdf_path, num_pages=None, workers=1, pages_per_task=PAGES_PER_TASK):
+    """
+    Yield (page_number, text) in page order
+    With more than one worker, page ranges are extracted in parallel and
+    yielded as soon as every earlier range is done
+    """
+    if num_pages is None:
+        num_pages = count_pages(pdf_path)
+    tasks = [
+        (pdf_path, start, min(start + pages_per_task, num_pages))
+        for start in range(0, num_pages, pages_per_task)
+    ]
+
+    if workers <= 1:
+        for task in tasks:
+            yield from extract_page_range(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() returns results in submission order, which keeps pages ordered
+        for pages in executor.map(extract_page_range, tasks):
+            yield from pages
@@ -0,0 +1,328 @@
+"""
+Small DAG runner for the extract -> chunk -> embed -> ingest -> evaluate stages
+Every stage declares its input and output files. A stage is skipped when the
+fingerprint of its inputs, parameters and code matches the last successful run
+and its outputs are unchanged on disk. Independent stages (e.g. the Big Book
+and the 12&12) run in parallel threads
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEFAULT_STATE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "pipeline_state.json",
+)
+
+RAN = "ran"
+SKIPPED = "skipped"
+FAILED = "failed"
+BLOCKED = "blocked"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def files_fingerprint(paths):
+    """
+    Path -> sha256 for every existing file, None for missing ones
+    """
+    return {
+        path: file_sha256(path) if os.path.exists(path) else None
+        for path in sorted(paths)
+    }
+
+
+class Stage:
+    """
+    One node of the pipeline
+    run() returns a dict of stats ('items', 'cache_hits', 'cache_misses' are
+    reported) and raises on failure. Stages without outputs (ingest,
+    evaluate) are skipped purely on their inputs fingerprint
+    """
+
+    def __init__(self, name, run, inputs=(), outputs=(), deps=(), params=None, code=()):
+        self.name = name
+        self.run = run
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.deps = list(deps)
+        self.params = params or {}
+        self.code = list(code)
+
+    def fingerprint(self):
+        payload = {
+            "inputs": files_fingerprint(self.inputs),
+            "code": files_fingerprint(self.code),
+            "params": self.params,
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def __repr__(self):
+        return f"Stage({self.name!r})"
+
+
+class StageResult:
+    def __init__(self, name, status, seconds=0.0, stats=None, error=None):
+        self.name = name
+        self.status = status
+        self.seconds = seconds
+        self.stats = stats or {}
+        self.error = error
+
+    @property
+    def throughput(self):
+        items = self.stats.get("items")
+        if not items or self.seconds <= 0:
+            return None
+        return items / self.seconds
+
+
+class Pipeline:
+    """
+    A set of stages plus the state file recording their last successful runs
+    """
+
+    def __init__(self, stages, state_path=DEFAULT_STATE_PATH):
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage name: {stage.name}")
+            self.stages[stage.name] = stage
+        for stage in stages:
+            for dep in stage.deps:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage {stage.name} depends on unknown stage {dep}")
+        self.state_path = state_path
+        self.state = self._load_state()
+        self._state_lock = threading.Lock()
+        self._check_acyclic()
+
+    def _load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("stages", {})
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"stages": self.state}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.state_path)
+
+    def _check_acyclic(self):
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline has a cycle through {name}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def select(self, targets=None):
+        """
+        Names of the stages needed for targets (stage names or name prefixes)
+        plus everything upstream of them
+        """
+        if not targets:
+            return set(self.stages)
+
+        selected = set()
+        pending = []
+        for target in targets:
+            matches = [
+                name for name in self.stages
+                if name == target or name.startswith(target + ".")
+            ]
+            if not matches:
+                raise ValueError(f"No stage matches {target!r}")
+            pending.extend(matches)
+        while pending:
+            name = pending.pop()
+            if name not in selected:
+                selected.add(name)
+                pending.extend(self.stages[name].deps)
+        return selected
+
+    def is_current(self, stage, fingerprint=None):
+        """
+        True if the stage's last successful run matches its current
+        fingerprint and its outputs are still what that run wrote
+        """
+        previous = self.state.get(stage.name)
+        if not previous:
+            return False
+        if previous.get("fingerprint") != (fingerprint or stage.fingerprint()):
+            return False
+        return previous.get("outputs") == files_fingerprint(stage.outputs)
+
+    def _record(self, stage, fingerprint, result):
+        with self._state_lock:
+            self.state[stage.name] = {
+                "fingerprint": fingerprint,
+                "outputs": files_fingerprint(stage.outputs),
+                "finished_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "seconds": round(result.seconds, 3),
+                "stats": result.stats,
+            }
+            self._save_state()
+
+    def _execute(self, stage, force):
+        # Fingerprinting happens here rather than when scheduling, so a stage
+        # sees the outputs its dependencies just wrote
+        fingerprint = stage.fingerprint()
+        if not force and self.is_current(stage, fingerprint):
+            return StageResult(stage.name, SKIPPED)
+
+        missing = [path for path in stage.inputs if not os.path.exists(path)]
+        if missing:
+            return StageResult(stage.name, FAILED, error=f"missing input {missing[0]}")
+
+        start_time = time.time()
+        try:
+            stats = stage.run() or {}
+        except Exception as e:
+            return StageResult(stage.name, FAILED, time.time() - start_time, error=str(e))
+
+        result = StageResult(stage.name, RAN, time.time() - start_time, stats)
+        self._record(stage, fingerprint, result)
+        return result
+
+    def plan(self, targets=None, force=()):
+        """
+        (name, will_run) in dependency order, assuming upstream stages that
+        run leave their outputs unchanged
+        """
+        order = []
+        for name in self._topological(self.select(targets)):
+            stage = self.stages[name]
+            forced = self._is_forced(name, force)
+            order.append((name, forced or not self.is_current(stage)))
+        return order
+
+    def _topological(self, names):
+        order, done = [], set()
+
+        def visit(name):
+            if name in done:
+                return
+            for dep in self.stages[name].deps:
+                if dep in names:
+                    visit(dep)
+            done.add(name)
+            order.append(name)
+
+        for name in sorted(names):
+            visit(name)
+        return order
+
+    @staticmethod
+    def _is_forced(name, force):
+        if force is True:
+            return True
+        return any(name == f or name.startswith(f + ".") for f in force)
+
+    def run(self, targets=None, force=(), workers=4, on_result=None):
+        """
+        Run the selected stages, each as soon as its dependencies are done
+        force is True (every stage) or a list of stage names/prefixes
+        Returns StageResults in completion order
+        """
+        selected = self.select(targets)
+        remaining = {name: set(self.stages[name].deps) & selected for name in selected}
+        results = []
+
+        def finish(result):
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            running = {}
+            while remaining or running:
+                for name in sorted(remaining):
+                    if remaining[name]:
+                        continue
+                    del remaining[name]
+                    stage = self.stages[name]
+                    running[executor.submit(self._execute, stage, self._is_forced(name, force))] = name
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    result = future.result()
+                    finish(result)
+
+                    if result.status in (RAN, SKIPPED):
+                        for deps in remaining.values():
+                            deps.discard(name)
+                    else:
+                        for blocked in self._downstream(name, remaining):
+                            del remaining[blocked]
+                            finish(StageResult(blocked, BLOCKED, error=f"{name} failed"))
+
+        return results
+
+    def _downstream(self, name, remaining):
+        blocked, pending = [], [name]
+        while pending:
+            current = pending.pop()
+            for other in sorted(remaining):
+                if other not in blocked and current in self.stages[other].deps:
+                    blocked.append(other)
+                    pending.append(other)
+        return blocked
+
+
+def format_report(results):
+    """
+    Per-stage wall time, throughput and cache-hit table
+    """
+    lines = [
+        f"{'stage':<22} {'status':<8} {'wall':>8} {'items':>7} {'items/s':>9} {'cache hits':>12}",
+        "-" * 71,
+    ]
+    for result in results:
+        stats = result.stats
+        items = stats.get("items")
+        throughput = result.throughput
+        cache = ""
+        if "cache_hits" in stats:
+            looked_up = stats["cache_hits"] + stats.get("cache_misses", 0)
+            cache = f"{stats['cache_hits']}/{looked_up}"
+        lines.append(
+            f"{result.name:<22} {result.status:<8} "
+            f"{(f'{result.seconds:.2f}s' if result.status == RAN else '-'):>8} "
+            f"{(items if items is not None else '-')!s:>7} "
+            f"{(f'{throughput:.1f}' if throughput else '-'):>9} "
+            f"{cache:>12}"
+        )
+        if result.error:
+            lines.append(f"    {result.error}")
+    return "\n".join(lines)
@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+"""
+Smaller local-search vectors: Matryoshka truncation plus int8 / binary
+quantization, and a recall comparison against full-precision search
+  - truncation keeps the first d dimensions of text-embedding-3 vectors,
+    renormalized (artifacts.truncate_embeddings)
+  - int8 stores each unit vector as int8 codes and one float32 scale
+    (d + 4 bytes instead of 4d)
+  - binary stores the sign bits (d / 8 bytes); the nearest
+    oversample x limit chunks by Hamming distance are rescored with their
+    int8 codes, which stay memory-mapped so only those rows are read
+A QuantizedIndex is self-contained (chunk metadata included) and returns
+results in the same shape and score scale as LocalVectorIndex
+
+Usage:
+  python -m raglib.quantization recall --artifact aa_chunks_with_openai_embeddings \
+      --artifact 12-12/12_12_chunks_with_embeddings --dimensions 1536 512 256 --kinds float32 int8 binary
+  python -m raglib.quantization build --artifact aa_chunks_with_openai_embeddings \
+      --artifact 12-12/12_12_chunks_with_embeddings --kind int8 --dimensions 512 --output int8_index
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from raglib.artifacts import truncate_embeddings
+from raglib.local_search import RESULT_FIELDS, ChunkColumns, LocalVectorIndex, cosine_to_score, filter_mask
+
+FORMAT_VERSION = "raglib-quantized/1"
+KINDS = ("float32", "int8", "binary")
+DEFAULT_OVERSAMPLE = 4
+# Rows converted to float32 at a time when scoring int8 codes
+SCORE_BLOCK_ROWS = 4096
+
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint16)
+
+
+def quantize_int8(matrix):
+    """
+    Symmetric per-row int8 codes and scales for unit vectors
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def quantize_binary(matrix):
+    """
+    Sign bits packed 8 per byte
+    """
+    return np.packbits(np.asarray(matrix) > 0, axis=-1)
+
+
+def hamming_distances(codes, query_bits):
+    return _POPCOUNT[np.bitwise_xor(codes, query_bits)].sum(axis=1, dtype=np.int32)
+
+
+class QuantizedIndex:
+    """
+    Exact scan over float32, int8 or binary vectors
+    """
+
+    def __init__(self, chunks, kind, vectors, scales=None, int8_codes=None, truncated_from=None, model=None):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown vector kind {kind!r}; expected one of {KINDS}")
+        self.chunks = chunks
+        self.kind = kind
+        self.vectors = vectors
+        self.scales = scales
+        # binary: int8 codes used to rescore the Hamming candidates
+        self.int8_codes = int8_codes
+        self.truncated_from = truncated_from
+        self.model = model
+        self.column = ChunkColumns(chunks)
+        if kind == "binary":
+            self.dimensions = int(int8_codes.shape[1])
+        else:
+            self.dimensions = int(vectors.shape[1])
+
+    def __len__(self):
+        return len(self.chunks)
+
+    @classmethod
+    def build(cls, artifacts, kind="int8", dimensions=None):
+        """
+        Index the chunks of embedding artifacts, truncated to dimensions
+        first if given
+        """
+        base = LocalVectorIndex(artifacts)
+        matrix = np.concatenate([np.asarray(artifact.embeddings, dtype=np.float32) for artifact in artifacts])
+        full_dimensions = next((a.truncated_from for a in artifacts if a.truncated_from), base.dimensions)
+        dimensions = dimensions or base.dimensions
+        # Truncating to the current size just normalizes the rows
+        matrix = truncate_embeddings(matrix, dimensions)
+        truncated_from = full_dimensions if dimensions < full_dimensions else None
+        model = artifacts[0].model if artifacts else None
+
+        if kind == "float32":
+            return cls(base.chunks, kind, matrix, truncated_from=truncated_from, model=model)
+        codes, scales = quantize_int8(matrix)
+        if kind == "int8":
+            return cls(base.chunks, kind, codes, scales=scales, truncated_from=truncated_from, model=model)
+        return cls(
+            base.chunks,
+            kind,
+            quantize_binary(matrix),
+            scales=scales,
+            int8_codes=codes,
+            truncated_from=truncated_from,
+            model=model,
+        )
+
+    @property
+    def bytes_per_vector(self):
+        if self.kind == "float32":
+            return 4 * self.dimensions
+        if self.kind == "int8":
+            return self.dimensions + 4
+        return (self.dimensions + 7) // 8
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        suffix = {"float32": "f32", "int8": "i8", "binary": "b1"}[self.kind]
+        np.save(os.path.join(directory, f"vectors.{suffix}.npy"), self.vectors)
+        if self.scales is not None:
+            np.save(os.path.join(directory, "scales.f32.npy"), self.scales)
+        if self.int8_codes is not None:
+            np.save(os.path.join(directory, "rescore.i8.npy"), self.int8_codes)
+        with open(os.path.join(directory, "quantized.meta.json"), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "format": FORMAT_VERSION,
+                    "kind": self.kind,
+                    "model": self.model,
+                    "count": len(self.chunks),
+                    "dimensions": self.dimensions,
+                    "truncated_from": self.truncated_from,
+                    "chunks": self.chunks,
+                },
+                f,
+                ensure_ascii=False,
+            )
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Load a saved index; the vector arrays are mmap'd
+        """
+        with open(os.path.join(directory, "quantized.meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format in {directory}: {meta.get('format')}")
+
+        def load_array(name):
+            path = os.path.join(directory, name)
+            return np.load(path, mmap_mode="r") if os.path.exists(path) else None
+
+        kind = meta["kind"]
+        suffix = {"float32": "f32", "int8": "i8", "binary": "b1"}[kind]
+        scales = load_array("scales.f32.npy")
+        return cls(
+            meta["chunks"],
+            kind,
+            load_array(f"vectors.{suffix}.npy"),
+            scales=None if scales is None else np.asarray(scales),
+            int8_codes=load_array("rescore.i8.npy"),
+            truncated_from=meta.get("truncated_from"),
+            model=meta.get("model"),
+        )
+
+    def fit_query(self, query_embedding):
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if query.shape[-1] != self.dimensions:
+            if not self.truncated_from or query.shape[-1] < self.dimensions:
+                raise ValueError(f"Query has {query.shape[-1]} dims, index has {self.dimensions}")
+        return truncate_embeddings(query, self.dimensions)
+
+    def _int8_cosines(self, codes, scales, rows, query):
+        """
+        Approximate cosines for rows (None: every row), a block at a time
+        """
+        count = len(codes) if rows is None else len(rows)
+        cosines = np.empty(count, dtype=np.float32)
+        for start in range(0, count, SCORE_BLOCK_ROWS):
+            block = slice(start, start + SCORE_BLOCK_ROWS) if rows is None else rows[start:start + SCORE_BLOCK_ROWS]
+            cosines[start:start + SCORE_BLOCK_ROWS] = (codes[block].astype(np.float32) @ query) * scales[block]
+        return cosines
+
+    def search(
+        self,
+        query_embedding,
+        limit=5,
+        min_score=None,
+        filter=None,
+        fields=RESULT_FIELDS,
+        oversample=DEFAULT_OVERSAMPLE,
+    ):
+        """
+        Top-k chunks for a query vector, best first
+        filter uses $vectorSearch filter syntax, like LocalVectorIndex
+        """
+        if limit <= 0:
+            return []
+        query = self.fit_query(query_embedding)
+        # Unfiltered scans read the arrays directly instead of copying rows
+        rows = np.flatnonzero(filter_mask(self.column, len(self), filter)) if filter else None
+
+        if self.kind == "binary":
+            codes = self.vectors if rows is None else self.vectors[rows]
+            distances = hamming_distances(codes, quantize_binary(query))
+            if rows is None:
+                rows = np.arange(len(self))
+            keep = min(len(rows), limit * oversample)
+            if keep < len(rows):
+                rows = rows[np.argpartition(distances, keep - 1)[:keep]]
+            cosines = self._int8_cosines(self.int8_codes, self.scales, rows, query)
+        elif self.kind == "int8":
+            cosines = self._int8_cosines(self.vectors, self.scales, rows, query)
+        else:
+            cosines = np.asarray(self.vectors if rows is None else self.vectors[rows]) @ query
+        if rows is None:
+            rows = np.arange(len(self))
+
+        scores = cosine_to_score(cosines)
+        if min_score is not None:
+            rows, scores = rows[scores >= min_score], scores[scores >= min_score]
+        if len(rows) == 0:
+            return []
+        order = np.argsort(-scores, kind="stable")[:limit]
+
+        results = []
+        for i in order:
+            chunk = self.chunks[rows[i]]
+            result = {field: chunk[field] for field in fields if field in chunk}
+            result["score"] = float(scores[i])
+            results.append(result)
+        return results
+
+
+def recall_report(artifacts, dimensions_values, kinds=KINDS, ks=(1, 5, 10), queries=200, seed=0):
+    """
+    Recall@k of every (dimensions, kind) index against exact full-precision
+    search, with latency and vector size
+    Queries are chunk vectors sampled from the corpus with a little noise
+    added, as in ann_index.recall_report
+    """
+    base = LocalVectorIndex(artifacts)
+    rng = np.random.default_rng(seed)
+    matrix = np.concatenate([np.asarray(artifact.embeddings, dtype=np.float32) for artifact in artifacts])
+    sample = rng.choice(matrix.shape[0], min(queries, matrix.shape[0]), replace=False)
+    query_vectors = truncate_embeddings(matrix[sample], matrix.shape[1])
+    query_vectors = truncate_embeddings(
+        query_vectors + rng.normal(0, 0.02, query_vectors.shape).astype(np.float32), matrix.shape[1]
+    )
+    max_k = max(ks)
+
+    def ids_of(results):
+        return [(result.get("source"), result.get("chunk_id")) for result in results]
+
+    start = time.perf_counter()
+    exact = [ids_of(base.search(q, limit=max_k)) for q in query_vectors]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(query_vectors)
+
+    report = {
+        "chunks": len(base),
+        "dimensions": base.dimensions,
+        "queries": len(query_vectors),
+        "exact_ms": exact_ms,
+        "exact_bytes_per_vector": 4 * base.dimensions,
+        "runs": [],
+    }
+    for dimensions in dimensions_values:
+        for kind in kinds:
+            index = QuantizedIndex.build(artifacts, kind=kind, dimensions=dimensions)
+            start = time.perf_counter()
+            approximate = [ids_of(index.search(q, limit=max_k)) for q in query_vectors]
+            elapsed_ms = (time.perf_counter() - start) * 1000 / len(query_vectors)
+            recalls = {}
+            for k in ks:
+                hits = sum(
+                    len(set(a[:k]) & set(e[:k])) / max(1, len(e[:k]))
+                    for a, e in zip(approximate, exact)
+                )
+                recalls[f"recall@{k}"] = hits / len(query_vectors)
+            report["runs"].append({
+                "dimensions": index.dimensions,
+                "kind": kind,
+                "bytes_per_vector": index.bytes_per_vector,
+                "index_mb": index.bytes_per_vector * len(index) / 1e6,
+                "ms": elapsed_ms,
+                **recalls,
+            })
+    return report
+
+
+def main():
+    from raglib.artifacts import load_embedded_chunks
+
+    parser = argparse.ArgumentParser(description="Truncated / quantized vectors for local search.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Build a quantized index from embedding artifacts")
+    build.add_argument("--artifact", action="append", required=True)
+    build.add_argument("--output", required=True, help="Index directory")
+    build.add_argument("--kind", choices=KINDS, default="int8")
+    build.add_argument("--dimensions", type=int, default=None, help="Truncate vectors to this many dimensions")
+
+    recall = subparsers.add_parser("recall", help="Recall@k report against full-precision search")
+    recall.add_argument("--artifact", action="append", required=True)
+    recall.add_argument("--dimensions", type=int, nargs="+", default=None, help="Dimensions to compare")
+    recall.add_argument("--kinds", nargs="+", choices=KINDS, default=list(KINDS))
+    recall.add_argument("--queries", type=int, default=200)
+    recall.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    args = parser.parse_args()
+    artifacts = [load_embedded_chunks(path) for path in args.artifact]
+
+    if args.command == "build":
+        start = time.perf_counter()
+        index = QuantizedIndex.build(artifacts, kind=args.kind, dimensions=args.dimensions)
+        index.save(args.output)
+        print(
+            f"✅ Indexed {len(index)} chunks as {index.dimensions}-dim {index.kind} "
+            f"({index.bytes_per_vector} bytes/vector) in {time.perf_counter() - start:.2f}s -> {args.output}"
+        )
+        return
+
+    dimensions_values = args.dimensions or [artifacts[0].embeddings.shape[1]]
+    report = recall_report(artifacts, dimensions_values, kinds=args.kinds, queries=args.queries)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(
+        f"📊 {report['chunks']} chunks x {report['dimensions']} dims, {report['queries']} queries, "
+        f"exact float32 search {report['exact_ms']:.3f} ms/query ({report['exact_bytes_per_vector']} bytes/vector)"
+    )
+    for run in report["runs"]:
+        recalls = ", ".join(
+            f"{key} {value:.3f}" for key, value in run.items() if key.startswith("recall@")
+        )
+        print(
+            f"   {run['dimensions']:>5} dims {run['kind']:<7}: {run['bytes_per_vector']:>5} bytes/vector "
+            f"({run['index_mb']:.2f} MB), {run['ms']:.3f} ms/query, {recalls}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Query-embedding cache for the RAG search path
+In-memory LRU with a size bound and TTL, keyed on (model, normalized query),
+optionally backed by SQLite so cached embeddings survive restarts
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from raglib.embedding_cache import normalize_text, text_hash
+
+DEFAULT_MAX_SIZE = 2048
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_QUERY_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "query_cache.sqlite",
+)
+
+
+def normalize_query(query):
+    """
+    Queries differing only in case or whitespace share a cache entry
+    """
+    return normalize_text(query).casefold()
+
+
+class QueryEmbeddingCache:
+    """
+    Thread-safe LRU + TTL cache of query embeddings with hit-rate counters
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, ttl=DEFAULT_TTL_SECONDS, persist_path=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.persist_path = persist_path
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if persist_path:
+            self._conn = sqlite3.connect(persist_path, check_same_thread=False)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS query_embeddings (
+                    model TEXT NOT NULL,
+                    query_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (model, query_hash)
+                ) WITHOUT ROWID
+                """
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def key(model, query):
+        return model, text_hash(normalize_query(query))
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "hit_rate": self.hit_rate,
+        }
+
+    def _load_persisted(self, key, now):
+        if self._conn is None:
+            return None
+        row = self._conn.execute(
+            "SELECT vector, created_at FROM query_embeddings WHERE model = ? AND query_hash = ?",
+            key,
+        ).fetchone()
+        if row is None:
+            return None
+        blob, created_at = row
+        if self.ttl and now - created_at > self.ttl:
+            return None
+        values = array("f")
+        values.frombytes(blob)
+        return values.tolist(), created_at
+
+    def _store(self, key, vector, created_at):
+        self._entries[key] = (vector, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, model, query):
+        key = self.key(model, query)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and now - entry[1] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                entry = self._load_persisted(key, now)
+                if entry is not None:
+                    self._store(key, *entry)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, model, query, vector):
+        key = self.key(model, query)
+        now = time.time()
+        vector = list(vector)
+        with self._lock:
+            self._store(key, vector, now)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (model, query_hash, vector, created_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (*key, array("f", vector).tobytes(), now),
+                )
+                self._conn.commit()
+
+    def get_or_embed(self, model, query, embed):
+        """
+        Cached embedding for query, calling embed(query) on a miss
+        """
+        vector = self.get(model, query)
+        if vector is None:
+            vector = embed(query)
+            self.put(model, query, vector)
+        return vector
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,205 @@
+"""
+Optional reranking stage for retrieved chunks
+A cross-encoder (sentence-transformers CrossEncoder, on CPU by default)
+rescores the candidates of a vector or hybrid search, so fewer, better
+chunks go into the LLM prompt. Candidates are scored in batches, best
+retrieval score first, until the time budget runs out; any left unscored
+keep their retrieval order behind the reranked ones. Scores are cached per
+(model, query, chunk text), so repeated questions and overlapping candidate
+sets are only scored once
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from raglib.embedding_cache import text_hash
+from raglib.query_cache import normalize_query
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+DEFAULT_BATCH_SIZE = 16
+DEFAULT_TIME_BUDGET = 0.25
+DEFAULT_MAX_LENGTH = 512
+DEFAULT_CACHE_SIZE = 20000
+
+# Candidates fetched per result the caller wants when reranking
+RERANK_CANDIDATES_PER_RESULT = 4
+
+
+def rerank_candidates(limit):
+    """
+    How many retrieval results to fetch for a reranked top-limit
+    """
+    return limit * RERANK_CANDIDATES_PER_RESULT
+
+
+class RerankScoreCache:
+    """
+    Thread-safe LRU of reranker scores keyed on (model, query, chunk text)
+    """
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model, query, text):
+        return model, text_hash(normalize_query(query)), text_hash(text)
+
+    def get(self, model, query, text):
+        key = self.key(model, query, text)
+        with self._lock:
+            score = self._entries.get(key)
+            if score is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return score
+
+    def put(self, model, query, text, score):
+        key = self.key(model, query, text)
+        with self._lock:
+            self._entries[key] = score
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+class Reranker:
+    """
+    Cross-encoder reranker with batching, a time budget and a score cache
+    score_pairs(pairs) -> scores can replace the cross-encoder (any model
+    that scores (query, text) pairs); the CrossEncoder is loaded on first use
+    """
+
+    def __init__(
+        self,
+        model=DEFAULT_RERANK_MODEL,
+        batch_size=DEFAULT_BATCH_SIZE,
+        time_budget=DEFAULT_TIME_BUDGET,
+        device="cpu",
+        max_length=DEFAULT_MAX_LENGTH,
+        min_score=None,
+        cache=None,
+        score_pairs=None,
+    ):
+        self.model = model
+        self.batch_size = batch_size
+        self.time_budget = time_budget
+        self.device = device
+        self.max_length = max_length
+        self.min_score = min_score
+        self.cache = cache if cache is not None else RerankScoreCache()
+        self._score_pairs = score_pairs
+        self._cross_encoder = None
+        # One model call at a time; torch already uses every core per call
+        self._model_lock = threading.Lock()
+        self.stats = {"queries": 0, "scored": 0, "cached": 0, "over_budget": 0}
+
+    def _load(self):
+        if self._score_pairs is not None:
+            return self._score_pairs
+        if self._cross_encoder is None:
+            from sentence_transformers import CrossEncoder
+
+            self._cross_encoder = CrossEncoder(self.model, device=self.device, max_length=self.max_length)
+        encoder = self._cross_encoder
+        return lambda pairs: encoder.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+
+    def rerank(self, query, results, limit=None, time_budget=None, min_score=None):
+        """
+        results (best first) reordered by cross-encoder score
+        Each scored result gets 'rerank_score'; min_score (default: the
+        reranker's) drops scored results below it. time_budget in seconds
+        overrides the reranker's (whose None means no limit); it is checked
+        before each batch, using the last batch's time as the estimate
+        """
+        score_pairs = self._load()
+        budget = self.time_budget if time_budget is None else time_budget
+        min_score = self.min_score if min_score is None else min_score
+        start = time.perf_counter()
+
+        candidates = [dict(result) for result in results]
+        scores = [None] * len(candidates)
+        pending = []
+        for i, candidate in enumerate(candidates):
+            scores[i] = self.cache.get(self.model, query, candidate["text"])
+            if scores[i] is None:
+                pending.append(i)
+            else:
+                self.stats["cached"] += 1
+
+        batch_seconds = 0.0
+        for offset in range(0, len(pending), self.batch_size):
+            elapsed = time.perf_counter() - start
+            if budget is not None and elapsed + batch_seconds > budget:
+                self.stats["over_budget"] += len(pending) - offset
+                break
+            batch = pending[offset:offset + self.batch_size]
+            batch_start = time.perf_counter()
+            with self._model_lock:
+                batch_scores = np.asarray(
+                    score_pairs([(query, candidates[i]["text"]) for i in batch]), dtype=np.float32
+                )
+            batch_seconds = time.perf_counter() - batch_start
+            for i, score in zip(batch, batch_scores):
+                scores[i] = float(score)
+                self.cache.put(self.model, query, candidates[i]["text"], scores[i])
+            self.stats["scored"] += len(batch)
+        self.stats["queries"] += 1
+
+        scored = [i for i in range(len(candidates)) if scores[i] is not None]
+        scored.sort(key=lambda i: scores[i], reverse=True)
+        if min_score is not None:
+            scored = [i for i in scored if scores[i] >= min_score]
+        unscored = [i for i in range(len(candidates)) if scores[i] is None]
+
+        reranked = []
+        for i in scored + unscored:
+            if scores[i] is not None:
+                candidates[i]["rerank_score"] = scores[i]
+            reranked.append(candidates[i])
+        return reranked[:limit] if limit is not None else reranked
+
+
+def add_rerank_arguments(parser):
+    """
+    Register the common --rerank/--rerank-budget-ms/--rerank-candidates flags
+    """
+    parser.add_argument(
+        "--rerank",
+        nargs="?",
+        const=DEFAULT_RERANK_MODEL,
+        default=None,
+        help=f"Rerank candidates with this cross-encoder (default {DEFAULT_RERANK_MODEL} if no value given)",
+    )
+    parser.add_argument(
+        "--rerank-budget-ms",
+        type=float,
+        default=DEFAULT_TIME_BUDGET * 1000,
+        help="Time budget for reranking one query; unscored candidates keep their retrieval order",
+    )
+    parser.add_argument(
+        "--rerank-candidates",
+        type=int,
+        default=None,
+        help=f"Candidates to rerank (default {RERANK_CANDIDATES_PER_RESULT}x the limit)",
+    )
+    parser.add_argument("--rerank-min-score", type=float, default=None, help="Drop reranked chunks below this score")
+    return parser
+
+
+def reranker_from_args(args):
+    if not args.rerank:
+        return None
+    return Reranker(
+        model=args.rerank,
+        time_budget=args.rerank_budget_ms / 1000,
+        min_score=args.rerank_min_score,
+    )
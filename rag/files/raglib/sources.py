@@ -0,0 +1,124 @@
+"""
+Registry of the corpora that go into the text_chunks collection
+Each source is declared once here: its PDF, the source label stored on every
+chunk, its chunk_id prefix, chunker settings and where its files live
+"""
+
+import os
+
+RAG_FILES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PDF_DIR = os.path.join(RAG_FILES_DIR, "..", "..", "public", "pdf")
+
+
+class CorpusSource:
+    """
+    One corpus and the paths of its stage outputs
+    Files default to <directory>/<file_prefix>_<kind>; the keyword overrides
+    exist for the Big Book, whose files predate this naming
+    A prechunked source keeps its checked-in chunks file as the starting
+    point, so only its embed and ingest stages run
+    """
+
+    def __init__(
+        self,
+        name,
+        label,
+        pdf,
+        chunk_id_prefix,
+        directory,
+        file_prefix,
+        chunk_size=512,
+        overlap=50,
+        prechunked=False,
+        text_file=None,
+        pages_file=None,
+        chunks_file=None,
+        embeddings_file=None,
+    ):
+        self.name = name
+        self.label = label
+        self.pdf_path = os.path.join(PDF_DIR, pdf)
+        self.chunk_id_prefix = chunk_id_prefix
+        self.directory = os.path.join(RAG_FILES_DIR, directory)
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.prechunked = prechunked
+        self.text_path = self._path(text_file or f"{file_prefix}_text.txt")
+        self.pages_path = self._path(pages_file or f"{file_prefix}_pages.json")
+        self.chunks_path = self._path(chunks_file or f"{file_prefix}_chunks_token_based.json")
+        # Artifact path without suffix (.meta.json + .f32.npy)
+        self.embeddings_path = self._path(embeddings_file or f"{file_prefix}_chunks_with_embeddings")
+
+    def _path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def __repr__(self):
+        return f"CorpusSource({self.name!r})"
+
+
+SOURCES = {}
+
+
+def register_source(source):
+    if source.name in SOURCES:
+        raise ValueError(f"Source {source.name} is already registered")
+    SOURCES[source.name] = source
+    return source
+
+
+def get_source(name):
+    try:
+        return SOURCES[name]
+    except KeyError:
+        raise KeyError(f"Unknown source {name!r}; known sources: {', '.join(SOURCES)}") from None
+
+
+def source_for_label(label):
+    for source in SOURCES.values():
+        if source.label == label:
+            return source
+    return None
+
+
+register_source(CorpusSource(
+    "bigbook",
+    "AA Big Book 4th Edition",
+    pdf="AA-Big-Book-4th-edition.pdf",
+    chunk_id_prefix=None,  # The checked-in chunks use integer ids
+    directory="",
+    file_prefix="aa",
+    prechunked=True,
+    text_file="aa_big_book_text.txt",
+    pages_file="aa_big_book_pages.json",
+    embeddings_file="aa_chunks_with_openai_embeddings",
+))
+
+register_source(CorpusSource(
+    "12-12",
+    "AA Twelve Steps and Twelve Traditions",
+    pdf="AA-12-Steps-12-Traditions.pdf",
+    chunk_id_prefix="12-12-",
+    directory="12-12",
+    file_prefix="12_12",
+))
+
+register_source(CorpusSource(
+    "study-guide",
+    "The Big Book Study Guide",
+    pdf="TheBigBookStudyGuide.pdf",
+    chunk_id_prefix="study-guide-",
+    directory="study-guide",
+    file_prefix="study_guide",
+))
+
+register_source(CorpusSource(
+    "promises",
+    "The AA Promises",
+    pdf="The_AA_Promises.pdf",
+    chunk_id_prefix="promises-",
+    directory="promises",
+    file_prefix="promises",
+    # A single page; smaller chunks keep the individual promises apart
+    chunk_size=128,
+    overlap=16,
+))
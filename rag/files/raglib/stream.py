@@ -0,0 +1,142 @@
+"""
+Generator-based streaming stages for the chunk -> embed -> ingest pipeline
+Each stage takes an iterable of records and yields records, so stages can
+be chained in one process (or exchange JSONL files between scripts) with
+peak memory bounded by a batch rather than by the whole book
+"""
+
+import json
+import os
+import queue
+import threading
+
+from raglib.embedding_cache import embed_with_cache
+from raglib.ingest import batched
+from raglib.pdf_text import iter_pages
+
+_DONE = object()
+
+
+def jsonl_path(path):
+    """
+    JSONL counterpart of a .json (or extensionless) path
+    """
+    if path.endswith(".jsonl"):
+        return path
+    if path.endswith(".json"):
+        return os.path.splitext(path)[0] + ".jsonl"
+    return path + ".jsonl"
+
+
+def read_jsonl(path):
+    """
+    Yield one record per non-empty line of a JSONL file
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def write_jsonl(path, records):
+    """
+    Write records as JSONL as they arrive; returns the number written
+    """
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write("\n")
+            count += 1
+    return count
+
+
+def tee_jsonl(path, records):
+    """
+    Pass records through unchanged while also writing them to a JSONL file
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write("\n")
+            yield record
+
+
+def prefetch(records, depth=2):
+    """
+    Run an upstream generator in a background thread, buffering up to
+    depth items, so it keeps producing while the consumer is busy
+    This is what lets e.g. embedding requests for the next batch overlap
+    with the MongoDB writes for the current one
+    """
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for record in records:
+                if stop.is_set():
+                    return
+                buffer.put(record)
+        except BaseException as e:
+            buffer.put(e)
+            return
+        buffer.put(_DONE)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # Unblock the producer if it's waiting on a full buffer
+        while thread.is_alive():
+            try:
+                buffer.get_nowait()
+            except queue.Empty:
+                thread.join(timeout=0.05)
+
+
+def extract_pages(pdf_path, source, workers=1):
+    """
+    Stage 1: page records from a PDF
+    """
+    for page_number, text in iter_pages(pdf_path, workers=workers):
+        yield {"page_number": page_number, "text": text, "source": source}
+
+
+def chunk_pages(pages, chunker, source, chunk_id_prefix):
+    """
+    Stage 2: token chunk records from page records
+    """
+    for chunk_id, (text, token_count, chunk_pages) in enumerate(chunker.iter_chunks(pages)):
+        yield {
+            "chunk_id": f"{chunk_id_prefix}{chunk_id:03d}",
+            "text": text,
+            "token_count": token_count,
+            "page_number": chunk_pages[0],
+            "page_range": f"{chunk_pages[0]}-{chunk_pages[-1]}",
+            "source": source,
+        }
+
+
+def embed_chunks(chunks, engine, cache=None, batch_size=None):
+    """
+    Stage 3: chunk records with an 'embedding' list, one batch at a time
+    A batch spans several API requests so the engine's concurrency is used
+    """
+    batch_size = batch_size or engine.batch_size * engine.concurrency
+    for batch in batched(chunks, batch_size):
+        embeddings = embed_with_cache(engine, cache, [chunk["text"] for chunk in batch])
+        for chunk, embedding in zip(batch, embeddings):
+            chunk["embedding"] = list(embedding)
+            chunk["embedding_model"] = engine.model
+            chunk["dimensions"] = len(embedding)
+            yield chunk
@@ -0,0 +1,100 @@
+"""
+Atlas $vectorSearch pipeline builder shared by the sync, async and
+benchmark search paths
+source/page_number filters run inside $vectorSearch (they are filter
+fields of text_vector_index, see 3_vector_search_index_modified.json), so
+Atlas only ranks matching chunks. numCandidates is sized from the requested
+limit, and only the needed fields are projected, with optional text
+truncation. Results already come back best first, so no $sort is added
+"""
+
+import numpy as np
+
+from raglib.local_search import RESULT_FIELDS, build_filter
+
+INDEX_NAME = "text_vector_index"
+EMBEDDING_PATH = "embedding"
+
+# Atlas suggests 10-20x the limit; numCandidates can't exceed 10000
+NUM_CANDIDATES_PER_RESULT = 20
+MIN_NUM_CANDIDATES = 50
+MAX_NUM_CANDIDATES = 10000
+
+
+def num_candidates_for(limit, per_result=NUM_CANDIDATES_PER_RESULT):
+    """
+    numCandidates for a top-limit search: enough for good recall
+    without scoring the whole corpus
+    """
+    return max(limit, min(MAX_NUM_CANDIDATES, max(MIN_NUM_CANDIDATES, limit * per_result)))
+
+
+def projection(fields=RESULT_FIELDS, text_chars=None):
+    """
+    $project for the result fields plus the search score
+    text_chars truncates 'text' on the server
+    """
+    stage = {"_id": 0}
+    for field in fields:
+        stage[field] = 1
+    if text_chars and "text" in fields:
+        stage["text"] = {"$substrCP": ["$text", 0, int(text_chars)]}
+    stage["score"] = {"$meta": "vectorSearchScore"}
+    return stage
+
+
+def vector_search_pipeline(
+    query_embedding,
+    limit=5,
+    min_score=None,
+    filter=None,
+    num_candidates=None,
+    fields=RESULT_FIELDS,
+    text_chars=None,
+    index=INDEX_NAME,
+):
+    """
+    Aggregation pipeline for a top-limit vector search
+    filter uses $vectorSearch filter syntax (see local_search.build_filter)
+    """
+    search = {
+        "index": index,
+        "path": EMBEDDING_PATH,
+        "queryVector": np.asarray(query_embedding, dtype=np.float64).tolist(),
+        "numCandidates": max(limit, num_candidates or num_candidates_for(limit)),
+        "limit": limit,
+    }
+    if filter:
+        search["filter"] = filter
+
+    pipeline = [
+        {"$vectorSearch": search},
+        {"$project": projection(fields, text_chars=text_chars)},
+    ]
+    if min_score:
+        pipeline.append({"$match": {"score": {"$gte": min_score}}})
+    return pipeline
+
+
+def search_pipeline(
+    query_embedding,
+    limit=5,
+    min_score=0.65,
+    source=None,
+    page_number=None,
+    page_from=None,
+    page_to=None,
+    num_candidates=None,
+    text_chars=None,
+):
+    """
+    vector_search_pipeline from the common search options
+    """
+    return vector_search_pipeline(
+        query_embedding,
+        limit=limit,
+        min_score=min_score,
+        filter=build_filter(source=source, page_number=page_number, page_from=page_from, page_to=page_to),
+        num_candidates=num_candidates,
+        text_chars=text_chars,
+    )
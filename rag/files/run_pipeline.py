@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+"""
+Run the whole RAG build for every registered source (raglib/sources.py) as
+one DAG: extract -> chunk -> embed -> ingest, then evaluate
+Up-to-date stages are skipped using fingerprints of their inputs, parameters
+and code, and independent sources run in parallel
+Replaces 12-12/run_all.sh and the embedding/ingest steps of rag/setup.sh
+"""
+
+import os
+import sys
+import argparse
+import importlib.util
+from functools import lru_cache
+from openai import OpenAI
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+from raglib.artifacts import artifact_paths
+from raglib.corpus import CorpusBuilder
+from raglib.embedding_cache import add_cache_arguments
+from raglib.embedding_engine import EmbeddingEngine, add_engine_arguments
+from raglib.lexical import DEFAULT_LEXICAL_INDEX_DIR, INDEX_FILES, BM25Index
+from raglib.local_search import LocalVectorIndex
+from raglib.pipeline import DEFAULT_STATE_PATH, FAILED, BLOCKED, Pipeline, Stage, format_report
+from raglib.sources import SOURCES, get_source
+
+# Load environment variables from .env file
+load_dotenv()
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@lru_cache(maxsize=None)
+def load_script(relative_path):
+    """
+    Import one of the numbered scripts as a module
+    """
+    path = os.path.join(HERE, relative_path)
+    name = "stage_" + "".join(c if c.isalnum() else "_" for c in relative_path)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build the RAG data for all sources as one pipeline.")
+    parser.add_argument(
+        "targets",
+        nargs="*",
+        help="Stages to build, with their upstream stages (e.g. 12-12, bigbook.embed, evaluate); default all",
+    )
+    parser.add_argument(
+        "--sources",
+        nargs="+",
+        choices=list(SOURCES),
+        default=list(SOURCES),
+        help="Sources to include in the pipeline (default: all registered sources)",
+    )
+    parser.add_argument(
+        "--force",
+        nargs="*",
+        default=None,
+        help="Rerun these stages (or every selected stage if no names are given) even if up to date",
+    )
+    parser.add_argument("--workers", type=int, default=4, help="Stages run in parallel")
+    parser.add_argument(
+        "--extract-workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes for PDF extraction",
+    )
+    parser.add_argument("--prune", action="store_true", help="Delete chunks no longer produced when ingesting")
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="Leave near-duplicate chunks (raglib.dedup) out of the ingest; with --prune they are deleted too",
+    )
+    parser.add_argument(
+        "--dimensions",
+        type=int,
+        default=None,
+        help="Truncate embeddings to this many dimensions (text-embedding-3); the Atlas index must match",
+    )
+    parser.add_argument(
+        "--eval-backend",
+        choices=("atlas", "local"),
+        default="atlas",
+        help="Evaluate against Atlas (after ingest) or in-process over the embedding artifacts",
+    )
+    parser.add_argument("--lexical-index", default=DEFAULT_LEXICAL_INDEX_DIR, help="BM25 index directory")
+    parser.add_argument("--state", default=DEFAULT_STATE_PATH, help="Pipeline state file")
+    parser.add_argument("--dry-run", action="store_true", help="Show which stages would run and exit")
+    add_engine_arguments(parser)
+    add_cache_arguments(parser)
+    return parser.parse_args()
+
+
+def build_stages(args):
+    """
+    Stages for every selected source plus the evaluation over all of them
+    The sources share one embedding engine, cache file and MongoDB client
+    """
+    mongodb_uri = os.getenv("MONGODB_URI")
+    builder = CorpusBuilder(
+        EmbeddingEngine(
+            model=args.model,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            base_url=args.base_url,
+        ),
+        cache_path=None if args.no_cache else args.cache,
+        mongo_client=MongoClient(mongodb_uri) if mongodb_uri else None,
+        extract_workers=args.extract_workers,
+        prune=args.prune,
+        dedup=args.dedup,
+        dimensions=args.dimensions,
+    )
+    sources = [get_source(name) for name in args.sources]
+
+    stages = []
+    for source in sources:
+        stages.extend(builder.stages(source))
+
+    artifacts = [source.embeddings_path for source in sources]
+    artifact_files = [path for artifact in artifacts for path in artifact_paths(artifact)]
+
+    def build_lexical_index():
+        index = BM25Index.from_artifacts(artifacts)
+        index.save(args.lexical_index, artifact_paths=artifacts)
+        return {"items": len(index), "terms": len(index.terms)}
+
+    # BM25 index over every selected source, for hybrid search
+    stages.append(Stage(
+        "lexical",
+        build_lexical_index,
+        inputs=artifact_files,
+        outputs=[os.path.join(args.lexical_index, name) for name in INDEX_FILES],
+        deps=[f"{source.name}.embed" for source in sources],
+        code=[os.path.join(HERE, "raglib", "lexical.py")],
+    ))
+
+    def evaluate():
+        script = load_script("12-12/5_test_rag_search.py")
+        if args.dimensions:
+            script.EMBEDDING_DIMENSIONS = args.dimensions
+        local_index = None
+        if args.eval_backend == "local":
+            local_index = LocalVectorIndex.from_paths(artifacts)
+        if args.base_url:
+            script.openai = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=args.base_url)
+        failed = script.test_rag(local_index=local_index)
+        if failed:
+            # Raising keeps the stage FAILED, so it isn't recorded as up to date
+            raise RuntimeError(f"{failed} of {len(script.TEST_QUERIES)} evaluation queries failed")
+        cache_stats = script.query_cache.stats()
+        return {
+            "items": len(script.TEST_QUERIES),
+            "cache_hits": cache_stats["hits"],
+            "cache_misses": cache_stats["misses"],
+        }
+
+    final_stage = "ingest" if args.eval_backend == "atlas" else "embed"
+    stages.append(Stage(
+        "evaluate",
+        evaluate,
+        inputs=artifact_files,
+        deps=[f"{source.name}.{final_stage}" for source in sources],
+        params={"backend": args.eval_backend, "dimensions": args.dimensions},
+        code=[os.path.join(HERE, "12-12", "5_test_rag_search.py")],
+    ))
+    return stages
+
+
+def main():
+    args = parse_args()
+    pipeline = Pipeline(build_stages(args), state_path=args.state)
+    force = args.force
+    if force is None:
+        force = ()
+    elif not force:
+        force = True
+
+    if args.dry_run:
+        for name, will_run in pipeline.plan(args.targets, force=force):
+            print(f"{'run ' if will_run else 'skip'}  {name}")
+        return True
+
+    print("=" * 62)
+    print("🚀 Building the RAG pipeline")
+    print("=" * 62)
+
+    def log_result(result):
+        if result.status in (FAILED, BLOCKED):
+            print(f"❌ {result.name} {result.status}: {result.error}")
+        else:
+            print(f"✅ {result.name} {result.status}")
+
+    results = pipeline.run(args.targets, force=force, workers=args.workers, on_result=log_result)
+
+    print("\n" + format_report(results))
+    return all(result.status not in (FAILED, BLOCKED) for result in results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
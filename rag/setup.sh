@@ -32,16 +32,13 @@ if [ ! -f ../.env ]; then
 fi
 
 echo "Step 1: Installing Python dependencies..."
-pip install openai pymongo python-dotenv
+pip install openai pymongo python-dotenv numpy pypdf cryptography tiktoken
 
-echo "Step 2: Generating OpenAI embeddings for AA Big Book chunks..."
+echo "Step 2: Embedding and ingesting the AA Big Book chunks..."
 cd files
-python3 1_generate_openai_embeddings.py
+python3 run_pipeline.py bigbook
 
-echo "Step 3: Ingesting data into MongoDB..."
-python3 2_ingest_to_dailyreflections.py
-
-echo "Step 4: Integration setup complete!"
+echo "Step 3: Integration setup complete!"
 echo
 echo "Next steps:"
 echo "1. Create the vector search index in MongoDB Atlas using the configuration in:"
@@ -10,18 +10,29 @@ Usage:
   python scripts/bigbook/ingest_layout.py \
       --pdf-dir public/pdf \
       --output-json scripts/bigbook/output/bigbook_pages.json \
-      --images-dir public/bigbook/4th
+      --images-dir public/bigbook/4th \
+      --workers 8
+
+Pages are rendered and extracted in parallel worker processes (--workers,
+default: all cores); --workers 1 keeps everything in a single process.
+
+A manifest next to the output JSON (bigbook_pages.manifest.json) records each
+segment's PDF hash, the DPI, EXTRACTOR_VERSION and the printed pages it
+produced. Reruns only re-render segments whose inputs changed and patch their
+pages into the existing JSON; pass --force to rebuild everything.
 
 Requires PyMuPDF (fitz). Install with:
   pip install pymupdf
 """
 
 import argparse
+import hashlib
 import json
 import math
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import fitz  # PyMuPDF
 
@@ -49,6 +60,13 @@ SEGMENTS = [
     "en_bigbook_appendicevii_.pdf",
 ]
 
+# Pages handed to a worker process at a time
+PAGES_PER_TASK = 8
+
+# Bump whenever extract_page_data/render_page_to_png output changes so that
+# incremental runs re-extract every segment
+EXTRACTOR_VERSION = 1
+
 ROMAN_MAP = {
     "M": 1000,
     "CM": 900,
@@ -92,6 +110,29 @@ def parse_args():
         default=220,
         help="DPI for rasterized PNG output.",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes for rendering/extraction (1 = single process).",
+    )
+    parser.add_argument(
+        "--pages-per-task",
+        type=int,
+        default=PAGES_PER_TASK,
+        help="Pages rendered per worker task.",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=Path,
+        default=None,
+        help="Incremental build manifest (default: <output-json stem>.manifest.json).",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Ignore the manifest and rebuild every segment.",
+    )
     return parser.parse_args()
 
 
@@ -276,16 +317,13 @@ def render_page_to_png(page: fitz.Page, output_path: Path, dpi: int):
     pix.save(output_path.as_posix())
 
 
-def ingest_segments(
-    pdf_dir: Path,
-    images_dir: Path,
-    output_json: Path,
-    dpi: int,
-):
-    ensure_directory(images_dir)
-    ensure_directory(output_json.parent)
+def plan_segments(pdf_dir: Path) -> List[Tuple[str, Path, int, int]]:
+    """Return (segment, pdf_path, page_count, first_printed_page) for each segment.
 
-    pages_output: List[Dict] = []
+    Printed page numbers run continuously across segments, so they are fixed
+    up front from the page counts before any page is handed to a worker.
+    """
+    plan: List[Tuple[str, Path, int, int]] = []
     printed_page = 1
 
     for segment in SEGMENTS:
@@ -294,23 +332,229 @@ def ingest_segments(
             print(f"[WARN] PDF segment missing: {pdf_path}")
             continue
 
-        print(f"[INFO] Processing {pdf_path} starting at printed page {printed_page}")
-        doc = fitz.open(pdf_path)
+        with fitz.open(pdf_path) as doc:
+            page_count = doc.page_count
+        plan.append((segment, pdf_path, page_count, printed_page))
+        printed_page += page_count
+
+    return plan
 
-        for index, page in enumerate(doc):
+
+def process_page_range(task: Tuple[str, str, int, int, int, str, int]) -> List[Dict]:
+    """Render and extract pages [start, end) of one segment.
+
+    Runs in a worker process; each call opens its own fitz document.
+    """
+    segment, pdf_path, start, end, first_printed_page, images_dir, dpi = task
+    payloads: List[Dict] = []
+
+    with fitz.open(pdf_path) as doc:
+        for index in range(start, end):
+            page = doc[index]
+            printed_page = first_printed_page + index
             png_name = f"{printed_page:03}.png"
-            png_path = images_dir / png_name
+            png_path = Path(images_dir) / png_name
             render_page_to_png(page, png_path, dpi=dpi)
 
-            page_payload = extract_page_data(
-                page=page,
-                printed_page=printed_page,
-                png_name=png_name,
-                source_file=segment,
+            payloads.append(
+                extract_page_data(
+                    page=page,
+                    printed_page=printed_page,
+                    png_name=png_name,
+                    source_file=segment,
+                )
             )
-            pages_output.append(page_payload)
 
-            printed_page += 1
+    return payloads
+
+
+def build_tasks(
+    plan: List[Tuple[str, Path, int, int]],
+    images_dir: Path,
+    dpi: int,
+    pages_per_task: int,
+) -> List[Tuple[str, str, int, int, int, str, int]]:
+    tasks = []
+    for segment, pdf_path, page_count, first_printed_page in plan:
+        for start in range(0, page_count, pages_per_task):
+            end = min(start + pages_per_task, page_count)
+            tasks.append(
+                (
+                    segment,
+                    pdf_path.as_posix(),
+                    start,
+                    end,
+                    first_printed_page,
+                    images_dir.as_posix(),
+                    dpi,
+                )
+            )
+    return tasks
+
+
+def run_tasks(tasks: List[Tuple], workers: int):
+    """Yield each task's payloads in task order."""
+    if workers <= 1:
+        for task in tasks:
+            yield process_page_range(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() yields in submission order, which keeps pages in printed order
+        yield from executor.map(process_page_range, tasks)
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def default_manifest_path(output_json: Path) -> Path:
+    return output_json.with_name(f"{output_json.stem}.manifest.json")
+
+
+def load_previous_build(
+    manifest_path: Path, output_json: Path, dpi: int
+) -> Tuple[Dict, Dict[int, Dict]]:
+    """Return the previous manifest segments and pages keyed by printed page.
+
+    Both come back empty when there is no usable previous build, e.g. the
+    DPI or extractor version changed.
+    """
+    if not manifest_path.exists() or not output_json.exists():
+        return {}, {}
+
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        with open(output_json, "r", encoding="utf-8") as f:
+            previous_payload = json.load(f)
+    except (OSError, ValueError) as exc:
+        print(f"[WARN] Ignoring previous build: {exc}")
+        return {}, {}
+
+    if manifest.get("extractorVersion") != EXTRACTOR_VERSION or manifest.get("dpi") != dpi:
+        print("[INFO] DPI or extractor version changed; rebuilding all segments")
+        return {}, {}
+
+    pages = {page["pageNumber"]: page for page in previous_payload.get("pages", [])}
+    return manifest.get("segments", {}), pages
+
+
+def segment_is_current(
+    segment: str,
+    page_count: int,
+    first_printed_page: int,
+    sha256: str,
+    previous_segments: Dict,
+    previous_pages: Dict[int, Dict],
+    images_dir: Path,
+) -> bool:
+    entry = previous_segments.get(segment)
+    if not entry:
+        return False
+    if (
+        entry.get("sha256") != sha256
+        or entry.get("pageCount") != page_count
+        or entry.get("firstPrintedPage") != first_printed_page
+    ):
+        return False
+
+    for printed_page in range(first_printed_page, first_printed_page + page_count):
+        page = previous_pages.get(printed_page)
+        if not page or page.get("sourceFile") != segment:
+            return False
+        if not (images_dir / page["image"]).exists():
+            return False
+    return True
+
+
+def write_manifest(
+    manifest_path: Path,
+    dpi: int,
+    plan: List[Tuple[str, Path, int, int]],
+    fingerprints: Dict[str, str],
+):
+    manifest = {
+        "extractorVersion": EXTRACTOR_VERSION,
+        "dpi": dpi,
+        "segments": {
+            segment: {
+                "sha256": fingerprints[segment],
+                "pageCount": page_count,
+                "firstPrintedPage": first_printed_page,
+                "lastPrintedPage": first_printed_page + page_count - 1,
+            }
+            for segment, _, page_count, first_printed_page in plan
+        },
+    }
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def ingest_segments(
+    pdf_dir: Path,
+    images_dir: Path,
+    output_json: Path,
+    dpi: int,
+    workers: int = 1,
+    pages_per_task: int = PAGES_PER_TASK,
+    manifest_path: Optional[Path] = None,
+    force: bool = False,
+):
+    ensure_directory(images_dir)
+    ensure_directory(output_json.parent)
+    manifest_path = manifest_path or default_manifest_path(output_json)
+
+    plan = plan_segments(pdf_dir)
+    fingerprints = {segment: file_sha256(pdf_path) for segment, pdf_path, _, _ in plan}
+
+    previous_segments, previous_pages = (
+        ({}, {}) if force else load_previous_build(manifest_path, output_json, dpi)
+    )
+
+    stale_plan = []
+    for segment, pdf_path, page_count, first_printed_page in plan:
+        if segment_is_current(
+            segment,
+            page_count,
+            first_printed_page,
+            fingerprints[segment],
+            previous_segments,
+            previous_pages,
+            images_dir,
+        ):
+            print(f"[SKIP] {pdf_path} unchanged")
+            continue
+        print(
+            f"[INFO] {pdf_path}: {page_count} pages starting at printed page {first_printed_page}"
+        )
+        stale_plan.append((segment, pdf_path, page_count, first_printed_page))
+
+    expected_pages = sum(page_count for _, _, page_count, _ in plan)
+    if not stale_plan and len(previous_pages) == expected_pages:
+        print(f"[DONE] All {len(plan)} segments up to date; {output_json} unchanged")
+        return
+
+    tasks = build_tasks(stale_plan, images_dir, dpi, max(pages_per_task, 1))
+    print(
+        f"[INFO] Rendering {len(tasks)} page ranges from {len(stale_plan)}/{len(plan)} "
+        f"segments with {max(workers, 1)} worker(s)"
+    )
+
+    new_pages: Dict[int, Dict] = {}
+    for payloads in run_tasks(tasks, workers):
+        for page_payload in payloads:
+            new_pages[page_payload["pageNumber"]] = page_payload
+
+    # Patch freshly extracted pages over the previous build, in printed order
+    pages_output: List[Dict] = []
+    for _, _, page_count, first_printed_page in plan:
+        for printed_page in range(first_printed_page, first_printed_page + page_count):
+            pages_output.append(new_pages.get(printed_page) or previous_pages[printed_page])
 
     payload = {
         "editionId": "aa-bigbook-4th",
@@ -321,8 +565,11 @@ def ingest_segments(
 
     with open(output_json, "w", encoding="utf-8") as f:
         json.dump(payload, f, indent=2, ensure_ascii=False)
+    write_manifest(manifest_path, dpi, plan, fingerprints)
 
-    print(f"[DONE] Wrote {len(pages_output)} pages to {output_json}")
+    print(
+        f"[DONE] Wrote {len(pages_output)} pages ({len(new_pages)} re-extracted) to {output_json}"
+    )
 
 
 def main():
@@ -332,6 +579,10 @@ def main():
         images_dir=args.images_dir,
         output_json=args.output_json,
         dpi=args.dpi,
+        workers=args.workers,
+        pages_per_task=args.pages_per_task,
+        manifest_path=args.manifest,
+        force=args.force,
     )
 
 